@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.columnar import ColumnarWishlist
+from common.pagination import DEFAULT_PAGE_SIZE
+from common.wire import CODECS, decode, encode
+
+
+def example_wishlist(set_count):
+    names = ["Millennium Falcon", "Stormtrooper Mech", "R2-D2", "Hogwarts Castle"]
+    descriptions = [
+        "Make room to display the most famous starship in the galaxy!",
+        "The posable mech suit has an opening cockpit for the minifigure!",
+        "This brick-built droid is ready to explore the galaxy!",
+        "Build it, display it — “brick” by brick, with {} minifigures.",
+    ]
+    return {
+        str(10000 + index): {
+            "set_name": f"{random.choice(names)} {index}",
+            "set_price": f"{random.uniform(5, 900):.2f}",
+            "set_age_group": f"{random.randint(4, 18)}+",
+            "set_pieces": str(random.randint(20, 9000)),
+            "set_description": random.choice(descriptions).format(index % 9),
+        }
+        for index in range(set_count)
+    }
+
+
+def measure(message, codec, repeat):
+    frames = encode(message, codec)
+    wire_bytes = sum(len(memoryview(frame).cast("B")) for frame in frames)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        frames = encode(message, codec)
+    encode_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    # What a receiver gets off the socket
+    received = [bytes(memoryview(frame).cast("B")) for frame in frames]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode(received)
+    decode_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    return wire_bytes, encode_ms, decode_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wire codec benchmark")
+    parser.add_argument("--sets", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    wishlist = example_wishlist(args.sets)
+    columnar = ColumnarWishlist.from_dict(wishlist)
+
+    page = dict(list(wishlist.items())[:DEFAULT_PAGE_SIZE])
+
+    # One result page, the whole wishlist as sets and as raw columns
+    cases = [(f"page/{codec}", {"wishlist": page}, codec) for codec in CODECS]
+    cases += [(f"sets/{codec}", {"wishlist": wishlist}, codec) for codec in CODECS]
+    cases += [
+        (f"columns/{codec}", {"columns": columnar.to_wire()}, codec)
+        for codec in CODECS
+        if codec.startswith("frames")
+    ]
+
+    print(f"{args.sets} sets, mean of {args.repeat} runs\n")
+    print(f"{'payload/codec':<22} {'bytes':>12} {'encode ms':>10} {'decode ms':>10}")
+    for name, message, codec in cases:
+        wire_bytes, encode_ms, decode_ms = measure(message, codec, args.repeat)
+        print(f"{name:<22} {wire_bytes:>12,} {encode_ms:>10.2f} {decode_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,77 @@
+import asyncio
+import contextlib
 import os
+import sys
 import time
-import zmq
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.async_client import AsyncServiceClient
+from common.binary_snapshot import OverlayWishlist
+from common.bulk_import import import_sets, parse_set_line
+from common.content_hash import HashTree, sync_ops
+from common.journal import WishlistJournal
+from common.pagination import DEFAULT_PAGE_SIZE
+from common.registry import REGISTRY_ADDRESS
+from common.wishlist_store import (
+    DEFAULT_WISHLIST_ID,
+    add_op,
+    delete_op,
+    edit_op,
+    replace_op,
+)
+
+# Wishlist snapshot + op log live here, override with WISH_UPON_A_BRICK_DATA
+DATA_DIR = os.environ.get(
+    "WISH_UPON_A_BRICK_DATA",
+    os.path.join(os.path.expanduser("~"), ".wish_upon_a_brick"),
+)
+
+# Each saved change is flushed to disk before going on; WISH_UPON_A_BRICK_FSYNC=0
+# saves faster, at the risk of losing the last changes on a power cut
+FSYNC_JOURNAL = os.environ.get("WISH_UPON_A_BRICK_FSYNC") != "0"
+
+# Compress large messages to the services (worth it over slow links only)
+COMPRESS_MESSAGES = os.environ.get("WISH_UPON_A_BRICK_COMPRESS") == "1"
+
+# Where service instances are found, set WISH_UPON_A_BRICK_REGISTRY empty for none
+REGISTRY = os.environ.get("WISH_UPON_A_BRICK_REGISTRY", REGISTRY_ADDRESS) or None
+
+# Web lookups run in the background on the search service, checked this often
+LOOKUP_POLL_INTERVAL = 0.25
+LOOKUP_TIMEOUT = 30.0
+
+# Sort menu choice -> (sort key, order) understood by the sort service
+SORT_CHOICES = {
+    "1": ("price", "asc"),
+    "2": ("price", "desc"),
+    "3": ("pieces", "asc"),
+    "4": ("pieces", "desc"),
+    "5": ("age", "asc"),
+    "6": ("age", "desc"),
+    "7": ("set_number", "asc"),
+    "8": ("set_number", "desc"),
+    "9": ("name", "asc"),
+    "10": ("name", "desc"),
+}
+
+
+def parse_range_input(text, number_type):
+    """
+    "8-16" -> {"min": 8, "max": 16}, "8-" / "-16" leave one side open
+    """
+    low, separator, high = text.partition("-")
+    if not separator:
+        raise ValueError(f"Not a range: {text}")
+
+    bounds = {}
+    if low.strip():
+        bounds["min"] = number_type(low)
+    if high.strip():
+        bounds["max"] = number_type(high)
+
+    return bounds
 
 
 class WishUponABrickMain:
@@ -8,33 +79,42 @@ class WishUponABrickMain:
         """
         Data stored in dict/obj structure
         """
-        self.wishlist = {}
-        self.seed_example_data()
-
-        # ZeroMQ setup
-        self.context = zmq.Context()
-
-        # Sockets to microservices
-        self.sort_socket = self.context.socket(zmq.REQ)
-        self.sort_socket.connect("tcp://localhost:5555")
-
-        self.filter_socket = self.context.socket(zmq.REQ)
-        self.filter_socket.connect("tcp://localhost:5556")
-
-        self.search_socket = self.context.socket(zmq.REQ)
-        self.search_socket.connect("tcp://localhost:5557")
+        # Wishlist survives restarts: snapshot + append-only op log on disk
+        self.journal = WishlistJournal(DATA_DIR, fsync=FSYNC_JOURNAL)
+        is_first_run = not self.journal.exists()
+        self.wishlist = self.journal.load()
+
+        if is_first_run:
+            self.seed_example_data()
+            # Read back through the mapped snapshot, same as on later runs
+            self.wishlist = OverlayWishlist(self.journal.snapshot(self.wishlist))
+
+        # Services read the sets from the shared wishlist store by ID/version
+        self.wishlist_id = DEFAULT_WISHLIST_ID
+        self.wishlist_version = 0
+        # Per-set content hashes, to find what the store's copy is missing
+        self.wishlist_hashes = HashTree.from_wishlist(self.wishlist)
+        self.store_in_sync = False
+
+        # Requests to the microservices, several can be in flight at once
+        self.loop = asyncio.new_event_loop()
+        self.services = AsyncServiceClient(
+            compress=COMPRESS_MESSAGES, registry=REGISTRY
+        )
 
-        self.total_socket = self.context.socket(zmq.REQ)
-        self.total_socket.connect("tcp://localhost:5558")
+        # Send the store whatever it lacks, only changes are sent after this
+        self.sync_wishlist()
 
     def __del__(self):
-        # Close sockets
-        self.sort_socket.close()
-        self.filter_socket.close()
-        self.search_socket.close()
-        self.total_socket.close()
-        # Terminate context
-        self.context.term()
+        self.close()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        # Close sockets and terminate context
+        self.services.close()
+        self.loop.close()
+        self.journal.close()
 
     def seed_example_data(self):
         """
@@ -64,6 +144,100 @@ class WishUponABrickMain:
             },
         }
 
+    def save_wishlist_ops(self, ops):
+        """
+        Log ops already applied to self.wishlist on disk, then share them
+        """
+        self.journal.append(ops, self.wishlist)
+        for op in ops:
+            self.wishlist_hashes.refresh(op["set_number"], self.wishlist)
+        self.send_wishlist_ops(ops)
+
+    def send_wishlist_ops(self, ops):
+        """
+        Push add/edit/delete ops to the shared wishlist store
+        """
+        if not self.store_in_sync:
+            # Earlier ops didn't all arrive, reconciling sends these too
+            self.sync_wishlist()
+            return
+
+        response = self.apply_store_ops(ops)
+
+        if response["status"] != "success" and response["message"].startswith(
+            "Invalid operation"
+        ):
+            # Store lost sets it had (restarted), reconcile right away
+            self.sync_wishlist()
+
+    def apply_store_ops(self, ops):
+        # Not retried, the store must not apply the same ops twice
+        response = self.request(
+            "store", {"command": "apply_ops", "ops": ops}, retries=0
+        )
+        self.store_in_sync = response["status"] == "success"
+
+        if self.store_in_sync:
+            self.wishlist_version = response["version"]
+        elif not response["message"].startswith("Invalid operation"):
+            print("Error:", response["message"])
+            time.sleep(1)
+
+        return response
+
+    def sync_wishlist(self):
+        """
+        Bring the store's copy of the wishlist in line with ours
+
+        Hash trees are compared root first, then per bucket, so only sets
+        that differ are sent: nothing when the store is current, one op
+        after a single missed edit.
+        """
+        tree = self.wishlist_hashes
+        request = {"command": "sync_hashes", "wishlist_id": self.wishlist_id}
+
+        reply = self.request("store", {**request, "root": tree.root()})
+        if reply["status"] == "success" and "buckets" not in reply:
+            self.wishlist_version = reply["version"]
+            self.store_in_sync = True
+            return
+
+        if reply["status"] == "success" and reply["size"] == 0:
+            # Empty store (first start / restarted), everything in one op
+            ops = [replace_op(self.wishlist_id, dict(self.wishlist))]
+        elif reply["status"] == "success":
+            buckets = tree.differing_buckets(reply["buckets"])
+            reply = self.request("store", {**request, "buckets": buckets})
+            if reply["status"] == "success":
+                ops = sync_ops(
+                    tree, self.wishlist, self.wishlist_id, buckets, reply["sets"]
+                )
+
+        if reply["status"] != "success":
+            print("Error:", reply["message"])
+            time.sleep(1)
+        elif ops:
+            self.apply_store_ops(ops)
+
+    def request(self, service, message, **options):
+        """
+        Send one request to a service and wait for its reply (or an error)
+        """
+        return self.loop.run_until_complete(
+            self.services.request_or_error(service, message, **options)
+        )
+
+    def wishlist_request(self, command, **params):
+        """
+        Service request that refers to the wishlist by ID instead of its content
+        """
+        return {
+            "command": command,
+            "wishlist_id": self.wishlist_id,
+            "version": self.wishlist_version,
+            **params,
+        }
+
     def run(self):
         """
         Run the app in main
@@ -77,6 +251,8 @@ class WishUponABrickMain:
                 self.menu_screen()
             elif user_choice == "0":
                 print("Thank you for using Wish Upon a Brick! See you soon :)")
+                # Before interpreter shutdown, asyncio sockets can't close then
+                self.close()
                 break
             else:
                 print("Invalid choice...:( Please try again.")
@@ -126,8 +302,9 @@ class WishUponABrickMain:
                 5. 🗑️   Delete a LEGO set
                 6. 💎   Sort LEGO sets
                 7. 🎯   Filter LEGO sets
-                8. 🌐   Search LEGO set on web
+                8. 🔍   Search LEGO sets
                 9. 📊   Count LEGO sets totals
+                10. 📥  Bulk import LEGO sets from a file
                 0. ⬅️   Go back to home screen
                 """
             )
@@ -152,6 +329,8 @@ class WishUponABrickMain:
                 self.search_lego_set()
             elif user_choice == "9":
                 self.count_lego_totals()
+            elif user_choice == "10":
+                self.bulk_import_screen()
             elif user_choice == "0":
                 break
             else:
@@ -167,37 +346,30 @@ class WishUponABrickMain:
                 Sort LEGO Sets:
                 1. Sort by Price (Low to High)
                 2. Sort by Price (High to Low)
+                3. Sort by Pieces (Low to High)
+                4. Sort by Pieces (High to Low)
+                5. Sort by Age Group (Low to High)
+                6. Sort by Age Group (High to Low)
+                7. Sort by Set Number (Low to High)
+                8. Sort by Set Number (High to Low)
+                9. Sort by Name (A to Z)
+                10. Sort by Name (Z to A)
                 0. Go back
                 """
             )
 
             user_choice = input("Enter your choice: ").strip()
 
-            if user_choice == "1":
-                self.sort_socket.send_json(
-                    {"command": "sort_low_to_high", "wishlist": self.wishlist}
+            if user_choice in SORT_CHOICES:
+                sort_key, order = SORT_CHOICES[user_choice]
+                self.page_through(
+                    "sort",
+                    self.wishlist_request("sort", key=sort_key, order=order),
+                    lambda response: self.display_sorted_wishlist(response, sort_key),
+                    lambda set_number, set_details: self.sorted_row(
+                        set_number, set_details, sort_key
+                    ),
                 )
-                response = self.sort_socket.recv_json()
-
-                if response["status"] == "success":
-                    sorted_wishlist = response["wishlist"]
-                    self.display_sorted_wishlist(sorted_wishlist)
-                else:
-                    print("Error:", response["message"])
-                    time.sleep(1)
-
-            elif user_choice == "2":
-                self.sort_socket.send_json(
-                    {"command": "sort_high_to_low", "wishlist": self.wishlist}
-                )
-                response = self.sort_socket.recv_json()
-
-                if response["status"] == "success":
-                    sorted_wishlist = response["wishlist"]
-                    self.display_sorted_wishlist(sorted_wishlist)
-                else:
-                    print("Error:", response["message"])
-                    time.sleep(1)
 
             elif user_choice == "0":
                 return
@@ -205,17 +377,100 @@ class WishUponABrickMain:
                 print("Invalid choice...:( Please try again.")
                 time.sleep(1)
 
-    def display_sorted_wishlist(self, sorted_wishlist):
+    def page_through(self, service, request, display_page, display_row=None):
+        """
+        Fetch a sort/filter result one page at a time instead of all at once
+
+        With display_row, the rest of the result can also be streamed out
+        row by row instead of paged through.
+        """
+        # Cursor of every page seen so far, last one is the page on screen
+        cursors = [None]
+
+        while True:
+            response = self.request(
+                service, {**request, "limit": DEFAULT_PAGE_SIZE, "cursor": cursors[-1]}
+            )
+
+            if response["status"] != "success":
+                print("Error:", response["message"])
+                time.sleep(1)
+                return
+
+            display_page(response)
+
+            page_options = []
+            if response["next_cursor"]:
+                page_options.append("'n' for next page")
+                if display_row is not None:
+                    page_options.append("'a' for all the rest")
+            if len(cursors) > 1:
+                page_options.append("'p' for previous page")
+
+            if not page_options:
+                input("\nPress 'Enter' to continue...")
+                return
+
+            user_choice = (
+                input(
+                    f"\nEnter {', '.join(page_options)}, or press 'Enter' to go back: "
+                )
+                .strip()
+                .lower()
+            )
+
+            if user_choice == "n" and response["next_cursor"]:
+                cursors.append(response["next_cursor"])
+            elif user_choice == "a" and response["next_cursor"] and display_row:
+                offset = response["offset"] + len(response["wishlist"])
+                self.loop.run_until_complete(
+                    self.stream_rows(service, request, offset, display_row)
+                )
+                input("\nPress 'Enter' to continue...")
+                return
+            elif user_choice == "p" and len(cursors) > 1:
+                cursors.pop()
+            else:
+                return
+
+    async def stream_rows(self, service, request, offset, display_row):
+        """
+        Print the rest of a sort/filter result as it arrives, chunk by chunk
+        """
+        stream = self.services.stream(service, request, offset)
+
+        async with contextlib.aclosing(stream):
+            async for response in stream:
+                if response["status"] != "success":
+                    print("Error:", response["message"])
+                    return
+
+                for set_number, set_details in response["wishlist"].items():
+                    print(display_row(set_number, set_details))
+
+    def page_range(self, response):
+        first = response["offset"] + 1
+        last = response["offset"] + len(response["wishlist"])
+        return f"{first}-{last} of {response['total']}"
+
+    def display_sorted_wishlist(self, response, sort_key="price"):
         os.system("cls" if os.name == "nt" else "clear")
 
-        print("Sorted LEGO sets result:\n")
+        sorted_wishlist = response["wishlist"]
+        print(f"Sorted LEGO sets result ({self.page_range(response)}):\n")
 
         for set_number, set_details in sorted_wishlist.items():
-            print(
-                f"[{set_number}] --- {set_details['set_name']}, ${set_details['set_price']}"
-            )
+            print(self.sorted_row(set_number, set_details, sort_key))
 
-        input("\nPress 'Enter' to continue...")
+    def sorted_row(self, set_number, set_details, sort_key="price"):
+        if sort_key == "pieces":
+            sorted_by = f"{set_details['set_pieces']} pieces"
+        elif sort_key == "age":
+            sorted_by = f"Ages {set_details['set_age_group']}"
+        else:
+            sorted_by = f"${set_details['set_price']}"
+
+        return f"[{set_number}] --- {set_details['set_name']}, {sorted_by}"
 
     def filter_lego_sets(self):
         while True:
@@ -226,6 +481,7 @@ class WishUponABrickMain:
                 Filter LEGO Sets:
                 1. Filter by Minimum Age Requirement
                 2. Filter by Minimum Piece Count
+                3. Combined Filter (Age, Pieces, Price, Name, Set Number)
                 0. Go back
                 """
             )
@@ -236,21 +492,12 @@ class WishUponABrickMain:
                 min_age_str = input("Enter minimum age: ").strip()
                 try:
                     min_age = int(min_age_str)
-                    self.filter_socket.send_json(
-                        {
-                            "command": "filter_by_age",
-                            "wishlist": self.wishlist,
-                            "min_age": min_age,
-                        }
+                    self.page_through(
+                        "filter",
+                        self.wishlist_request("filter_by_age", min_age=min_age),
+                        self.display_filtered_wishlist,
+                        self.filtered_row,
                     )
-                    response = self.filter_socket.recv_json()
-
-                    if response["status"] == "success":
-                        filtered_wishlist = response["wishlist"]
-                        self.display_filtered_wishlist(filtered_wishlist)
-                    else:
-                        print("Error:", response["message"])
-                        time.sleep(1)
                 except ValueError:
                     print("Invalid age input. Please enter a number.")
                     time.sleep(1)
@@ -259,43 +506,78 @@ class WishUponABrickMain:
                 min_pieces_str = input("Enter minimum piece count: ").strip()
                 try:
                     min_pieces = int(min_pieces_str)
-                    self.filter_socket.send_json(
-                        {
-                            "command": "filter_by_pieces",
-                            "wishlist": self.wishlist,
-                            "min_pieces": min_pieces,
-                        }
+                    self.page_through(
+                        "filter",
+                        self.wishlist_request(
+                            "filter_by_pieces", min_pieces=min_pieces
+                        ),
+                        self.display_filtered_wishlist,
+                        self.filtered_row,
                     )
-                    response = self.filter_socket.recv_json()
-
-                    if response["status"] == "success":
-                        filtered_wishlist = response["wishlist"]
-                        self.display_filtered_wishlist(filtered_wishlist)
-                    else:
-                        print("Error:", response["message"])
-                        time.sleep(1)
                 except ValueError:
                     print("Invalid piece count input. Please enter a number.")
                     time.sleep(1)
 
+            elif user_choice == "3":
+                try:
+                    where = self.filter_query_screen()
+                    self.page_through(
+                        "filter",
+                        self.wishlist_request("query", where=where),
+                        self.display_filtered_wishlist,
+                        self.filtered_row,
+                    )
+                except ValueError:
+                    print("Invalid range input. Please enter e.g. 8-16, 8- or -16.")
+                    time.sleep(1)
+
             elif user_choice == "0":
                 return
             else:
                 print("Invalid choice...:( Please try again.")
                 time.sleep(1)
 
-    def display_filtered_wishlist(self, filtered_wishlist):
+    def filter_query_screen(self):
+        """
+        Ask for every filter at once, press 'Enter' to skip any of them
+        """
+        print("\nEnter ranges as min-max, min- or -max (or press 'Enter' to skip)")
+
+        where = {}
+        age_range = input("Age range: ").strip()
+        pieces_range = input("Piece count range: ").strip()
+        price_range = input("Price range: $").strip()
+        name_contains = input("Name contains: ").strip()
+        set_number_prefix = input("Set number starts with: ").strip()
+
+        if age_range:
+            where["age"] = parse_range_input(age_range, int)
+        if pieces_range:
+            where["pieces"] = parse_range_input(pieces_range, int)
+        if price_range:
+            where["price"] = parse_range_input(price_range, float)
+        if name_contains:
+            where["name_contains"] = name_contains
+        if set_number_prefix:
+            where["set_number_prefix"] = set_number_prefix
+
+        return where
+
+    def display_filtered_wishlist(self, response):
         os.system("cls" if os.name == "nt" else "clear")
 
+        filtered_wishlist = response["wishlist"]
+
         if not filtered_wishlist:
             print("No LEGO sets match the filter criteria.")
         else:
-            print("Filtered LEGO sets result:\n")
+            print(f"Filtered LEGO sets result ({self.page_range(response)}):\n")
 
             for set_number, set_details in filtered_wishlist.items():
-                print(f"[{set_number}] --- {set_details['set_name']}")
+                print(self.filtered_row(set_number, set_details))
 
-        input("\nPress 'Enter' to continue...")
+    def filtered_row(self, set_number, set_details):
+        return f"[{set_number}] --- {set_details['set_name']}"
 
     def search_lego_set(self):
         while True:
@@ -303,9 +585,11 @@ class WishUponABrickMain:
 
             print(
                 """
-                Search LEGO Set on Web:
+                Search LEGO Sets:
                 1. Search by LEGO Set Number
-                2. Search by LEGO Set Name
+                2. Search by LEGO Set Name or Keywords
+                3. Search the LEGO Catalogue
+                4. Look Up a LEGO Set on the Web
                 0. Go back
                 """
             )
@@ -315,37 +599,34 @@ class WishUponABrickMain:
             if user_choice == "1":
                 set_number = input("Enter LEGO Set Number: ").strip()
                 if set_number:
-                    self.search_socket.send_json(
-                        {"command": "search_by_number", "set_number": set_number}
+                    self.page_through(
+                        "search",
+                        self.wishlist_request(
+                            "search_by_number", set_number=set_number
+                        ),
+                        self.display_search_results,
                     )
-                    response = self.search_socket.recv_json()
-
-                    if response["status"] == "success":
-                        print(f"\n✔️  {response["result"]}.")
-                        input("\nPress 'Enter' to continue...")
-                    else:
-                        print("Error:", response["message"])
-                        time.sleep(1)
                 else:
                     print("Please enter a LEGO set number.")
                     time.sleep(1)
 
-            elif user_choice == "2":
-                set_name = input("Enter LEGO Set Name: ").strip()
-                if set_name:
-                    self.search_socket.send_json(
-                        {"command": "search_by_name", "set_name": set_name}
-                    )
-                    response = self.search_socket.recv_json()
+            elif user_choice in ("2", "3"):
+                query = input("Enter LEGO set name or keywords: ").strip()
+                if query:
+                    request = self.wishlist_request("search", query=query)
+                    if user_choice == "3":
+                        request["source"] = "catalogue"
+                    self.page_through("search", request, self.display_search_results)
+                else:
+                    print("Please enter something to search for.")
+                    time.sleep(1)
 
-                    if response["status"] == "success":
-                        print(f"\n✔️  {response["result"]}.")
-                        input("\nPress 'Enter' to continue...")
-                    else:
-                        print("Error:", response["message"])
-                        time.sleep(1)
+            elif user_choice == "4":
+                query = input("Enter LEGO set number or name: ").strip()
+                if query:
+                    self.web_lookup(query)
                 else:
-                    print("Please enter a LEGO set name.")
+                    print("Please enter something to look up.")
                     time.sleep(1)
 
             elif user_choice == "0":
@@ -354,6 +635,70 @@ class WishUponABrickMain:
                 print("Invalid choice...:( Please try again.")
                 time.sleep(1)
 
+    def web_lookup(self, query):
+        """
+        Start a lookup on the search service, then check back until it's done
+        """
+        print("\n🌐  Looking it up...")
+        deadline = time.monotonic() + LOOKUP_TIMEOUT
+
+        while True:
+            response = self.request("search", {"command": "lookup", "query": query})
+            if response["status"] != "success" or response["state"] != "pending":
+                break
+            if time.monotonic() > deadline:
+                response = {"status": "error", "message": "Lookup is taking too long"}
+                break
+            time.sleep(LOOKUP_POLL_INTERVAL)
+
+        if response["status"] != "success" or response["state"] == "failed":
+            print("Error:", response["message"])
+            time.sleep(1)
+            return
+
+        if not response["results"]:
+            print("Nothing found on the web.")
+        for result in response["results"]:
+            print(
+                f"[{result['set_number']}] --- {result['set_name']}\n    {result['url']}"
+            )
+        input("\nPress 'Enter' to continue...")
+
+    def set_not_found(self, text):
+        """
+        Not-found message, with the closest set numbers / names if any
+        """
+        print("❌ LEGO set not found. Please try again.")
+
+        response = self.request(
+            "search", self.wishlist_request("suggest", text=text), retries=0
+        )
+        if response["status"] == "success" and response["suggestions"]:
+            self.print_suggestions(response["suggestions"])
+            input("\nPress 'Enter' to continue...")
+        else:
+            time.sleep(1)
+
+    def print_suggestions(self, suggestions):
+        if suggestions:
+            print("\nDid you mean:")
+            for suggestion in suggestions:
+                print(f"[{suggestion['set_number']}] --- {suggestion['set_name']}")
+
+    def display_search_results(self, response):
+        os.system("cls" if os.name == "nt" else "clear")
+
+        results = response["wishlist"]
+
+        if not results:
+            print("No LEGO sets match the search.")
+            self.print_suggestions(response.get("suggestions"))
+        else:
+            print(f"Search results, best match first ({self.page_range(response)}):\n")
+
+            for set_number, set_details in results.items():
+                print(f"[{set_number}] --- {set_details['set_name']}")
+
     def count_lego_totals(self):
         while True:
             os.system("cls" if os.name == "nt" else "clear")
@@ -364,6 +709,8 @@ class WishUponABrickMain:
                 1. Total Number of LEGO Sets
                 2. Total Cost of LEGO Sets
                 3. Total Number of Pieces
+                4. Price Summary (Min / Max / Average)
+                5. Dashboard (All Totals at Once)
                 0. Go back
                 """
             )
@@ -371,10 +718,9 @@ class WishUponABrickMain:
             user_choice = input("Enter your choice: ").strip()
 
             if user_choice == "1":
-                self.total_socket.send_json(
-                    {"command": "total_number_of_sets", "wishlist": self.wishlist}
+                response = self.request(
+                    "totals", self.wishlist_request("total_number_of_sets")
                 )
-                response = self.total_socket.recv_json()
 
                 if response["status"] == "success":
                     total_sets = response["total_sets"]
@@ -385,10 +731,9 @@ class WishUponABrickMain:
                     time.sleep(1)
 
             elif user_choice == "2":
-                self.total_socket.send_json(
-                    {"command": "total_cost_of_sets", "wishlist": self.wishlist}
+                response = self.request(
+                    "totals", self.wishlist_request("total_cost_of_sets")
                 )
-                response = self.total_socket.recv_json()
 
                 if response["status"] == "success":
                     total_cost = response["total_cost"]
@@ -399,10 +744,9 @@ class WishUponABrickMain:
                     time.sleep(1)
 
             elif user_choice == "3":
-                self.total_socket.send_json(
-                    {"command": "total_pieces_of_sets", "wishlist": self.wishlist}
+                response = self.request(
+                    "totals", self.wishlist_request("total_pieces_of_sets")
                 )
-                response = self.total_socket.recv_json()
 
                 if response["status"] == "success":
                     total_pieces = response["total_pieces"]
@@ -412,6 +756,53 @@ class WishUponABrickMain:
                     print("Error:", response["message"])
                     time.sleep(1)
 
+            elif user_choice == "4":
+                response = self.request(
+                    "totals", self.wishlist_request("totals_summary")
+                )
+
+                if response["status"] == "success":
+                    if response["mean_price"] is None:
+                        print("\n📊  No LEGO sets with a valid price.")
+                    else:
+                        print(f"\n📊  Cheapest LEGO Set: ${response['min_price']:.2f}")
+                        print(f"📊  Priciest LEGO Set: ${response['max_price']:.2f}")
+                        print(f"📊  Average Price: ${response['mean_price']:.2f}")
+                    input("\nPress 'Enter' to continue...")
+                else:
+                    print("Error:", response["message"])
+                    time.sleep(1)
+
+            elif user_choice == "5":
+                # Every metric from one request, computed from one set of totals
+                response = self.request(
+                    "totals",
+                    self.wishlist_request(
+                        "totals",
+                        metrics=[
+                            "count",
+                            "cost",
+                            "pieces",
+                            "average_price",
+                            "price_per_piece",
+                        ],
+                    ),
+                )
+
+                if response["status"] == "success":
+                    metrics = response["metrics"]
+                    print(f"\n📊  Total Number of LEGO Sets: {metrics['count']}")
+                    print(f"📊  Total Cost of LEGO Sets: ${metrics['cost']:.2f}")
+                    print(f"📊  Total Number of LEGO Pieces: {metrics['pieces']}")
+                    if metrics["average_price"] is not None:
+                        print(f"📊  Average Price: ${metrics['average_price']:.2f}")
+                    if metrics["price_per_piece"] is not None:
+                        print(f"📊  Price per Piece: ${metrics['price_per_piece']:.3f}")
+                    input("\nPress 'Enter' to continue...")
+                else:
+                    print("Error:", response["message"])
+                    time.sleep(1)
+
             elif user_choice == "0":
                 return
             else:
@@ -445,8 +836,7 @@ class WishUponABrickMain:
                 if user_set_number in self.wishlist:
                     self.view_set_detail_screen(user_set_number)
                 else:
-                    print("❌ LEGO set not found. Please try again.")
-                    time.sleep(1)
+                    self.set_not_found(user_set_number)
             elif user_choice == "0":
                 return
             else:
@@ -508,6 +898,15 @@ class WishUponABrickMain:
             "set_pieces": user_set_pieces,
             "set_description": user_set_description,
         }
+        self.save_wishlist_ops(
+            [
+                add_op(
+                    self.wishlist_id,
+                    user_set_number,
+                    self.wishlist[user_set_number],
+                )
+            ]
+        )
 
         print("\n ✔️  LEGO set added successfully!")
         time.sleep(1)
@@ -525,28 +924,61 @@ class WishUponABrickMain:
         ).strip()
 
         try:
-            (
-                set_name,
-                set_price,
-                set_age_group,
-                set_pieces,
-                set_number,
-                set_description,
-            ) = map(str.strip, user_input.split(",", 5))
-
-            self.wishlist[set_number] = {
-                "set_name": set_name,
-                "set_price": set_price,
-                "set_age_group": set_age_group,
-                "set_pieces": set_pieces,
-                "set_description": set_description,
-            }
+            set_number, set_details = parse_set_line(user_input)
+
+            self.wishlist[set_number] = set_details
+            self.save_wishlist_ops(
+                [add_op(self.wishlist_id, set_number, self.wishlist[set_number])]
+            )
 
             print("\n ✔️  LEGO set added successfully!")
         except ValueError:
             print("\n ❌  Invalid input format. Please try again.")
         time.sleep(1)
 
+    def bulk_import_screen(self):
+        """
+        Add every LEGO set from a CSV (quick-add format) or JSONL file
+        """
+        os.system("cls" if os.name == "nt" else "clear")
+
+        print("[Bulk import LEGO sets]\n")
+        print(
+            "CSV: one set per line as Name, Price, Age, Pieces, Set Number, Description"
+        )
+        print('JSONL: one {"set_number": ..., "set_name": ..., ...} object per line\n')
+
+        path = os.path.expanduser(input("Enter file path: ").strip())
+
+        if not os.path.isfile(path):
+            print("\n ❌  File not found. Please try again.")
+            time.sleep(1)
+            return
+
+        report = import_sets(
+            path,
+            self.wishlist,
+            self.wishlist_id,
+            self.save_wishlist_ops,
+            progress=self.display_import_progress,
+        )
+
+        print(f"\n\n ✔️  Imported {report['imported']} LEGO sets.")
+        if report["rejected"]:
+            print(f" ❌  Skipped {report['rejected']} invalid rows:")
+            for line_number, error in report["errors"]:
+                print(f"    line {line_number}: {error}")
+        input("\nPress 'Enter' to continue...")
+
+    def display_import_progress(self, bytes_read, total_bytes, report):
+        percent = 100 * bytes_read / total_bytes if total_bytes else 100
+        print(
+            f"\r📥  {percent:5.1f}%  {report['imported']} imported, "
+            f"{report['rejected']} skipped",
+            end="",
+            flush=True,
+        )
+
     def edit_lego_set_screen(self):
         """
         Access from menu screen only, leads to edit_lego_set func
@@ -569,8 +1001,7 @@ class WishUponABrickMain:
                 self.edit_lego_set(user_set_number)
                 return
             else:
-                print("❌ LEGO set not found. Please try again.")
-                time.sleep(1)
+                self.set_not_found(user_set_number)
 
     def edit_lego_set(self, set_number):
         """
@@ -612,16 +1043,22 @@ class WishUponABrickMain:
             f"Enter new description for LEGO set #{set_number} (or press 'Enter' to skip): "
         ).strip()
 
+        changes = {}
+
         if new_set_name:
-            self.wishlist[set_number]["set_name"] = new_set_name
+            changes["set_name"] = new_set_name
         if new_set_price:
-            self.wishlist[set_number]["set_price"] = new_set_price
+            changes["set_price"] = new_set_price
         if new_set_age_group:
-            self.wishlist[set_number]["set_age_group"] = new_set_age_group
+            changes["set_age_group"] = new_set_age_group
         if new_set_pieces:
-            self.wishlist[set_number]["set_pieces"] = new_set_pieces
+            changes["set_pieces"] = new_set_pieces
         if new_set_description:
-            self.wishlist[set_number]["set_description"] = new_set_description
+            changes["set_description"] = new_set_description
+
+        if changes:
+            self.wishlist[set_number] = {**self.wishlist[set_number], **changes}
+            self.save_wishlist_ops([edit_op(self.wishlist_id, set_number, changes)])
 
         print("\n ✔️  LEGO set updated successfully!")
         time.sleep(1)
@@ -648,8 +1085,7 @@ class WishUponABrickMain:
                 self.delete_lego_set(user_set_number)
                 return
             else:
-                print("❌ LEGO set not found. Please try again.")
-                time.sleep(1)
+                self.set_not_found(user_set_number)
 
     def delete_lego_set(self, set_number):
         """
@@ -676,6 +1112,7 @@ class WishUponABrickMain:
                 time.sleep(1)
 
         del self.wishlist[set_number]
+        self.save_wishlist_ops([delete_op(self.wishlist_id, set_number)])
 
         print("\n ✔️  LEGO set deleted successfully!")
         time.sleep(1)
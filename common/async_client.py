@@ -0,0 +1,300 @@
+import asyncio
+import itertools
+from collections import Counter
+
+import zmq
+import zmq.asyncio
+
+from common.registry import REGISTRY_ADDRESS, SERVICE_PORTS
+from common.wire import CODECS_REQUEST, choose_codec, decode, encode
+
+SERVICE_ADDRESSES = {
+    "sort": "tcp://localhost:5555",
+    "filter": "tcp://localhost:5556",
+    "search": "tcp://localhost:5557",
+    "totals": "tcp://localhost:5558",
+    "store": "tcp://localhost:5559",
+}
+
+# Seconds to wait for a reply before resending / giving up
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_RETRIES = 1
+
+# Seconds a registry lookup's replica list is used for, and waited for
+REPLICA_REFRESH_INTERVAL = 2.0
+REGISTRY_TIMEOUT = 0.5
+# ...and how long an unanswered registry is left alone (well-known addresses used)
+REGISTRY_RETRY_INTERVAL = 30.0
+
+# Streamed results come this many sets per reply
+STREAM_CHUNK_SIZE = 500
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class AsyncServiceClient:
+    def __init__(
+        self,
+        addresses=SERVICE_ADDRESSES,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        compress=False,
+        registry=REGISTRY_ADDRESS,
+    ) -> None:
+        """
+        Non-blocking requests to the REP services over one DEALER per instance
+
+        Each request goes out as [request ID, "", message frames]. REP
+        sockets echo everything before the empty frame back with the reply,
+        so replies are matched to their request without any change to the
+        services, and many requests can be outstanding at once. Messages use
+        the best wire codec the service supports, asked for on first use,
+        zlib-compressed above a size threshold if compress is set.
+
+        Instances of the scalable services are looked up in the registry
+        (unless registry is None) and each request goes to the one with the
+        fewest outstanding, ties taken in turn. One that times out is left
+        out of the resend; with no registry, or nothing registered, the
+        service's address in addresses is used.
+        """
+        self.context = zmq.asyncio.Context()
+        self.addresses = addresses
+        self.timeout = timeout
+        self.retries = retries
+        self.compress = compress
+        self.registry = registry
+
+        # address -> DEALER connected to it
+        self.sockets = {}
+        self.codecs = {}
+        # request ID -> future of its reply
+        self.pending = {}
+        self.request_ids = itertools.count()
+
+        # service -> (time looked up, addresses of its registered instances)
+        self.replicas = {}
+        # address -> requests sent to it still awaiting a reply
+        self.outstanding = Counter()
+        self.turns = itertools.count()
+        self.registry_retry_at = 0.0
+
+    def socket_for(self, address):
+        if address not in self.sockets:
+            socket = self.context.socket(zmq.DEALER)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect(address)
+            self.sockets[address] = socket
+
+        return self.sockets[address]
+
+    async def replicas_for(self, service):
+        """
+        Addresses of the service's live instances, as last looked up
+        """
+        now = asyncio.get_running_loop().time()
+        if (
+            self.registry is None
+            or service not in SERVICE_PORTS
+            or now < self.registry_retry_at
+        ):
+            return [self.addresses[service]]
+
+        looked_up, addresses = self.replicas.get(service, (None, []))
+
+        if looked_up is None or now - looked_up > REPLICA_REFRESH_INTERVAL:
+            try:
+                reply = await self.send(
+                    self.registry,
+                    {"command": "lookup", "service": service},
+                    "json",
+                    REGISTRY_TIMEOUT,
+                )
+                addresses = reply.get("addresses", [])
+            except asyncio.TimeoutError:
+                # Registry not running, don't hold every request up on it
+                self.registry_retry_at = now + REGISTRY_RETRY_INTERVAL
+                addresses = []
+            self.replicas[service] = (now, addresses)
+
+        return addresses or [self.addresses[service]]
+
+    def pick_replica(self, addresses, failed):
+        """
+        The instance with the fewest outstanding requests, ties taken in turn
+        """
+        candidates = [address for address in addresses if address not in failed]
+        candidates = candidates or addresses
+
+        start = next(self.turns) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        return min(candidates, key=lambda address: self.outstanding[address])
+
+    async def wait_for_reply(self, socket, future, timeout):
+        """
+        Read replies off socket until future has its own, or timeout passes
+
+        Every waiting request reads from the shared socket and hands each
+        reply to whichever request it belongs to, so no background task is
+        needed to route them.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        while not future.done():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+
+            readable = asyncio.ensure_future(socket.poll(remaining * 1000))
+            await asyncio.wait(
+                (readable, future),
+                timeout=remaining,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not readable.done():
+                readable.cancel()
+                continue
+            if not readable.result():
+                continue
+
+            try:
+                frames = await socket.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                # Another waiting request got to it first
+                continue
+
+            reply_future = self.pending.get(frames[0].bytes)
+            # Replies to timed out / already answered requests are dropped
+            if reply_future is not None and not reply_future.done():
+                reply_future.set_result(decode(frames[2:])[0])
+
+        return future.result()
+
+    async def codec_for(self, service):
+        # Instances of a service run the same code, the first one asked answers
+        if service not in self.codecs:
+            reply = await self.request(service, CODECS_REQUEST, codec="json")
+            self.codecs[service] = choose_codec(reply, self.compress)
+
+        return self.codecs[service]
+
+    async def send(self, address, message, codec, timeout):
+        """
+        Send message to address once, return its reply or raise TimeoutError
+        """
+        socket = self.socket_for(address)
+        request_id = str(next(self.request_ids)).encode()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.outstanding[address] += 1
+
+        try:
+            await socket.send_multipart(
+                [request_id, b"", *encode(message, codec)], copy=False
+            )
+            return await self.wait_for_reply(socket, future, timeout)
+        finally:
+            del self.pending[request_id]
+            self.outstanding[address] -= 1
+
+    async def request(self, service, message, timeout=None, retries=None, codec=None):
+        """
+        Send message to service, resending on timeout, return its reply
+
+        Pass retries=0 for requests that mustn't run twice (store ops).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        codec = codec or await self.codec_for(service)
+        failed = set()
+
+        for _ in range(retries + 1):
+            address = self.pick_replica(await self.replicas_for(service), failed)
+            try:
+                return await self.send(address, message, codec, timeout)
+            except asyncio.TimeoutError:
+                # Likely dead, resent elsewhere; its heartbeats will have stopped
+                failed.add(address)
+                self.replicas.pop(service, None)
+
+        raise ServiceUnavailable(f"The {service} service did not respond")
+
+    async def request_or_error(self, service, message, **options):
+        """
+        Like request, but an unanswered request becomes an error reply
+        """
+        try:
+            return await self.request(service, message, **options)
+        except ServiceUnavailable as error:
+            return {"status": "error", "message": str(error)}
+
+    async def request_all(self, requests, **options):
+        """
+        [(service, message), ...] -> their replies, all requests in flight at once
+        """
+        return await asyncio.gather(
+            *(
+                self.request_or_error(service, message, **options)
+                for service, message in requests
+            )
+        )
+
+    async def stream(
+        self,
+        service,
+        message,
+        offset=0,
+        chunk_size=STREAM_CHUNK_SIZE,
+        **options,
+    ):
+        """
+        Replies to a sort/filter message chunk_size sets at a time, in order
+
+        Each chunk follows the cursor of the one before, so every chunk is
+        cut from the wishlist version the first one was: a change midway
+        ends the stream with an error reply rather than skipping or
+        repeating sets. The next chunk is requested as soon as one arrives,
+        so the service works on it while the caller shows this one.
+        Stops after an error reply.
+        """
+        chunk = {field: value for field, value in message.items() if field != "cursor"}
+        chunk["limit"] = chunk_size
+
+        reply = await self.request_or_error(
+            service, {**chunk, "offset": offset}, **options
+        )
+        version = reply.get("version")
+        next_reply = None
+
+        try:
+            while True:
+                if reply["status"] == "success" and reply.get("version") != version:
+                    reply = {
+                        "status": "error",
+                        "message": "Wishlist changed while streaming, start again",
+                    }
+
+                if reply["status"] == "success" and reply["next_cursor"]:
+                    next_reply = asyncio.ensure_future(
+                        self.request_or_error(
+                            service,
+                            {**chunk, "cursor": reply["next_cursor"]},
+                            **options,
+                        )
+                    )
+
+                yield reply
+                if next_reply is None:
+                    return
+                reply, next_reply = await next_reply, None
+        finally:
+            # Caller stopped early, drop what's still coming
+            if next_reply is not None:
+                next_reply.cancel()
+
+    def close(self):
+        for socket in self.sockets.values():
+            socket.close()
+        self.context.term()
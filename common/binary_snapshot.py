@@ -0,0 +1,291 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, MutableMapping, Sequence
+
+from common.columnar import MISSING_INT, TEXT_FIELDS, to_int_column
+from common.lego_fields import parse_age, parse_pieces, parse_price
+
+MAGIC = b"WUAB"
+FORMAT_VERSION = 1
+
+# magic, format version, string field count, row count, journal seq
+HEADER = struct.Struct("<4sHHQQ")
+
+# Set number first, rows are written in set number order
+STRING_FIELDS = ("set_number", *TEXT_FIELDS)
+
+
+def padding(size):
+    return b"\0" * (-size % 8)
+
+
+def write_snapshot(path, wishlist, seq=0, unmap=None):
+    """
+    Write a wishlist as fixed-width columns plus a deduplicated string heap
+
+    Layout (little-endian, every section 8-byte aligned):
+    header | price f8[n] | pieces i8[n] | age i8[n] |
+    per string field: heap offsets u8[n], byte lengths u4[n] | string heap
+
+    unmap() is called once the new file is written, right before it replaces
+    path: Windows refuses to replace a file that is still mapped, so a
+    caller reading wishlist from path lets go of its mapping there.
+    """
+    set_numbers = sorted(wishlist)
+
+    price = array("d")
+    pieces = array("q")
+    age = array("q")
+    offsets = {field: array("Q") for field in STRING_FIELDS}
+    lengths = {field: array("I") for field in STRING_FIELDS}
+    heap = bytearray()
+    heap_index = {}
+
+    for set_number in set_numbers:
+        set_details = {"set_number": set_number, **wishlist[set_number]}
+
+        for field in STRING_FIELDS:
+            data = str(set_details.get(field, "")).encode()
+            if data not in heap_index:
+                heap_index[data] = len(heap)
+                heap += data
+            offsets[field].append(heap_index[data])
+            lengths[field].append(len(data))
+
+        set_price = parse_price(set_details.get("set_price"))
+        price.append(float("nan") if set_price is None else set_price)
+        pieces.append(to_int_column(parse_pieces(set_details.get("set_pieces"))))
+        age.append(to_int_column(parse_age(set_details.get("set_age_group"))))
+
+    sections = [price, pieces, age]
+    for field in STRING_FIELDS:
+        sections += [offsets[field], lengths[field]]
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(
+            HEADER.pack(
+                MAGIC, FORMAT_VERSION, len(STRING_FIELDS), len(set_numbers), seq
+            )
+        )
+        snapshot_file.write(padding(HEADER.size))
+        for section in sections:
+            data = section.tobytes()
+            snapshot_file.write(data)
+            snapshot_file.write(padding(len(data)))
+        snapshot_file.write(heap)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+
+    if unmap is not None:
+        unmap()
+    # Readers that still have the old file mapped keep their copy (POSIX)
+    os.replace(temp_path, path)
+
+
+class MappedStrings(Sequence):
+    def __init__(self, snapshot, field) -> None:
+        """
+        One string column of a MappedWishlist, decoded only when indexed
+        """
+        self.snapshot = snapshot
+        self.field = field
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[index] for index in range(*row.indices(len(self)))]
+        return self.snapshot.text_at(self.field, row)
+
+
+class MappedWishlist(Mapping):
+    def __init__(self, path) -> None:
+        """
+        Read-only wishlist served straight from a memory-mapped snapshot
+
+        Opening it only reads the header; columns are memoryviews over the
+        mapping, so every process mapping the same file shares one copy in
+        the page cache. Offers the same read API as ColumnarWishlist.
+        """
+        if sys.byteorder != "little":
+            raise OSError("Wishlist snapshots are little-endian only")
+
+        self.path = path
+        with open(path, "rb") as snapshot_file:
+            self.mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        magic, version, field_count, self.count, self.seq = HEADER.unpack_from(
+            self.mmap
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise OSError(f"Not a wishlist snapshot: {path}")
+        if field_count != len(STRING_FIELDS):
+            raise OSError(f"Unexpected wishlist snapshot fields: {path}")
+
+        self.position = HEADER.size + len(padding(HEADER.size))
+        self.price = self._column("d", 8)
+        self.pieces = self._column("q", 8)
+        self.age = self._column("q", 8)
+        self.offsets = {}
+        self.lengths = {}
+        for field in STRING_FIELDS:
+            self.offsets[field] = self._column("Q", 8)
+            self.lengths[field] = self._column("I", 4)
+        self.heap_start = self.position
+
+        self.set_numbers = MappedStrings(self, "set_number")
+
+    def compact(self):
+        """
+        Same API as ColumnarWishlist; a snapshot never has dead rows
+        """
+
+    def close(self):
+        """
+        Unmap the file, e.g. to replace or remove it on Windows
+
+        Nothing can be read from this wishlist afterwards.
+        """
+        for column in (
+            self.price,
+            self.pieces,
+            self.age,
+            *self.offsets.values(),
+            *self.lengths.values(),
+        ):
+            column.release()
+        self.view.release()
+        self.mmap.close()
+
+    def _column(self, typecode, item_size):
+        size = self.count * item_size
+        column = self.view[self.position : self.position + size].cast(typecode)
+        self.position += size + len(padding(size))
+        return column
+
+    def text_at(self, field, row):
+        start = self.heap_start + self.offsets[field][row]
+        return bytes(self.view[start : start + self.lengths[field][row]]).decode()
+
+    def bytes_at(self, field, row):
+        start = self.heap_start + self.offsets[field][row]
+        return self.mmap[start : start + self.lengths[field][row]]
+
+    def row_of(self, set_number):
+        # Rows are in set number order: binary search the mapped column rather
+        # than decode every set number into a dict. UTF-8 bytes sort like the
+        # strings they encode, so nothing is decoded on the way.
+        if not isinstance(set_number, str):
+            raise KeyError(set_number)
+
+        data = set_number.encode()
+        offsets = self.offsets["set_number"]
+        lengths = self.lengths["set_number"]
+        heap_start = self.heap_start
+        low, high = 0, self.count
+
+        while low < high:
+            middle = (low + high) // 2
+            start = heap_start + offsets[middle]
+            if self.mmap[start : start + lengths[middle]] < data:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == self.count or self.bytes_at("set_number", low) != data:
+            raise KeyError(set_number)
+        return low
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.set_numbers)
+
+    def __contains__(self, set_number):
+        try:
+            self.row_of(set_number)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, set_number):
+        row = self.row_of(set_number)
+        return {field: self.text_at(field, row) for field in TEXT_FIELDS}
+
+    def to_dict(self):
+        return {set_number: self[set_number] for set_number in self.set_numbers}
+
+    def price_of(self, set_number):
+        price = self.price[self.row_of(set_number)]
+        return None if price != price else price
+
+    def pieces_of(self, set_number):
+        pieces = self.pieces[self.row_of(set_number)]
+        return None if pieces == MISSING_INT else pieces
+
+    def age_of(self, set_number):
+        age = self.age[self.row_of(set_number)]
+        return None if age == MISSING_INT else age
+
+    def text_of(self, set_number, field):
+        return self.text_at(field, self.row_of(set_number))
+
+
+class OverlayWishlist(MutableMapping):
+    def __init__(self, base) -> None:
+        """
+        Writable wishlist over a read-only base (e.g. a MappedWishlist)
+
+        Changes live in a small dict/set until the next snapshot folds them
+        into a new base, so nothing is deserialized up front.
+        """
+        self.base = base
+        self.changed = {}
+        self.deleted = set()
+
+    def rebase(self, base):
+        self.base = base
+        self.changed = {}
+        self.deleted = set()
+
+    def __getitem__(self, set_number):
+        if set_number in self.changed:
+            return self.changed[set_number]
+        if set_number in self.deleted:
+            raise KeyError(set_number)
+        return self.base[set_number]
+
+    def __setitem__(self, set_number, set_details):
+        self.changed[set_number] = set_details
+        self.deleted.discard(set_number)
+
+    def __delitem__(self, set_number):
+        if set_number not in self:
+            raise KeyError(set_number)
+        self.changed.pop(set_number, None)
+        if set_number in self.base:
+            self.deleted.add(set_number)
+
+    def __contains__(self, set_number):
+        if set_number in self.changed:
+            return True
+        return set_number not in self.deleted and set_number in self.base
+
+    def __iter__(self):
+        for set_number in self.base:
+            if set_number not in self.deleted:
+                yield set_number
+        for set_number in self.changed:
+            if set_number not in self.base:
+                yield set_number
+
+    def __len__(self):
+        added = sum(1 for set_number in self.changed if set_number not in self.base)
+        return len(self.base) - len(self.deleted) + added
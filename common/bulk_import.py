@@ -0,0 +1,127 @@
+import json
+import os
+
+from common.columnar import TEXT_FIELDS
+from common.lego_fields import parse_age, parse_pieces, parse_price
+from common.wishlist_store import add_op
+
+# Sets per batch of add ops journaled and sent to the wishlist store
+IMPORT_CHUNK_SIZE = 5000
+
+# Only the first few bad rows are kept for the report
+MAX_REPORTED_ERRORS = 10
+
+# Quick-add / CSV column order
+LINE_FIELDS = (
+    "set_name",
+    "set_price",
+    "set_age_group",
+    "set_pieces",
+    "set_number",
+    "set_description",
+)
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def parse_set_line(line):
+    """
+    "Name, Price, Age, Pieces, Set Number, Description" -> set_number, details
+
+    The description comes last, so it may contain commas itself.
+    """
+    values = [value.strip() for value in line.split(",", len(LINE_FIELDS) - 1)]
+    if len(values) != len(LINE_FIELDS):
+        raise ValueError(f"Expected {len(LINE_FIELDS)} comma-separated values")
+
+    set_details = dict(zip(LINE_FIELDS, values))
+    return set_details.pop("set_number"), set_details
+
+
+def parse_set_record(line):
+    """
+    '{"set_number": "75192", "set_name": ...}' -> set_number, details
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+
+    set_details = {field: str(record.get(field, "")).strip() for field in TEXT_FIELDS}
+    return str(record.get("set_number", "")).strip(), set_details
+
+
+def is_header(line):
+    return line.replace(" ", "").casefold().startswith("name,price,")
+
+
+def validate_set(set_number, set_details):
+    """
+    Reject sets whose price/pieces/age wouldn't parse into the typed columns
+    """
+    if not set_number:
+        raise ValueError("Missing set number")
+    if parse_price(set_details["set_price"]) is None:
+        raise ValueError(f"Invalid price: {set_details['set_price']!r}")
+    if parse_pieces(set_details["set_pieces"]) is None:
+        raise ValueError(f"Invalid piece count: {set_details['set_pieces']!r}")
+    if parse_age(set_details["set_age_group"]) is None:
+        raise ValueError(f"Invalid age group: {set_details['set_age_group']!r}")
+
+
+def import_sets(
+    path,
+    wishlist,
+    wishlist_id,
+    save_ops,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    progress=None,
+):
+    """
+    Stream sets from a CSV (quick-add format) or JSONL file into wishlist
+
+    Rows are read one at a time and handed to save_ops as chunks of add ops
+    (already applied to wishlist), so only one chunk is ever held here.
+    progress, if given, gets (bytes_read, total_bytes, report) per chunk.
+    """
+    is_jsonl = path.lower().endswith(JSONL_EXTENSIONS)
+    parse_row = parse_set_record if is_jsonl else parse_set_line
+    total_bytes = os.path.getsize(path)
+    report = {"imported": 0, "rejected": 0, "errors": []}
+
+    ops = []
+    bytes_read = 0
+
+    # Binary mode: text files can't tell() their position while iterating
+    with open(path, "rb") as import_file:
+        for line_number, raw_line in enumerate(import_file, 1):
+            bytes_read += len(raw_line)
+
+            try:
+                line = raw_line.decode("utf-8-sig").strip()
+                if not line or (not is_jsonl and line_number == 1 and is_header(line)):
+                    continue
+                set_number, set_details = parse_row(line)
+                validate_set(set_number, set_details)
+            except ValueError as error:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append((line_number, str(error)))
+                continue
+
+            wishlist[set_number] = set_details
+            ops.append(add_op(wishlist_id, set_number, set_details))
+
+            if len(ops) >= chunk_size:
+                save_ops(ops)
+                report["imported"] += len(ops)
+                ops = []
+                if progress is not None:
+                    progress(bytes_read, total_bytes, report)
+
+    if ops:
+        save_ops(ops)
+        report["imported"] += len(ops)
+    if progress is not None:
+        progress(total_bytes, total_bytes, report)
+
+    return report
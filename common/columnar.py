@@ -0,0 +1,272 @@
+from array import array
+from collections.abc import Mapping
+
+from common.lego_fields import parse_age, parse_pieces, parse_price
+
+# Every set is stored as these text fields, exactly as the user typed them
+TEXT_FIELDS = (
+    "set_name",
+    "set_price",
+    "set_age_group",
+    "set_pieces",
+    "set_description",
+)
+
+# Stand-in for an unparseable piece count / age in the int64 columns
+MISSING_INT = -(2**63)
+
+
+def to_int_column(value):
+    # Values that don't fit an int64 column count as unparseable
+    if value is None or not MISSING_INT < value < 2**63:
+        return MISSING_INT
+    return value
+
+
+class StringTable:
+    def __init__(self) -> None:
+        """
+        Interned strings, a repeated name/description/age group is stored once
+        """
+        self.strings = []
+        self.ids = {}
+        self.refcounts = array("I")
+        self.free_ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, string):
+        string_id = self.ids.get(string)
+
+        if string_id is None:
+            if self.free_ids:
+                string_id = self.free_ids.pop()
+                self.strings[string_id] = string
+            else:
+                string_id = len(self.strings)
+                self.strings.append(string)
+                self.refcounts.append(0)
+            self.ids[string] = string_id
+
+        self.refcounts[string_id] += 1
+        return string_id
+
+    def release(self, string_id):
+        self.refcounts[string_id] -= 1
+
+        if self.refcounts[string_id] == 0:
+            del self.ids[self.strings[string_id]]
+            self.strings[string_id] = None
+            self.free_ids.append(string_id)
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+
+class ColumnarWishlist(Mapping):
+    def __init__(self) -> None:
+        """
+        Wishlist as parallel typed columns, numbers parsed once on insert
+
+        Reads like a dict of set_number -> set_details, so callers that only
+        need the text fields can keep treating it as one.
+        """
+        self.strings = StringTable()
+        self.set_numbers = []
+        self.rows = {}
+        # Removed sets leave their row behind (set number None) until compact()
+        self.dead_rows = []
+
+        # NaN / MISSING_INT where the text couldn't be parsed
+        self.price = array("d")
+        self.pieces = array("q")
+        self.age = array("q")
+        self.text_ids = {field: array("I") for field in TEXT_FIELDS}
+
+    @classmethod
+    def from_dict(cls, wishlist):
+        if isinstance(wishlist, ColumnarWishlist):
+            return wishlist
+
+        columnar = cls()
+        for set_number, set_details in wishlist.items():
+            columnar.add(set_number, set_details)
+
+        return columnar
+
+    @classmethod
+    def from_columns(cls, snapshot):
+        """
+        Writable copy of a MappedWishlist, numeric columns copied as raw bytes
+        """
+        columnar = cls()
+        columnar.set_numbers = list(snapshot.set_numbers)
+        columnar.rows = {
+            set_number: row for row, set_number in enumerate(columnar.set_numbers)
+        }
+        columnar.price.frombytes(snapshot.price.cast("B"))
+        columnar.pieces.frombytes(snapshot.pieces.cast("B"))
+        columnar.age.frombytes(snapshot.age.cast("B"))
+
+        for field in TEXT_FIELDS:
+            text_ids = columnar.text_ids[field]
+            for row in range(len(columnar.set_numbers)):
+                text_ids.append(columnar.strings.intern(snapshot.text_at(field, row)))
+
+        return columnar
+
+    def to_wire(self):
+        """
+        Raw columns for the "frames" codec, arrays go as zero-copy buffers
+        """
+        self.compact()
+        return {
+            "set_numbers": self.set_numbers,
+            "strings": self.strings.strings,
+            "price": self.price,
+            "pieces": self.pieces,
+            "age": self.age,
+            "text_ids": self.text_ids,
+        }
+
+    @classmethod
+    def from_wire(cls, columns):
+        """
+        Inverse of to_wire, numeric columns copied as raw bytes, not reparsed
+        """
+        columnar = cls()
+        columnar.set_numbers = list(columns["set_numbers"])
+        columnar.rows = {
+            set_number: row for row, set_number in enumerate(columnar.set_numbers)
+        }
+        for field in ("price", "pieces", "age"):
+            getattr(columnar, field).frombytes(columns[field].cast("B"))
+
+        strings = columns["strings"]
+        for field in TEXT_FIELDS:
+            text_ids = columnar.text_ids[field]
+            for string_id in columns["text_ids"][field]:
+                text_ids.append(columnar.strings.intern(strings[string_id]))
+
+        return columnar
+
+    def to_dict(self):
+        return {set_number: self[set_number] for set_number in self}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        self.compact()
+        return iter(self.set_numbers)
+
+    def __contains__(self, set_number):
+        return set_number in self.rows
+
+    def __getitem__(self, set_number):
+        row = self.rows[set_number]
+        return {field: self.strings[self.text_ids[field][row]] for field in TEXT_FIELDS}
+
+    def add(self, set_number, set_details):
+        """
+        Insert or overwrite one set, parsing its numeric fields once
+
+        Like a dict, an overwritten set keeps its place in iteration order.
+        """
+        price = parse_price(set_details.get("set_price"))
+        price = float("nan") if price is None else price
+        pieces = to_int_column(parse_pieces(set_details.get("set_pieces")))
+        age = to_int_column(parse_age(set_details.get("set_age_group")))
+        text_ids = [
+            self.strings.intern(set_details.get(field, "")) for field in TEXT_FIELDS
+        ]
+
+        row = self.rows.get(set_number)
+        if row is None:
+            self.rows[set_number] = len(self.set_numbers)
+            self.set_numbers.append(set_number)
+            for field, text_id in zip(TEXT_FIELDS, text_ids):
+                self.text_ids[field].append(text_id)
+            self.price.append(price)
+            self.pieces.append(pieces)
+            self.age.append(age)
+            return
+
+        for field, text_id in zip(TEXT_FIELDS, text_ids):
+            self.strings.release(self.text_ids[field][row])
+            self.text_ids[field][row] = text_id
+        self.price[row] = price
+        self.pieces[row] = pieces
+        self.age[row] = age
+
+    def remove(self, set_number):
+        """
+        Drop one set, its row is only marked dead so the others keep their order
+        """
+        row = self.rows.pop(set_number)
+        self.set_numbers[row] = None
+        self.dead_rows.append(row)
+
+        for field in TEXT_FIELDS:
+            self.strings.release(self.text_ids[field][row])
+
+        # Bound the dead rows when nothing reads the columns for a while
+        if len(self.dead_rows) > len(self.rows):
+            self.compact()
+
+    def compact(self):
+        """
+        Squeeze out dead rows in one pass, keeping the live ones in order
+
+        Anything reading the columns or set_numbers row by row calls this
+        first. The columns are replaced, not shrunk in place, so NumPy views
+        taken before stay valid (over the old rows).
+        """
+        if not self.dead_rows:
+            return
+
+        dead_rows = sorted(self.dead_rows)
+        # The live runs between dead rows, each copied as one slice
+        runs = list(
+            zip(
+                [0, *(row + 1 for row in dead_rows)],
+                [*dead_rows, len(self.set_numbers)],
+            )
+        )
+
+        def squeeze(column):
+            squeezed = column[:0]
+            for start, end in runs:
+                squeezed += column[start:end]
+            return squeezed
+
+        self.set_numbers = squeeze(self.set_numbers)
+        self.price = squeeze(self.price)
+        self.pieces = squeeze(self.pieces)
+        self.age = squeeze(self.age)
+        self.text_ids = {
+            field: squeeze(text_ids) for field, text_ids in self.text_ids.items()
+        }
+
+        # Rows before the first dead one haven't moved
+        first = dead_rows[0]
+        self.rows.update(
+            zip(self.set_numbers[first:], range(first, len(self.set_numbers)))
+        )
+        self.dead_rows = []
+
+    def price_of(self, set_number):
+        price = self.price[self.rows[set_number]]
+        return None if price != price else price
+
+    def pieces_of(self, set_number):
+        pieces = self.pieces[self.rows[set_number]]
+        return None if pieces == MISSING_INT else pieces
+
+    def age_of(self, set_number):
+        age = self.age[self.rows[set_number]]
+        return None if age == MISSING_INT else age
+
+    def text_of(self, set_number, field):
+        return self.strings[self.text_ids[field][self.rows[set_number]]]
@@ -0,0 +1,136 @@
+from hashlib import blake2b
+
+from common.columnar import TEXT_FIELDS
+from common.wishlist_store import add_op, delete_op
+
+# Sets are spread over this many buckets, each with one combined hash
+BUCKET_COUNT = 256
+
+# Between fields when hashing, not something typed into a set
+FIELD_SEPARATOR = "\x1f"
+
+
+def digest(data):
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+def set_hash(set_number, set_details):
+    """
+    64-bit hash of a set's number and text fields, equal sets hash equal
+    """
+    fields = [set_number, *(set_details.get(field, "") for field in TEXT_FIELDS)]
+    return digest(FIELD_SEPARATOR.join(fields).encode())
+
+
+def bucket_of(set_number):
+    return digest(set_number.encode()) % BUCKET_COUNT
+
+
+class HashTree:
+    def __init__(self) -> None:
+        """
+        Two-level hash tree of one wishlist: root <- buckets <- sets
+
+        A bucket's hash is the XOR of its sets' hashes, so adding/removing a
+        set updates it in O(1) and the order sets came in doesn't matter.
+        """
+        # set_number -> set hash, per bucket
+        self.buckets = [{} for _ in range(BUCKET_COUNT)]
+        self.bucket_hashes = [0] * BUCKET_COUNT
+        self.size = 0
+
+    @classmethod
+    def from_wishlist(cls, wishlist):
+        tree = cls()
+
+        for set_number, set_details in wishlist.items():
+            tree.add(set_number, set_details)
+
+        return tree
+
+    def add(self, set_number, set_details):
+        self.discard(set_number)
+
+        bucket = bucket_of(set_number)
+        hash_value = set_hash(set_number, set_details)
+        self.buckets[bucket][set_number] = hash_value
+        self.bucket_hashes[bucket] ^= hash_value
+        self.size += 1
+
+    def discard(self, set_number):
+        bucket = bucket_of(set_number)
+        hash_value = self.buckets[bucket].pop(set_number, None)
+
+        if hash_value is not None:
+            self.bucket_hashes[bucket] ^= hash_value
+            self.size -= 1
+
+    def refresh(self, set_number, wishlist):
+        """
+        Rehash one set after an op on it, dropping it if it's gone
+        """
+        if set_number in wishlist:
+            self.add(set_number, wishlist[set_number])
+        else:
+            self.discard(set_number)
+
+    def root(self):
+        return digest(
+            b"".join(
+                hash_value.to_bytes(8, "little") for hash_value in self.bucket_hashes
+            )
+        )
+
+    def differing_buckets(self, bucket_hashes):
+        return [
+            bucket
+            for bucket, hash_value in enumerate(self.bucket_hashes)
+            if hash_value != bucket_hashes[bucket]
+        ]
+
+    def hashes_in(self, buckets):
+        return {
+            set_number: hash_value
+            for bucket in buckets
+            for set_number, hash_value in self.buckets[bucket].items()
+        }
+
+
+class WishlistHashes:
+    def __init__(self) -> None:
+        """
+        Wishlist store listener keeping a HashTree per wishlist ID
+        """
+        self.trees = {}
+
+    def get(self, wishlist_id):
+        return self.trees.setdefault(wishlist_id, HashTree())
+
+    def set_added(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).add(set_number, wishlist[set_number])
+
+    def set_removed(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).discard(set_number)
+
+    def wishlist_reset(self, wishlist_id, wishlist):
+        self.trees[wishlist_id] = HashTree.from_wishlist(wishlist)
+
+
+def sync_ops(tree, wishlist, wishlist_id, buckets, remote_hashes):
+    """
+    Ops that make a peer's copy of buckets match ours, from its set hashes
+
+    Only sets that differ are in them, changed/missing sets as adds.
+    """
+    local_hashes = tree.hashes_in(buckets)
+    ops = [
+        add_op(wishlist_id, set_number, dict(wishlist[set_number]))
+        for set_number, hash_value in local_hashes.items()
+        if remote_hashes.get(set_number) != hash_value
+    ]
+    ops += [
+        delete_op(wishlist_id, set_number)
+        for set_number in remote_hashes
+        if set_number not in local_hashes
+    ]
+    return ops
@@ -0,0 +1,192 @@
+import json
+import os
+
+from common.binary_snapshot import MappedWishlist, OverlayWishlist, write_snapshot
+
+# Don't bother compacting logs smaller than this
+MIN_COMPACT_BYTES = 1024 * 1024
+
+# Changed sets held in memory over the mapped snapshot before compacting
+MAX_PENDING_SETS = 100_000
+
+
+def apply_op(wishlist, op):
+    """
+    Apply one wishlist store op (add/edit/delete/replace) to a plain dict
+    """
+    kind = op["op"]
+
+    if kind == "add":
+        wishlist[op["set_number"]] = dict(op["set_details"])
+    elif kind == "edit":
+        # Reassigned, not updated in place: mapped sets are read-only copies
+        wishlist[op["set_number"]] = {**wishlist[op["set_number"]], **op["changes"]}
+    elif kind == "delete":
+        del wishlist[op["set_number"]]
+    elif kind == "replace":
+        wishlist.clear()
+        wishlist.update(
+            (set_number, dict(set_details))
+            for set_number, set_details in op["wishlist"].items()
+        )
+    else:
+        raise ValueError(f"Unknown wishlist operation: {kind}")
+
+
+class WishlistJournal:
+    def __init__(self, data_dir, fsync=True) -> None:
+        """
+        Wishlist on disk: latest snapshot plus an append-only log of ops since
+
+        Every op is one appended line, so a write costs the same however big
+        the wishlist is. The log is folded into a new snapshot once it has
+        grown past the snapshot's own size, which keeps that cost amortised
+        O(1) per op and bounds how much has to be replayed on startup.
+
+        With fsync, an append returns only once its ops are on disk. Without
+        it appends are much cheaper, but a power loss (not a crash of just
+        this process) can lose the last ones already reported as saved.
+        """
+        self.data_dir = data_dir
+        self.snapshot_path = os.path.join(data_dir, "wishlist.snapshot.wuab")
+        # Snapshots written before the binary format, read once then replaced
+        self.json_snapshot_path = os.path.join(data_dir, "wishlist.snapshot.json")
+        self.log_path = os.path.join(data_dir, "wishlist.log")
+        self.fsync = fsync
+
+        # Sequence number of the last op written, snapshots record theirs
+        self.seq = 0
+        self.log_file = None
+        self.log_bytes = 0
+        self.snapshot_bytes = 0
+
+    def exists(self):
+        return any(
+            os.path.exists(path)
+            for path in (self.snapshot_path, self.json_snapshot_path, self.log_path)
+        )
+
+    def load(self):
+        """
+        Map the snapshot and replay the log tail on top of it
+
+        The returned OverlayWishlist reads unchanged sets straight from the
+        mapped file, so startup doesn't depend on the wishlist's size.
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        wishlist = OverlayWishlist({})
+
+        if os.path.exists(self.snapshot_path):
+            snapshot = MappedWishlist(self.snapshot_path)
+            wishlist.rebase(snapshot)
+            self.seq = snapshot.seq
+            self.snapshot_bytes = os.path.getsize(self.snapshot_path)
+        elif os.path.exists(self.json_snapshot_path):
+            with open(self.json_snapshot_path, encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            wishlist.rebase(snapshot["wishlist"])
+            self.seq = snapshot["seq"]
+            self.snapshot_bytes = os.path.getsize(self.json_snapshot_path)
+
+        good_bytes = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as log_file:
+                for line in log_file:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("Incomplete log line")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash, everything after it is lost
+                        break
+                    good_bytes += len(line)
+                    # Ops already folded into the snapshot are skipped
+                    if entry["seq"] > self.seq:
+                        apply_op(wishlist, entry["op"])
+                        self.seq = entry["seq"]
+
+        self.log_file = open(self.log_path, "ab")
+        self.log_file.truncate(good_bytes)
+        self.log_bytes = good_bytes
+
+        return wishlist
+
+    def append(self, ops, wishlist):
+        """
+        Log ops already applied to wishlist, compacting when the log is large
+        """
+        lines = []
+        for op in ops:
+            self.seq += 1
+            entry = {"seq": self.seq, "op": op}
+            lines.append(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+
+        data = b"".join(lines)
+        self.log_file.write(data)
+        self.log_file.flush()
+        if self.fsync:
+            os.fsync(self.log_file.fileno())
+        self.log_bytes += len(data)
+
+        if self.log_bytes > max(MIN_COMPACT_BYTES, self.snapshot_bytes):
+            self.snapshot(wishlist)
+        elif (
+            isinstance(wishlist, OverlayWishlist)
+            and len(wishlist.changed) > MAX_PENDING_SETS
+        ):
+            # Bulk imports would otherwise keep every new set in the overlay
+            self.snapshot(wishlist)
+
+    def snapshot(self, wishlist):
+        """
+        Write a full binary snapshot atomically, then start an empty log
+
+        Returns the new snapshot, mapped. Returns None, keeping the old
+        snapshot and log, when the old snapshot can't be replaced yet
+        (Windows, still mapped by another process); a later append tries again.
+        """
+        mapped = None
+        if isinstance(wishlist, OverlayWishlist) and isinstance(
+            wishlist.base, MappedWishlist
+        ):
+            mapped = wishlist.base
+
+        try:
+            write_snapshot(
+                self.snapshot_path,
+                wishlist,
+                self.seq,
+                unmap=None if mapped is None else mapped.close,
+            )
+        except PermissionError:
+            if mapped is None or not mapped.mmap.closed:
+                raise
+            # Same file as before, the overlay's changes still apply to it
+            wishlist.base = MappedWishlist(self.snapshot_path)
+            return None
+        if os.path.exists(self.json_snapshot_path):
+            os.remove(self.json_snapshot_path)
+        if self.fsync:
+            # The snapshot's rename must be on disk before the log is emptied
+            directory = os.open(self.data_dir, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+        # A crash before this truncate is fine, replay skips seq <= snapshot's
+        self.log_file.truncate(0)
+        self.log_bytes = 0
+        self.snapshot_bytes = os.path.getsize(self.snapshot_path)
+
+        # Fold the in-memory changes away, reads go to the new mapping
+        snapshot = MappedWishlist(self.snapshot_path)
+        if isinstance(wishlist, OverlayWishlist):
+            wishlist.rebase(snapshot)
+
+        return snapshot
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
@@ -0,0 +1,33 @@
+import math
+
+
+def parse_price(set_price):
+    """
+    "849.99" -> 849.99, None when the price is missing or not a number
+    """
+    try:
+        price = float(set_price)
+    except (TypeError, ValueError):
+        return None
+
+    return price if math.isfinite(price) else None
+
+
+def parse_pieces(set_pieces):
+    """
+    "7541" -> 7541, None when the piece count is missing or not a number
+    """
+    try:
+        return int(set_pieces)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_age(set_age_group):
+    """
+    "16+" -> 16, None when the age group is missing or not a number
+    """
+    try:
+        return int(set_age_group.rstrip("+"))
+    except (AttributeError, ValueError):
+        return None
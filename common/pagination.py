@@ -0,0 +1,142 @@
+import base64
+import heapq
+import json
+from itertools import islice
+
+DEFAULT_PAGE_SIZE = 20
+
+# Request fields that pick a page rather than the result
+PAGE_FIELDS = ("offset", "limit", "cursor")
+
+
+def encode_cursor(offset, **fields):
+    payload = json.dumps({"offset": offset, **fields}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def cursor_fields(cursor):
+    """
+    Everything a cursor carries: its offset plus whatever its page added
+    """
+    try:
+        fields = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(fields, dict):
+        raise ValueError("Invalid cursor")
+    return fields
+
+
+def decode_cursor(cursor):
+    offset = cursor_fields(cursor).get("offset")
+    # Whole numbers only: JSON also gives floats, Infinity, 1e400, true
+    if type(offset) is not int:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def count_param(message, field):
+    """
+    Request field as a whole number not below 0, None when it's not given
+    """
+    value = message.get(field)
+    if value is None:
+        return None
+
+    try:
+        count = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Invalid {field}: {value!r}")
+    if count < 0:
+        raise ValueError(f"{field} must not be negative")
+
+    return count
+
+
+def page_params(message):
+    """
+    (offset, limit) of a request, from its cursor or plain offset/limit fields
+    """
+    cursor = message.get("cursor")
+    offset = decode_cursor(cursor) if cursor else count_param(message, "offset") or 0
+
+    if offset < 0:
+        raise ValueError("Offset must not be negative")
+
+    return offset, count_param(message, "limit")
+
+
+def page_window(message, total):
+    """
+    (offset, limit, total) of a request, capped to its first top_k results
+    """
+    offset, limit = page_params(message)
+    k = count_param(message, "top_k")
+
+    if k is not None:
+        total = min(total, k)
+        remaining = max(total - offset, 0)
+        limit = remaining if limit is None else min(limit, remaining)
+
+    return offset, limit, total
+
+
+def check_cursor_version(message, version):
+    """
+    Refuse a cursor handed out at another version of the wishlist: its
+    offset points into a result that has changed since
+    """
+    cursor = message.get("cursor")
+    if cursor and cursor_fields(cursor).get("version", version) != version:
+        raise ValueError("Wishlist changed since the first page, start again")
+
+
+def page_response(page, offset, limit, total, version=None, **cursor):
+    """
+    Success reply carrying one page plus the cursor of the next one, if any
+
+    The next cursor is pinned to version, the wishlist version the page was
+    cut from (see check_cursor_version). Extra cursor fields go into it too.
+    """
+    has_more = limit is not None and offset + limit < total
+
+    return {
+        "status": "success",
+        "wishlist": page,
+        "offset": offset,
+        "total": total,
+        "version": version,
+        "next_cursor": (
+            encode_cursor(offset + limit, version=version, **cursor)
+            if has_more
+            else None
+        ),
+    }
+
+
+def paginate(set_numbers, offset, limit):
+    stop = None if limit is None else offset + limit
+    return list(islice(set_numbers, offset, stop))
+
+
+def top_k(set_numbers, k, sort_key, descending=False):
+    """
+    k first set numbers by sort_key without sorting them all (heap-based)
+
+    Same order as a SortedIndex gives: ties by set number (reversed when
+    descending), then unparseable keys last in set number order.
+    """
+    missing = []
+
+    def keyed():
+        for set_number in set_numbers:
+            key = sort_key(set_number)
+            if key is None:
+                missing.append(set_number)
+            else:
+                yield key, set_number
+
+    select = heapq.nlargest if descending else heapq.nsmallest
+    first = [set_number for _, set_number in select(k, keyed())]
+    return first + heapq.nsmallest(k - len(first), missing)
@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from common.vectorized import columns, valid_mask
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Wishlists smaller than this sort faster in one process than handing off
+DEFAULT_PARALLEL_THRESHOLD = 200_000
+
+# Keys of a numeric column, the only ones sorted in parallel
+PARALLEL_SORT_FIELDS = ("price", "pieces", "age")
+
+# Keys sampled per process to pick the bucket bounds
+SAMPLES_PER_PROCESS = 256
+
+
+def shared_array(memory, dtype, size):
+    return np.ndarray(size, dtype=dtype, buffer=memory.buf)
+
+
+def sort_range(arrays, low, high, start):
+    keys = arrays["keys"]
+    in_range = arrays["valid"].copy()
+    if low is not None:
+        in_range &= keys >= low
+    if high is not None:
+        in_range &= keys < high
+
+    rows = np.flatnonzero(in_range)
+    # Set number breaks ties, as SortedIndex's (key, set number) does
+    rows = rows[np.lexsort((arrays["numbers"][rows], keys[rows]))]
+    arrays["order"][start : start + len(rows)] = rows
+    return len(rows)
+
+
+def sort_bucket(shared, size, low, high, start):
+    """
+    Pool side: rows with low <= key < high by (key, set number), written
+    into the shared order array from start on
+    """
+    memories = {
+        name: SharedMemory(memory_name) for name, (memory_name, _) in shared.items()
+    }
+    try:
+        # Views go away with sort_range's frame, before the memory closes
+        return sort_range(
+            {
+                name: shared_array(memories[name], dtype, size)
+                for name, (_, dtype) in shared.items()
+            },
+            low,
+            high,
+            start,
+        )
+    finally:
+        for memory in memories.values():
+            memory.close()
+
+
+class ParallelSorter:
+    def __init__(self, processes=None, threshold=DEFAULT_PARALLEL_THRESHOLD) -> None:
+        """
+        Sorts big wishlists by a numeric field over a pool of processes
+
+        The key column, set numbers and the output go through shared
+        memory, never pickled. Keys are split into one range per process
+        at sampled bounds, so each sorted range lands in its own slice of
+        the output and nothing needs merging afterwards. One sorter can be
+        shared by threads; a copy sent to another process gets its own pool.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.threshold = threshold
+        # Started on first use, most wishlists never get this big
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"processes": self.processes, "threshold": self.threshold}
+
+    def __setstate__(self, state):
+        self.__init__(state["processes"], state["threshold"])
+
+    def handles(self, field, wishlist):
+        return (
+            np is not None
+            and self.processes > 1
+            and self.threshold > 0
+            and field in PARALLEL_SORT_FIELDS
+            and len(wishlist) >= self.threshold
+            # Pool workers (daemonic) can't start a pool of their own
+            and not multiprocessing.current_process().daemon
+        )
+
+    def sort(self, field, wishlist):
+        """
+        (set numbers with a key in (key, set number) order, the rest by set
+        number), what SortedIndex.build sorts into
+        """
+        with self.pool_lock:
+            if self.pool is None:
+                # Not forked: services run threads (heartbeats, lookups)
+                self.pool = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+
+        keys = columns(wishlist)[field]
+        valid = valid_mask(field, keys)
+        # Compared as text in the pool, no ranking pass over them all here
+        numbers = np.asarray(wishlist.set_numbers, dtype=str)
+        bounds = self.bucket_bounds(keys[valid])
+
+        # Each range's rows go right after the ones of the ranges below it
+        counts = np.bincount(
+            np.searchsorted(bounds, keys[valid], side="right"),
+            minlength=len(bounds) + 1,
+        )
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).tolist()
+        lows = [None, *bounds.tolist()]
+        highs = [*bounds.tolist(), None]
+
+        arrays = {
+            "keys": keys,
+            "valid": valid,
+            "numbers": numbers,
+            "order": np.empty(len(keys), dtype=np.int64),
+        }
+        memories = {
+            name: SharedMemory(create=True, size=max(values.nbytes, 1))
+            for name, values in arrays.items()
+        }
+        try:
+            for name, values in arrays.items():
+                shared_array(memories[name], values.dtype, len(values))[:] = values
+            shared = {
+                name: (memories[name].name, values.dtype.str)
+                for name, values in arrays.items()
+            }
+
+            for _ in self.pool.map(
+                sort_bucket,
+                [shared] * len(lows),
+                [len(keys)] * len(lows),
+                lows,
+                highs,
+                starts,
+            ):
+                pass
+
+            order = shared_array(memories["order"], np.int64, len(keys))
+            present = order[: int(valid.sum())].copy()
+            del order
+        finally:
+            for memory in memories.values():
+                memory.close()
+                memory.unlink()
+
+        missing = np.flatnonzero(~valid)
+        missing = missing[np.argsort(numbers[missing], kind="stable")]
+
+        # The wishlist's own str objects, picked out without a Python loop
+        set_numbers = np.array(wishlist.set_numbers, dtype=object)
+        return set_numbers[present].tolist(), set_numbers[missing].tolist()
+
+    def bucket_bounds(self, keys):
+        # Distinct sampled quantiles, equal keys always share a range
+        if not keys.size:
+            return keys[:0]
+        step = max(keys.size // (self.processes * SAMPLES_PER_PROCESS), 1)
+        sample = np.sort(keys[::step])
+        picks = np.linspace(0, sample.size, self.processes + 1)[1:-1].astype(int)
+        return np.unique(sample[picks])
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+
+def add_parallel_sort_arguments(parser):
+    parser.add_argument(
+        "--sort-processes",
+        type=int,
+        default=os.cpu_count(),
+        help="processes big wishlists are sorted over (needs NumPy)",
+    )
+    parser.add_argument(
+        "--parallel-sort-threshold",
+        type=int,
+        default=DEFAULT_PARALLEL_THRESHOLD,
+        help="sets a wishlist needs to be sorted in parallel, 0 turns it off",
+    )
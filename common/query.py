@@ -0,0 +1,120 @@
+from common.sorted_index import SORT_KEYS, set_number_key
+
+RANGE_FIELDS = ("age", "pieces", "price")
+
+# Indexes the filter service keeps: numeric ranges plus set numbers as text
+FILTER_INDEX_KEYS = {
+    "age": SORT_KEYS["age"],
+    "pieces": SORT_KEYS["pieces"],
+    "price": SORT_KEYS["price"],
+    "set_number_text": lambda set_number, wishlist: set_number,
+}
+
+
+def parse_where(where):
+    """
+    {"age": {"min": 10}, "name_contains": "falcon", ...} ->
+    ([(field, low, high), ...], name substring or None)
+    """
+    if not isinstance(where, dict):
+        raise ValueError(f"Invalid filter: {where}")
+
+    unknown = set(where) - {*RANGE_FIELDS, "name_contains", "set_number_prefix"}
+    if unknown:
+        raise ValueError(f"Unknown filter: {', '.join(sorted(unknown))}")
+
+    predicates = []
+
+    for field in RANGE_FIELDS:
+        if field not in where:
+            continue
+
+        bounds = where[field]
+        if not isinstance(bounds, dict):
+            raise ValueError(f"Invalid {field} range: {bounds}")
+
+        low, high = bounds.get("min"), bounds.get("max")
+        for bound in (low, high):
+            if bound is not None and not isinstance(bound, (int, float)):
+                raise ValueError(f"Invalid {field} bound: {bound}")
+        predicates.append((field, low, high))
+
+    for field in ("set_number_prefix", "name_contains"):
+        if where.get(field) is not None and not isinstance(where[field], str):
+            raise ValueError(f"Invalid {field}: {where[field]}")
+
+    prefix = where.get("set_number_prefix")
+    if prefix:
+        # Every string starting with the prefix sorts between these two
+        predicates.append(("set_number_text", prefix, prefix + "\U0010ffff"))
+
+    name = where.get("name_contains")
+    return predicates, name.casefold() if name else None
+
+
+def in_range(key, low, high):
+    return (
+        key is not None
+        and (low is None or key >= low)
+        and (high is None or key <= high)
+    )
+
+
+def name_matches(wishlist, set_number, name):
+    return name in wishlist.text_of(set_number, "set_name").casefold()
+
+
+def query_indexed(where, wishlist, indexes):
+    """
+    Set numbers matching every predicate, read off the per-field sorted indexes
+    """
+    predicates, name = parse_where(where)
+
+    if predicates:
+        # Walk the most selective range, probe the other fields per candidate
+        predicates.sort(
+            key=lambda predicate: indexes[predicate[0]].count_range(
+                predicate[1], predicate[2]
+            )
+        )
+        field, low, high = predicates[0]
+        candidates = indexes[field].range(low, high)
+        others = [
+            (indexes[field].keys, low, high) for field, low, high in predicates[1:]
+        ]
+        candidates = (
+            set_number
+            for set_number in candidates
+            if all(in_range(keys[set_number], low, high) for keys, low, high in others)
+        )
+    else:
+        candidates = iter(wishlist)
+
+    if name:
+        candidates = (
+            set_number
+            for set_number in candidates
+            if name_matches(wishlist, set_number, name)
+        )
+
+    return sorted(candidates, key=set_number_key)
+
+
+def query_scan(where, wishlist):
+    """
+    Same result as query_indexed for a one-off wishlist with no indexes
+    """
+    predicates, name = parse_where(where)
+
+    return sorted(
+        (
+            set_number
+            for set_number in wishlist
+            if all(
+                in_range(FILTER_INDEX_KEYS[field](set_number, wishlist), low, high)
+                for field, low, high in predicates
+            )
+            and (not name or name_matches(wishlist, set_number, name))
+        ),
+        key=set_number_key,
+    )
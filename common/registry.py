@@ -0,0 +1,129 @@
+import threading
+import time
+
+import zmq
+
+from common.wire import decode, send_message
+
+# Registry service: REP socket instances announce themselves / clients ask on
+REGISTRY_ADDRESS = "tcp://localhost:5561"
+
+# Well-known port of each scalable service, where a lone instance listens
+SERVICE_PORTS = {
+    "sort": 5555,
+    "filter": 5556,
+    "search": 5557,
+    "totals": 5558,
+}
+
+# Instances re-announce this often (seconds), and are dropped after missing
+# a few in a row
+HEARTBEAT_INTERVAL = 1.0
+HEARTBEAT_TIMEOUT = 3.5
+
+
+class ServiceRegistry:
+    def __init__(self, timeout=HEARTBEAT_TIMEOUT) -> None:
+        """
+        Live instances per service name, each kept until its heartbeats stop
+        """
+        self.timeout = timeout
+        # service name -> {address: time of its last heartbeat}
+        self.instances = {}
+
+    def heartbeat(self, service, address):
+        self.instances.setdefault(service, {})[address] = time.monotonic()
+
+    def remove(self, service, address):
+        self.instances.get(service, {}).pop(address, None)
+
+    def addresses(self, service):
+        """
+        Addresses of the service's instances still sending heartbeats
+        """
+        instances = self.instances.get(service, {})
+        oldest = time.monotonic() - self.timeout
+
+        for address in [
+            address for address, seen in instances.items() if seen < oldest
+        ]:
+            del instances[address]
+
+        return sorted(instances)
+
+
+def add_registry_arguments(parser, port):
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=port,
+        help="port to listen on, give each instance on a host its own",
+    )
+    parser.add_argument(
+        "--host",
+        default="localhost",
+        help="host name clients reach this instance by",
+    )
+    parser.add_argument(
+        "--registry",
+        default=REGISTRY_ADDRESS,
+        help="registry to announce this instance to, '' for none",
+    )
+
+
+class Announcer:
+    def __init__(self, services, args, interval=HEARTBEAT_INTERVAL) -> None:
+        """
+        Background thread announcing an instance of services to the registry
+
+        The first heartbeat registers the instance, stopping unregisters
+        it; one that dies without stopping is dropped once heartbeats stop.
+        """
+        self.services = services
+        self.address = f"tcp://{args.host}:{args.port}"
+        self.registry = args.registry
+        self.interval = interval
+
+        # Made on entering, after any worker processes have started
+        self.context = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.context = zmq.Context()
+        if self.registry:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.registry:
+            self.stopped.set()
+            self.thread.join()
+            self.send("unregister")
+        self.context.term()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.send("heartbeat")
+            self.stopped.wait(self.interval)
+
+    def send(self, command):
+        # Fresh REQ socket per message so a lost reply never wedges it
+        socket = self.context.socket(zmq.REQ)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.registry)
+
+        try:
+            send_message(
+                socket,
+                {
+                    "command": command,
+                    "services": self.services,
+                    "address": self.address,
+                },
+            )
+            # Registry down: keep beating, it picks the instance up once back
+            if socket.poll(self.interval * 1000):
+                decode(socket.recv_multipart())
+        finally:
+            socket.close()
@@ -0,0 +1,114 @@
+import json
+from collections import OrderedDict
+
+from common.wishlist_store import DEFAULT_WISHLIST_ID
+
+# Replies kept per worker, least recently used dropped first
+DEFAULT_CACHE_SIZE = 256
+
+# Request fields that pick the wishlist rather than the result
+WISHLIST_FIELDS = ("wishlist_id", "version")
+
+CACHE_STATS_REQUEST = {"command": "cache_stats"}
+
+
+def request_key(message):
+    """
+    Canonical text of a request's parameters, same for equal requests
+    """
+    parameters = {
+        field: value for field, value in message.items() if field not in WISHLIST_FIELDS
+    }
+    return json.dumps(parameters, sort_keys=True, default=str)
+
+
+class ResultCache:
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE) -> None:
+        """
+        LRU cache of replies keyed on (wishlist ID, version, request)
+
+        Also a wishlist store listener: any change to a wishlist drops its
+        entries, so stale replies never take up room until evicted.
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def reply(self, message, replica, handle):
+        """
+        handle()'s reply to message, reused while the wishlist is unchanged
+
+        Requests with the wishlist inline aren't cached: decoding it already
+        costs about as much as the work a cache hit would save.
+        """
+        if self.max_entries <= 0 or message.get("wishlist") is not None:
+            return handle()
+
+        # Brings the replica up to the requested version first
+        replica.wishlist_for(message)
+        wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+        key = (wishlist_id, replica.store.version(wishlist_id), request_key(message))
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        response = handle()
+        # Errors are cheap to work out again
+        if response["status"] == "success":
+            self.entries[key] = response
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        return response
+
+    def invalidate(self, wishlist_id):
+        for key in [key for key in self.entries if key[0] == wishlist_id]:
+            del self.entries[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+    def set_added(self, wishlist_id, set_number, wishlist):
+        self.invalidate(wishlist_id)
+
+    def set_removed(self, wishlist_id, set_number, wishlist):
+        self.invalidate(wishlist_id)
+
+    def wishlist_reset(self, wishlist_id, wishlist):
+        self.invalidate(wishlist_id)
+
+
+def merge_stats(shard_stats):
+    """
+    Cache stats of a sharded service, summed over its shards' caches
+    """
+    stats = {
+        field: sum(stats[field] for stats in shard_stats)
+        for field in ("entries", "max_entries", "hits", "misses", "evictions")
+    }
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+    return stats
+
+
+def add_cache_arguments(parser):
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="replies cached per worker for repeated queries, 0 turns it off",
+    )
@@ -0,0 +1,372 @@
+import bisect
+import heapq
+import math
+import re
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# A name word counts this many times a description word
+NAME_WEIGHT = 3
+
+# BM25 term frequency saturation / document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multiplier for words found by prefix / one typo instead of exactly
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+
+# Most frequent words a query word's prefix expands to
+MAX_PREFIX_TERMS = 50
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+
+# Too common to tell sets apart, not indexed
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the this to with your".split()
+)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [
+        word for word in WORD_PATTERN.findall(text.casefold()) if word not in STOP_WORDS
+    ]
+
+
+def one_char_deletes(word):
+    return {word[:position] + word[position + 1 :] for position in range(len(word))}
+
+
+class SearchIndex:
+    def __init__(self) -> None:
+        """
+        Inverted index over set numbers, names and descriptions, BM25-ranked
+
+        Each set gets a document ID; a word's postings are parallel arrays of
+        document IDs and (name-weighted) term frequencies. Removed sets are
+        only flagged dead and skipped, their postings are dropped in bulk
+        once dead documents outnumber live ones.
+        """
+        # Document ID -> set number / alive flag / weighted word count
+        self.set_numbers = []
+        self.alive = bytearray()
+        self.lengths = array("I")
+        self.doc_ids = {}
+        self.total_length = 0
+
+        # word -> (document IDs, term frequencies)
+        self.postings = {}
+        # word -> live documents containing it
+        self.doc_counts = {}
+        # Every live word in order, for prefix lookups
+        self.words = []
+        # word with one character deleted -> words, for typo lookups
+        self.deletes = {}
+
+    @classmethod
+    def from_wishlist(cls, wishlist):
+        index = cls()
+
+        for set_number in wishlist:
+            index.add(set_number, wishlist)
+
+        return index
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def term_frequencies(self, set_number, set_details):
+        frequencies = {}
+
+        for word in tokenize(f"{set_number} {set_details['set_name']}"):
+            frequencies[word] = frequencies.get(word, 0) + NAME_WEIGHT
+        for word in tokenize(set_details["set_description"]):
+            frequencies[word] = frequencies.get(word, 0) + 1
+
+        return frequencies
+
+    def add(self, set_number, wishlist):
+        """
+        Index set_number as it is in wishlist (not already indexed)
+        """
+        frequencies = self.term_frequencies(set_number, wishlist[set_number])
+        doc_id = len(self.set_numbers)
+        self.set_numbers.append(set_number)
+        self.alive.append(1)
+        self.doc_ids[set_number] = doc_id
+        length = sum(frequencies.values())
+        self.lengths.append(length)
+        self.total_length += length
+
+        for word, frequency in frequencies.items():
+            if word not in self.postings:
+                self.add_word(word)
+            doc_ids, term_frequencies = self.postings[word]
+            doc_ids.append(doc_id)
+            term_frequencies.append(min(frequency, 0xFFFF))
+            self.doc_counts[word] += 1
+
+    def remove(self, set_number, wishlist):
+        """
+        Drop set_number, read back from wishlist (it must still be there)
+        """
+        doc_id = self.doc_ids.pop(set_number, None)
+        if doc_id is None:
+            return
+
+        self.alive[doc_id] = 0
+        self.total_length -= self.lengths[doc_id]
+
+        for word in self.term_frequencies(set_number, wishlist[set_number]):
+            self.doc_counts[word] -= 1
+            if self.doc_counts[word] == 0:
+                self.remove_word(word)
+
+        if len(self.set_numbers) > 2 * len(self.doc_ids) + 1024:
+            self.compact()
+
+    def add_word(self, word):
+        self.postings[word] = (array("I"), array("H"))
+        self.doc_counts[word] = 0
+        bisect.insort(self.words, word)
+        for deleted in one_char_deletes(word):
+            self.deletes.setdefault(deleted, set()).add(word)
+
+    def remove_word(self, word):
+        del self.postings[word]
+        del self.doc_counts[word]
+        del self.words[bisect.bisect_left(self.words, word)]
+        for deleted in one_char_deletes(word):
+            self.deletes[deleted].discard(word)
+            if not self.deletes[deleted]:
+                del self.deletes[deleted]
+
+    def compact(self):
+        """
+        Renumber live documents and drop dead ones from every posting list
+        """
+        new_ids = {}
+        set_numbers = []
+        lengths = array("I")
+
+        for doc_id, set_number in enumerate(self.set_numbers):
+            if self.alive[doc_id]:
+                new_ids[doc_id] = len(set_numbers)
+                set_numbers.append(set_number)
+                lengths.append(self.lengths[doc_id])
+
+        for word, (doc_ids, term_frequencies) in self.postings.items():
+            kept = [
+                (new_ids[doc_id], frequency)
+                for doc_id, frequency in zip(doc_ids, term_frequencies)
+                if doc_id in new_ids
+            ]
+            self.postings[word] = (
+                array("I", [doc_id for doc_id, _ in kept]),
+                array("H", [frequency for _, frequency in kept]),
+            )
+
+        self.set_numbers = set_numbers
+        self.alive = bytearray(b"\1" * len(set_numbers))
+        self.lengths = lengths
+        self.doc_ids = {
+            set_number: doc_id for doc_id, set_number in enumerate(set_numbers)
+        }
+
+    def prefix_words(self, prefix):
+        start = bisect.bisect_left(self.words, prefix)
+        stop = bisect.bisect_left(self.words, prefix + "\U0010ffff")
+        return self.words[start:stop]
+
+    def fuzzy_words(self, word):
+        """
+        Indexed words one insert / delete / substitution away from word
+        """
+        candidates = set(self.deletes.get(word, ()))
+        for deleted in one_char_deletes(word):
+            if deleted in self.doc_counts:
+                candidates.add(deleted)
+            candidates |= self.deletes.get(deleted, set())
+
+        # Deletes on both sides also pair up e.g. "ab" / "ba", keep real typos
+        return [
+            candidate
+            for candidate in candidates
+            if candidate != word and within_one_edit(word, candidate)
+        ]
+
+    def expand(self, word):
+        """
+        {indexed word: score multiplier} a query word stands for
+        """
+        matches = {}
+
+        if len(word) >= MIN_PREFIX_LENGTH:
+            prefixed = heapq.nlargest(
+                MAX_PREFIX_TERMS, self.prefix_words(word), key=self.doc_counts.get
+            )
+            matches.update((prefixed_word, PREFIX_WEIGHT) for prefixed_word in prefixed)
+        if word in self.doc_counts:
+            matches[word] = 1.0
+        if not matches and len(word) >= MIN_FUZZY_LENGTH:
+            matches.update((typo, FUZZY_WEIGHT) for typo in self.fuzzy_words(word))
+
+        return matches
+
+    def query_terms(self, query):
+        """
+        {indexed word: multiplier} for a query, best multiplier per word
+        """
+        terms = {}
+
+        for query_word in tokenize(query):
+            for word, weight in self.expand(query_word).items():
+                terms[word] = max(weight, terms.get(word, 0.0))
+
+        return terms
+
+    def idf(self, word):
+        documents = len(self.doc_ids)
+        count = self.doc_counts[word]
+        return math.log(1 + (documents - count + 0.5) / (count + 0.5))
+
+    def search(self, query, count=None, backend="python"):
+        """
+        (total matches, [set numbers of the best count matches, best first])
+        """
+        terms = self.query_terms(query)
+        if not terms or not self.doc_ids:
+            return 0, []
+
+        average_length = self.total_length / len(self.doc_ids)
+
+        if backend == "numpy":
+            return self.vector_search(terms, count, average_length)
+
+        scores = {}
+        for word, weight in terms.items():
+            doc_ids, term_frequencies = self.postings[word]
+            term_weight = weight * self.idf(word)
+
+            for doc_id, frequency in zip(doc_ids, term_frequencies):
+                if not self.alive[doc_id]:
+                    continue
+                normalized_length = self.lengths[doc_id] / average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + term_weight * (
+                    frequency
+                    * (BM25_K1 + 1)
+                    / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * normalized_length))
+                )
+
+        def rank_key(doc_id):
+            # Best score first, ties in the order sets were added
+            return -scores[doc_id], doc_id
+
+        if count is None:
+            best = sorted(scores, key=rank_key)
+        else:
+            best = heapq.nsmallest(count, scores, key=rank_key)
+
+        return len(scores), [self.set_numbers[doc_id] for doc_id in best]
+
+    def vector_search(self, terms, count, average_length):
+        """
+        Same ranking as search, postings scored as NumPy arrays
+        """
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        all_doc_ids = []
+        contributions = []
+
+        for word, weight in terms.items():
+            doc_ids, term_frequencies = self.postings[word]
+            doc_ids = np.frombuffer(doc_ids, dtype=np.uint32)
+            frequencies = np.frombuffer(term_frequencies, dtype=np.uint16).astype(
+                np.float64
+            )
+            normalized_lengths = lengths[doc_ids] / average_length
+            term_weight = weight * self.idf(word)
+            all_doc_ids.append(doc_ids)
+            # Same operation order as search, so scores (and ties) match exactly
+            contributions.append(
+                term_weight
+                * (
+                    frequencies
+                    * (BM25_K1 + 1)
+                    / (
+                        frequencies
+                        + BM25_K1 * (1 - BM25_B + BM25_B * normalized_lengths)
+                    )
+                )
+            )
+
+        all_doc_ids = np.concatenate(all_doc_ids)
+        contributions = np.concatenate(contributions)
+
+        if len(all_doc_ids) * 4 < len(self.set_numbers):
+            # Selective query: sum per matching document, nothing index-sized
+            matches, positions = np.unique(all_doc_ids, return_inverse=True)
+            match_scores = np.bincount(positions, weights=contributions)
+        else:
+            scores = np.bincount(
+                all_doc_ids, weights=contributions, minlength=len(self.set_numbers)
+            )
+            matches = np.flatnonzero(scores)
+            match_scores = scores[matches]
+
+        alive = np.frombuffer(self.alive, dtype=np.uint8)[matches].astype(bool)
+        matches = matches[alive]
+        match_scores = match_scores[alive]
+        total = len(matches)
+
+        # Only matches scoring at least the count-th best get sorted
+        if count is not None and count < len(matches):
+            cutoff = -np.partition(-match_scores, count - 1)[count - 1]
+            best = match_scores >= cutoff
+            matches = matches[best]
+            match_scores = match_scores[best]
+
+        # Best score first, ties in the order sets were added (doc ID order)
+        best = matches[np.lexsort((matches, -match_scores))][:count]
+        return total, [self.set_numbers[doc_id] for doc_id in best.tolist()]
+
+
+def within_one_edit(word, other):
+    if abs(len(word) - len(other)) > 1:
+        return False
+    if len(word) > len(other):
+        word, other = other, word
+
+    # Skip the common prefix, what's left must differ by one edit
+    position = 0
+    while position < len(word) and word[position] == other[position]:
+        position += 1
+
+    if len(word) == len(other):
+        return word[position + 1 :] == other[position + 1 :]
+    return word[position:] == other[position + 1 :]
+
+
+class WishlistSearchIndexes:
+    def __init__(self) -> None:
+        """
+        Wishlist store listener keeping a SearchIndex per wishlist ID
+        """
+        self.indexes = {}
+
+    def get(self, wishlist_id):
+        return self.indexes.setdefault(wishlist_id, SearchIndex())
+
+    def set_added(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).add(set_number, wishlist)
+
+    def set_removed(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).remove(set_number, wishlist)
+
+    def wishlist_reset(self, wishlist_id, wishlist):
+        self.indexes[wishlist_id] = SearchIndex.from_wishlist(wishlist)
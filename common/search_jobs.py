@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+import webbrowser
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+
+# Results kept per lookup backend, and for how long (seconds)
+DEFAULT_LOOKUP_TTL = 300.0
+MAX_CACHED_LOOKUPS = 1024
+
+# Lookups run at once, the rest queue
+DEFAULT_LOOKUP_THREADS = 4
+
+MAX_LOOKUP_RESULTS = 10
+
+
+def search_url(query):
+    return f"https://www.google.com/search?q={quote_plus(f'LEGO {query}')}"
+
+
+class CatalogueLookup:
+    def __init__(self, catalogue) -> None:
+        """
+        Local stand-in for a web lookup: searches the --catalogue file
+        """
+        self.catalogue = catalogue
+
+    def __call__(self, query):
+        if self.catalogue is None:
+            raise ValueError("No catalogue loaded")
+
+        catalogue, search_index, _ = self.catalogue
+        _, set_numbers = search_index.search(query, MAX_LOOKUP_RESULTS)
+        return [
+            {
+                "set_number": set_number,
+                "set_name": catalogue.text_of(set_number, "set_name"),
+                "url": search_url(set_number),
+            }
+            for set_number in set_numbers
+        ]
+
+
+class BrowserLookup:
+    def __init__(self, catalogue=None) -> None:
+        """
+        The original web search: a Google tab opened on the service's host
+        """
+
+    def __call__(self, query):
+        url = search_url(query)
+        webbrowser.open_new_tab(url)
+        return [{"set_number": "", "set_name": f"LEGO {query}", "url": url}]
+
+
+# --lookup-backend name -> backend class, each called as backend(query)
+LOOKUP_BACKENDS = {
+    "catalogue": CatalogueLookup,
+    "browser": BrowserLookup,
+}
+
+
+def job_id_for(backend_name, query):
+    # Same query, same job: lets identical lookups share one run
+    return hashlib.sha1(f"{backend_name}\0{query}".encode()).hexdigest()[:16]
+
+
+class LookupJobs:
+    def __init__(
+        self,
+        backend,
+        backend_name,
+        threads=DEFAULT_LOOKUP_THREADS,
+        ttl=DEFAULT_LOOKUP_TTL,
+    ) -> None:
+        """
+        Lookups run on a thread pool so the request loop never waits on one
+
+        submit() answers at once with the job's state. Identical queries
+        in flight share a job, finished ones are cached for ttl seconds.
+        """
+        self.backend = backend
+        self.backend_name = backend_name
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="lookup")
+
+        # Touched by the request loop and by finishing lookups (re-entrant:
+        # a lookup already done finishes inside submit)
+        self.lock = threading.RLock()
+        # job ID -> future of the lookup
+        self.running = {}
+        # job ID -> (expiry time, results), least recently used first
+        self.results = OrderedDict()
+        # job ID -> error, reported once, the next submit retries
+        self.failures = {}
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, query):
+        """
+        {"job_id", "state", "results" once done} for a lookup of query
+        """
+        query = " ".join(query.split())
+        job_id = job_id_for(self.backend_name, query.casefold())
+
+        with self.lock:
+            cached = self.results.get(job_id)
+            if cached is not None and cached[0] > time.monotonic():
+                self.hits += 1
+                self.results.move_to_end(job_id)
+                return {"job_id": job_id, "state": "done", "results": cached[1]}
+            if cached is not None:
+                # Expired, looked up again
+                del self.results[job_id]
+
+            if job_id in self.failures:
+                error = self.failures.pop(job_id)
+                return {"job_id": job_id, "state": "failed", "message": error}
+
+            if job_id not in self.running:
+                self.misses += 1
+                future = self.executor.submit(self.backend, query)
+                self.running[job_id] = future
+                future.add_done_callback(lambda future: self.finish(job_id, future))
+
+            return self.status(job_id)
+
+    def finish(self, job_id, future):
+        with self.lock:
+            del self.running[job_id]
+            # Dropped by close() before it ran, exception() would raise
+            if future.cancelled():
+                self.failures[job_id] = "Lookup cancelled, the service is stopping"
+            elif future.exception() is None:
+                self.results[job_id] = (time.monotonic() + self.ttl, future.result())
+                self.results.move_to_end(job_id)
+                if len(self.results) > MAX_CACHED_LOOKUPS:
+                    self.results.popitem(last=False)
+            else:
+                self.failures[job_id] = str(future.exception())
+
+    def status(self, job_id):
+        with self.lock:
+            if job_id in self.results:
+                return {
+                    "job_id": job_id,
+                    "state": "done",
+                    "results": self.results[job_id][1],
+                }
+            if job_id in self.failures:
+                return {
+                    "job_id": job_id,
+                    "state": "failed",
+                    "message": self.failures.pop(job_id),
+                }
+
+        return {"job_id": job_id, "state": "pending"}
+
+    def stats(self):
+        with self.lock:
+            return {
+                "running": len(self.running),
+                "cached": len(self.results),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
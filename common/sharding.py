@@ -0,0 +1,194 @@
+import heapq
+import zlib
+from itertools import islice
+
+from common.pagination import (
+    check_cursor_version,
+    cursor_fields,
+    page_params,
+    page_response,
+    page_window,
+)
+from common.wishlist_store import WishlistStore
+
+# Ops about one set, applied by the shard owning it only
+SET_OPS = ("add", "edit", "delete")
+
+
+def shard_of(set_number, shard_count):
+    # Same shard in every process and on every host, unlike hash()
+    return zlib.crc32(set_number.encode()) % shard_count
+
+
+class ShardedStore(WishlistStore):
+    def __init__(self, shard, shard_count) -> None:
+        """
+        WishlistStore holding only the sets of one shard of every wishlist
+
+        Ops about other shards' sets still count towards the version, so
+        replicas stay in step with the store's numbering.
+        """
+        super().__init__()
+        self.shard = shard
+        self.shard_count = shard_count
+
+    def owns(self, set_number):
+        return shard_of(set_number, self.shard_count) == self.shard
+
+    def apply(self, op):
+        if op["op"] in SET_OPS and not self.owns(op["set_number"]):
+            wishlist_id = op["wishlist_id"]
+            self.versions[wishlist_id] = self.version(wishlist_id) + 1
+            return self.versions[wishlist_id]
+
+        return super().apply(op)
+
+    def _reset(self, wishlist_id, wishlist):
+        super()._reset(
+            wishlist_id,
+            {
+                set_number: wishlist[set_number]
+                for set_number in wishlist
+                if self.owns(set_number)
+            },
+        )
+
+
+def add_shard_arguments(parser):
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="worker processes each holding 1/N of every wishlist, "
+        "requests go to all of them and their replies are merged",
+    )
+
+
+def shard_store(args):
+    """
+    Store for a worker's replica: its shard's sets only, when sharded
+    """
+    shard = getattr(args, "shard", None)
+    return None if shard is None else ShardedStore(shard, args.shards)
+
+
+def shard_offsets(message, shard_count):
+    """
+    Where each shard's sets carry on, from the cursor of a sharded page
+
+    None for any other request, or a cursor from a frontend with another
+    number of shards: those are paged by offset.
+    """
+    cursor = message.get("cursor")
+    offsets = cursor_fields(cursor).get("shards") if cursor else None
+
+    if (
+        not isinstance(offsets, list)
+        or len(offsets) != shard_count
+        or not all(type(offset) is int and offset >= 0 for offset in offsets)
+    ):
+        return None
+    return offsets
+
+
+def first_pages_request(message, shard_count):
+    """
+    What each shard is asked for one page, one message per shard
+
+    Following a sharded page's cursor, each shard sends its next limit sets
+    from where that page left it. Otherwise each sends its own first
+    offset + limit sets. Either way the page is made of those, merged.
+    """
+    offset, limit = page_params(message)
+    offsets = shard_offsets(message, shard_count)
+    shard_message = {
+        field: value for field, value in message.items() if field != "cursor"
+    }
+
+    if offsets is None:
+        shard_message["offset"] = 0
+        shard_message["limit"] = None if limit is None else offset + limit
+        return [shard_message] * shard_count
+
+    return [
+        {**shard_message, "offset": shard_offset, "limit": limit}
+        for shard_offset in offsets
+    ]
+
+
+def merge_pages(replies):
+    """
+    Shard replies of pages -> (all their sets, each shard's set numbers in
+    order, summed totals)
+    """
+    wishlist = {}
+    for reply in replies:
+        wishlist.update(reply["wishlist"])
+
+    return (
+        wishlist,
+        [list(reply["wishlist"]) for reply in replies],
+        sum(reply["total"] for reply in replies),
+    )
+
+
+def merge_page(message, replies, merge):
+    """
+    Page reply of a sharded request out of its shards' first_pages_request
+    replies
+
+    merge(sets, streams, count) gives the first count set numbers of the
+    shards' sets in result order (all of them for None). The next cursor
+    keeps how far each shard got, so the next page skips what this one
+    was made of instead of asking every shard for it again.
+    """
+    version = replies[0].get("version")
+    if any(reply.get("version") != version for reply in replies):
+        # A change reached some shards only so far, their pages don't line up
+        return {"status": "error", "message": "Wishlist changed, try again"}
+
+    try:
+        check_cursor_version(message, version)
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+
+    sets, streams, total = merge_pages(replies)
+    offset, limit, total = page_window(message, total)
+    offsets = shard_offsets(message, len(replies))
+
+    if offsets is None:
+        # Shards sent their sets from the first, this page starts at offset
+        skip, offsets = offset, [0] * len(replies)
+    else:
+        skip = 0
+
+    count = None if limit is None else skip + limit
+    merged = list(islice(merge(sets, streams, count), count))
+    taken = set(merged)
+
+    return page_response(
+        {set_number: sets[set_number] for set_number in merged[skip:]},
+        offset,
+        limit,
+        total,
+        version,
+        shards=[
+            shard_offset + sum(set_number in taken for set_number in stream)
+            for shard_offset, stream in zip(offsets, streams)
+        ],
+    )
+
+
+def merge_sorted(streams, key, descending=False):
+    """
+    k-way merge of per-shard streams already sorted by key
+    """
+    return heapq.merge(*streams, key=key, reverse=descending)
+
+
+def failed_reply(replies):
+    # Shards run the same code on the same request, one failing is enough
+    for reply in replies:
+        if reply.get("status") != "success":
+            return reply
+    return None
@@ -0,0 +1,169 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+
+
+def set_number_key(set_number):
+    # Numeric set numbers in numeric order, anything else after them by text;
+    # ASCII only, isdigit() alone also passes digits int() rejects (e.g. "²")
+    if set_number.isascii() and set_number.isdigit():
+        return (0, int(set_number), set_number)
+    return (1, 0, set_number)
+
+
+def name_key(set_name):
+    return set_name.casefold() if isinstance(set_name, str) else None
+
+
+# Sort key per field, read off a ColumnarWishlist's already-parsed columns;
+# None means the value can't be ordered (e.g. a price that isn't a number)
+SORT_KEYS = {
+    "price": lambda set_number, wishlist: wishlist.price_of(set_number),
+    "pieces": lambda set_number, wishlist: wishlist.pieces_of(set_number),
+    "age": lambda set_number, wishlist: wishlist.age_of(set_number),
+    "set_number": lambda set_number, wishlist: set_number_key(set_number),
+    "name": lambda set_number, wishlist: name_key(
+        wishlist.text_of(set_number, "set_name")
+    ),
+}
+
+
+class SortedIndex:
+    def __init__(self, key_fn) -> None:
+        """
+        Set numbers kept ordered by one field, updated per set instead of resorted
+        """
+        self.key_fn = key_fn
+        # Sorted (key, set_number) pairs, plus sets whose key can't be parsed
+        self.entries = []
+        self.missing = []
+        # Parsed key per set number, for O(1) predicate checks
+        self.keys = {}
+
+    def __len__(self):
+        return len(self.entries) + len(self.missing)
+
+    def build(self, wishlist, presorted=None):
+        """
+        Index every set of wishlist; presorted is (set numbers with a key in
+        index order, the rest in order) when already sorted elsewhere
+        """
+        self.keys = {
+            set_number: self.key_fn(set_number, wishlist) for set_number in wishlist
+        }
+
+        if presorted is not None:
+            present, self.missing = presorted
+            self.entries = [
+                (self.keys[set_number], set_number) for set_number in present
+            ]
+            return
+
+        self.entries = [
+            (key, set_number)
+            for set_number, key in self.keys.items()
+            if key is not None
+        ]
+        self.missing = [
+            set_number for set_number, key in self.keys.items() if key is None
+        ]
+        self.entries.sort()
+        self.missing.sort()
+
+    def add(self, set_number, wishlist):
+        key = self.key_fn(set_number, wishlist)
+        self.keys[set_number] = key
+
+        if key is None:
+            insort(self.missing, set_number)
+        else:
+            insort(self.entries, (key, set_number))
+
+    def remove(self, set_number):
+        key = self.keys.pop(set_number, None)
+
+        if key is None:
+            items, item = self.missing, set_number
+        else:
+            items, item = self.entries, (key, set_number)
+
+        position = bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
+
+    def range_bounds(self, low=None, high=None):
+        """
+        Positions of the entries with low <= key <= high (None = unbounded)
+        """
+        start = 0 if low is None else bisect_left(self.entries, low, key=itemgetter(0))
+        stop = (
+            len(self.entries)
+            if high is None
+            else bisect_right(self.entries, high, key=itemgetter(0))
+        )
+        return start, max(start, stop)
+
+    def count_range(self, low=None, high=None):
+        start, stop = self.range_bounds(low, high)
+        return stop - start
+
+    def range(self, low=None, high=None):
+        start, stop = self.range_bounds(low, high)
+
+        for position in range(start, stop):
+            yield self.entries[position][1]
+
+    def set_numbers(self, descending=False, offset=0, limit=None):
+        """
+        Set numbers in order, unparseable ones last either way; O(offset + limit)
+        """
+        stop = len(self) if limit is None else min(len(self), offset + limit)
+
+        for position in range(offset, stop):
+            if position < len(self.entries):
+                if descending:
+                    yield self.entries[len(self.entries) - 1 - position][1]
+                else:
+                    yield self.entries[position][1]
+            else:
+                yield self.missing[position - len(self.entries)]
+
+
+class WishlistIndexes:
+    def __init__(self, keys=SORT_KEYS, sorter=None) -> None:
+        """
+        Wishlist store listener keeping a SortedIndex per field per wishlist ID
+
+        Big wishlists are sorted by sorter (a ParallelSorter) when given.
+        """
+        self.keys = keys
+        self.sorter = sorter
+        self.indexes = {}
+
+    def get(self, wishlist_id, field):
+        return self.for_wishlist(wishlist_id)[field]
+
+    def for_wishlist(self, wishlist_id):
+        if wishlist_id not in self.indexes:
+            self.indexes[wishlist_id] = {
+                field: SortedIndex(key_fn) for field, key_fn in self.keys.items()
+            }
+        return self.indexes[wishlist_id]
+
+    def set_added(self, wishlist_id, set_number, wishlist):
+        for index in self.for_wishlist(wishlist_id).values():
+            index.add(set_number, wishlist)
+
+    def set_removed(self, wishlist_id, set_number, wishlist):
+        for index in self.for_wishlist(wishlist_id).values():
+            index.remove(set_number)
+
+    def wishlist_reset(self, wishlist_id, wishlist):
+        for field, index in self.for_wishlist(wishlist_id).items():
+            build_index(index, field, wishlist, self.sorter)
+
+
+def build_index(index, field, wishlist, sorter=None):
+    if sorter is not None and sorter.handles(field, wishlist):
+        index.build(wishlist, sorter.sort(field, wishlist))
+    else:
+        index.build(wishlist)
@@ -0,0 +1,217 @@
+from bisect import bisect_left, insort
+from collections import Counter
+
+DEFAULT_SUGGESTIONS = 5
+
+# Near matches are only looked for among the sets sharing the most trigrams
+MAX_CANDIDATES = 50
+
+# Trigrams in more than this share of sets say little, they're skipped
+MAX_TRIGRAM_SHARE = 0.05
+
+# Shorter text is a few typos off everything, only completed
+MIN_NEAR_MATCH_LENGTH = 3
+
+# Only the start of long names gets trigrams, typos are looked for there
+MAX_TRIGRAM_TEXT = 32
+
+
+def trigrams(text):
+    # Padded so the first letters (most telling when typing) get their own
+    padded = f"  {text[:MAX_TRIGRAM_TEXT]} "
+    return {padded[position : position + 3] for position in range(len(padded) - 2)}
+
+
+def leading_trigrams(text):
+    padded = f"  {text}"
+    return {padded[:3], padded[1:4]}
+
+
+def max_typos(text):
+    if len(text) <= 4:
+        return 1
+    return 2 if len(text) <= 10 else 3
+
+
+def edit_distance(text, other, bound, prefix=False):
+    """
+    Levenshtein distance of text and other (or other's closest prefix), or
+    bound + 1 once it's over bound
+    """
+    if prefix:
+        other = other[: len(text) + bound]
+    elif abs(len(text) - len(other)) > bound:
+        return bound + 1
+
+    previous = list(range(len(other) + 1))
+    for row, char in enumerate(text, 1):
+        current = [row]
+        for column, other_char in enumerate(other, 1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (char != other_char),
+                )
+            )
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+
+    return min(min(previous) if prefix else previous[-1], bound + 1)
+
+
+class SuggestionIndex:
+    def __init__(self) -> None:
+        """
+        Set numbers and names of a wishlist, by prefix and by similarity
+
+        Completions come off a sorted list of (text, set number); near
+        matches off trigram postings, checked with a bounded edit distance.
+        Both are updated per added / removed set.
+        """
+        # Sorted (casefolded name or set number, set number)
+        self.entries = []
+        # set number -> its texts, to find its entries again on removal
+        self.texts = {}
+        self.trigram_postings = {}
+
+    @classmethod
+    def from_wishlist(cls, wishlist):
+        index = cls()
+
+        for set_number in wishlist:
+            texts = index.texts_of(set_number, wishlist)
+            index.texts[set_number] = texts
+            index.entries.extend((text, set_number) for text in texts)
+            index.add_trigrams(set_number, texts)
+
+        index.entries.sort()
+        return index
+
+    def texts_of(self, set_number, wishlist):
+        name = wishlist.text_of(set_number, "set_name").casefold()
+        return (set_number.casefold(), name) if name else (set_number.casefold(),)
+
+    def add(self, set_number, wishlist):
+        texts = self.texts_of(set_number, wishlist)
+        self.texts[set_number] = texts
+
+        for text in texts:
+            insort(self.entries, (text, set_number))
+        self.add_trigrams(set_number, texts)
+
+    def remove(self, set_number):
+        texts = self.texts.pop(set_number, ())
+
+        for text in texts:
+            position = bisect_left(self.entries, (text, set_number))
+            if position < len(self.entries) and self.entries[position] == (
+                text,
+                set_number,
+            ):
+                del self.entries[position]
+
+        for trigram in set().union(*map(trigrams, texts)):
+            postings = self.trigram_postings[trigram]
+            postings.discard(set_number)
+            if not postings:
+                del self.trigram_postings[trigram]
+
+    def add_trigrams(self, set_number, texts):
+        for trigram in set().union(*map(trigrams, texts)):
+            self.trigram_postings.setdefault(trigram, set()).add(set_number)
+
+    def completions(self, text, count):
+        """
+        Set numbers whose number or name starts with text, in text order
+        """
+        found = []
+        position = bisect_left(self.entries, (text,))
+
+        while position < len(self.entries) and len(found) < count:
+            entry_text, set_number = self.entries[position]
+            if not entry_text.startswith(text):
+                break
+            if set_number not in found:
+                found.append(set_number)
+            position += 1
+
+        return found
+
+    def near_matches(self, text, count):
+        """
+        Set numbers whose number or name (or its start) is a few typos off text
+        """
+        postings = sorted(
+            (
+                self.trigram_postings[trigram]
+                for trigram in trigrams(text)
+                if trigram in self.trigram_postings
+            ),
+            key=len,
+        )
+        # Rarest trigrams only, counting sets in the common ones costs the most
+        max_postings = max(MAX_TRIGRAM_SHARE * len(self.texts), 1)
+        informative = [sets for sets in postings if len(sets) <= max_postings]
+        # ...plus how the text starts, typed text is mostly a name's start
+        informative += [
+            self.trigram_postings[trigram]
+            for trigram in leading_trigrams(text)
+            if trigram in self.trigram_postings
+            and len(self.trigram_postings[trigram]) > max_postings
+        ]
+
+        shared = Counter()
+        for sets in informative or postings[:1]:
+            shared.update(sets)
+
+        bound = max_typos(text)
+        matches = []
+
+        for set_number, shared_trigrams in shared.most_common(MAX_CANDIDATES):
+            # Typed text is usually the start of a name, compare like for like
+            distance = min(
+                edit_distance(text, candidate, bound, prefix=True)
+                for candidate in self.texts[set_number]
+            )
+            if distance <= bound:
+                matches.append((distance, -shared_trigrams, set_number))
+
+        return [set_number for _, _, set_number in sorted(matches)[:count]]
+
+    def suggest(self, text, count=DEFAULT_SUGGESTIONS):
+        """
+        Up to count set numbers for typed text: completions, then near matches
+        """
+        text = text.strip().casefold()
+        if not text:
+            return []
+
+        suggestions = self.completions(text, count)
+        if len(suggestions) < count and len(text) >= MIN_NEAR_MATCH_LENGTH:
+            for set_number in self.near_matches(text, count):
+                if set_number not in suggestions and len(suggestions) < count:
+                    suggestions.append(set_number)
+
+        return suggestions
+
+
+class WishlistSuggestions:
+    def __init__(self) -> None:
+        """
+        Wishlist store listener keeping a SuggestionIndex per wishlist ID
+        """
+        self.indexes = {}
+
+    def get(self, wishlist_id):
+        return self.indexes.setdefault(wishlist_id, SuggestionIndex())
+
+    def set_added(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).add(set_number, wishlist)
+
+    def set_removed(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).remove(set_number)
+
+    def wishlist_reset(self, wishlist_id, wishlist):
+        self.indexes[wishlist_id] = SuggestionIndex.from_wishlist(wishlist)
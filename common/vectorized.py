@@ -0,0 +1,149 @@
+from common.columnar import MISSING_INT
+from common.query import parse_where
+from common.sorted_index import set_number_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = ("python", "numpy")
+
+
+def check_backend(backend):
+    if backend == "numpy" and np is None:
+        raise RuntimeError(
+            "The numpy backend needs NumPy installed (pip install numpy)"
+        )
+
+
+def columns(wishlist):
+    """
+    Zero-copy NumPy views of a ColumnarWishlist's numeric columns
+
+    Views pin the arrays' buffers (they can't grow while one is alive), so use
+    them inside one call and let them go.
+    """
+    wishlist.compact()
+    return {
+        "price": np.frombuffer(wishlist.price, dtype=np.float64),
+        "pieces": np.frombuffer(wishlist.pieces, dtype=np.int64),
+        "age": np.frombuffer(wishlist.age, dtype=np.int64),
+    }
+
+
+def valid_mask(name, column):
+    # Unparseable values are masked out instead of raising per row
+    if name == "price":
+        return ~np.isnan(column)
+    return column != MISSING_INT
+
+
+def exact_sum(column):
+    """
+    Sum of an int64 column as a Python int
+
+    NumPy's int64 sum wraps around silently, so columns whose sum could leave
+    the int64 range are added up as Python ints instead.
+    """
+    if not column.size:
+        return 0
+    largest = max(-int(column.min()), int(column.max()))
+    if largest <= (2**63 - 1) // column.size:
+        return int(column.sum())
+    return sum(column.tolist())
+
+
+def running_sum(column):
+    """
+    Sum of a float column added left to right, in row order
+
+    RunningTotals adds prices one by one as sets arrive; NumPy's pairwise sum
+    rounds differently, so the two backends would disagree in the last digits.
+    cumsum adds sequentially, giving the same float a Python loop would.
+    """
+    return float(column.cumsum()[-1]) if column.size else 0.0
+
+
+def paired_sums(wishlist):
+    """
+    (cost, pieces) summed over sets with both a valid price and pieces > 0
+    """
+    column = columns(wishlist)
+    paired = valid_mask("price", column["price"]) & (column["pieces"] > 0)
+    return (
+        running_sum(column["price"][paired]),
+        exact_sum(column["pieces"][paired]),
+    )
+
+
+def vector_totals(wishlist):
+    """
+    Same numbers as RunningTotals.summary(), from one pass per column
+    """
+    if not len(wishlist):
+        return {
+            "total_sets": 0,
+            "total_cost": 0.0,
+            "total_pieces": 0,
+            "min_price": None,
+            "max_price": None,
+            "mean_price": None,
+        }
+
+    column = columns(wishlist)
+    prices = column["price"][valid_mask("price", column["price"])]
+    pieces = column["pieces"][valid_mask("pieces", column["pieces"])]
+    total_cost = running_sum(prices)
+
+    return {
+        "total_sets": len(wishlist),
+        "total_cost": total_cost,
+        "total_pieces": exact_sum(pieces),
+        "min_price": float(prices.min()) if prices.size else None,
+        "max_price": float(prices.max()) if prices.size else None,
+        "mean_price": total_cost / prices.size if prices.size else None,
+    }
+
+
+def price_counts(wishlist):
+    """
+    {price: number of sets} for the valid prices, for RunningTotals' multiset
+    """
+    prices = columns(wishlist)["price"]
+    values, counts = np.unique(prices[valid_mask("price", prices)], return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+def vector_query(where, wishlist):
+    """
+    Same result as query_scan, range predicates evaluated as column masks
+    """
+    predicates, name = parse_where(where)
+    column = columns(wishlist)
+    mask = np.ones(len(wishlist), dtype=bool)
+
+    for field, low, high in predicates:
+        if field not in column:
+            continue
+        values = column[field]
+        mask &= valid_mask(field, values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+
+    set_numbers = [wishlist.set_numbers[row] for row in np.flatnonzero(mask)]
+
+    # Text predicates only run on the rows the numeric masks kept
+    for field, low, high in predicates:
+        if field == "set_number_text":
+            set_numbers = [number for number in set_numbers if low <= number <= high]
+    if name:
+        set_numbers = [
+            number
+            for number in set_numbers
+            if name in wishlist.text_of(number, "set_name").casefold()
+        ]
+
+    return sorted(set_numbers, key=set_number_key)
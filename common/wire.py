@@ -0,0 +1,203 @@
+import json
+import zlib
+
+import zmq
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Best first. "frames" is MessagePack with buffers (array columns) moved out
+# into their own zero-copy frames; plain single-frame JSON is what every
+# peer understands, so it's the fallback and needs no negotiating.
+CODEC_PREFERENCE = ("frames", "msgpack", "json")
+BASE_CODECS = tuple(
+    codec for codec in CODEC_PREFERENCE if codec == "json" or msgpack is not None
+)
+
+# "<codec>+<compression>" variants zlib-compress payloads over the threshold;
+# "zdict1" primes zlib with SHARED_DICTIONARY (bump the number on any change)
+COMPRESSIONS = ("zdict1", "zlib")
+COMPRESS_THRESHOLD = 4 * 1024
+# Fast level: the point is to trade a little CPU for a lot less bandwidth
+COMPRESS_LEVEL = 1
+
+CODECS = tuple(
+    variant
+    for codec in BASE_CODECS
+    for variant in (*(f"{codec}+{name}" for name in COMPRESSIONS), codec)
+)
+
+# Text that recurs in wishlist messages, most common last (zlib looks back
+# from the end of the dictionary first)
+SHARED_DICTIONARY = " ".join(
+    [
+        "LEGO set minifigure minifigures figure build building display model",
+        "includes features with and the for of a to in on your from this is",
+        "kids adults ages fans collectors gift play playset vehicle castle",
+        "Star Wars Technic Creator City Friends Ninjago Harry Potter Marvel",
+        "Ideas Icons Architecture Speed Champions Botanical Collection galaxy",
+        "starship ship mech droid brick-built posable opening cockpit room",
+        "famous ready to explore Make room to display the most famous",
+        '"set_number": "set_name": "set_price": "set_age_group": "set_pieces":',
+        '"set_description": "wishlist": "next_cursor": "offset": "total":',
+        '"status": "success", "wishlist": {"',
+    ]
+).encode()
+
+# Ask a peer which codecs it can decode, answered in JSON by recv_message
+CODECS_REQUEST = {"command": "codecs"}
+
+# MessagePack extension type of a buffer sent as a separate frame
+BUFFER_EXT = 1
+
+
+def buffer_typecode(value):
+    # array.array / numpy arrays
+    return getattr(value, "typecode", None) or value.dtype.char
+
+
+def to_list(value):
+    # JSON / plain MessagePack have no buffers, columns go as lists
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Can't serialize {type(value).__name__}")
+
+
+def compress(payload, compression):
+    """
+    Payload -> flag byte + payload, deflated when large enough to be worth it
+    """
+    if len(payload) < COMPRESS_THRESHOLD:
+        return b"\0" + payload
+
+    if compression == "zdict1":
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zdict=SHARED_DICTIONARY)
+    else:
+        compressor = zlib.compressobj(COMPRESS_LEVEL)
+
+    return b"\1" + compressor.compress(payload) + compressor.flush()
+
+
+def decompress(frame, compression):
+    payload = frame[1:]
+    if frame[0] == 0:
+        return payload
+
+    if compression == "zdict1":
+        decompressor = zlib.decompressobj(zdict=SHARED_DICTIONARY)
+    else:
+        decompressor = zlib.decompressobj()
+
+    return decompressor.decompress(payload) + decompressor.flush()
+
+
+def encode(message, codec="json"):
+    """
+    Message -> list of frames, the first naming the codec (except JSON)
+    """
+    base_codec, _, compression = codec.partition("+")
+    frames = encode_frames(message, base_codec)
+
+    if compression:
+        if base_codec == "json":
+            # Plain JSON is the one codec without a name frame
+            frames.insert(0, b"")
+        frames[0] = codec.encode()
+        frames[1] = compress(frames[1], compression)
+
+    return frames
+
+
+def encode_frames(message, codec):
+    if codec == "json":
+        return [json.dumps(message, default=to_list).encode()]
+    if codec == "msgpack":
+        return [b"msgpack", msgpack.packb(message, default=to_list)]
+
+    buffers = []
+
+    def move_buffer(value):
+        if not hasattr(value, "tolist"):
+            raise TypeError(f"Can't serialize {type(value).__name__}")
+        header = msgpack.packb([len(buffers), buffer_typecode(value)])
+        buffers.append(value)
+        return msgpack.ExtType(BUFFER_EXT, header)
+
+    return [b"frames", msgpack.packb(message, default=move_buffer), *buffers]
+
+
+def decode(frames):
+    """
+    Frames (bytes or zmq.Frame) -> (message, codec), inverse of encode
+
+    Buffers of the "frames" codec come back as memoryviews over the
+    received frames, cast to their typecode, without being copied.
+    """
+    frames = [
+        frame.buffer if isinstance(frame, zmq.Frame) else memoryview(frame).cast("B")
+        for frame in frames
+    ]
+    if len(frames) == 1:
+        return json.loads(bytes(frames[0])), "json"
+
+    codec = bytes(frames[0]).decode()
+    base_codec, _, compression = codec.partition("+")
+    if compression:
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown wire compression: {compression}")
+        frames[1] = decompress(frames[1], compression)
+
+    if base_codec == "json":
+        return json.loads(bytes(frames[1])), codec
+    if base_codec == "msgpack":
+        return msgpack.unpackb(frames[1]), codec
+    if base_codec != "frames":
+        raise ValueError(f"Unknown wire codec: {codec}")
+
+    def load_buffer(code, data):
+        if code != BUFFER_EXT:
+            return msgpack.ExtType(code, data)
+        index, typecode = msgpack.unpackb(data)
+        return frames[2 + index].cast(typecode)
+
+    return msgpack.unpackb(frames[1], ext_hook=load_buffer), codec
+
+
+def send_message(socket, message, codec="json"):
+    # Buffers are handed to ZeroMQ as they are, not copied into the message
+    socket.send_multipart(encode(message, codec), copy=False)
+
+
+def recv_message(socket):
+    """
+    Next request on socket -> (message, codec to reply with)
+
+    A codecs request is answered here and gives (None, None): the caller
+    just goes back to waiting.
+    """
+    message, codec = decode(socket.recv_multipart(copy=False))
+
+    if message == CODECS_REQUEST:
+        send_message(socket, {"status": "success", "codecs": list(CODECS)})
+        return None, None
+
+    return message, codec
+
+
+def choose_codec(reply, compress=False):
+    """
+    Codec to use with a peer, from its reply to CODECS_REQUEST
+
+    Compressed variants are only picked when asked for: they pay off on slow
+    links, not between processes on one host.
+    """
+    peer_codecs = reply.get("codecs", []) if reply.get("status") == "success" else []
+
+    for codec in CODECS:
+        if codec in peer_codecs and (compress or "+" not in codec):
+            return codec
+
+    # Services that predate codecs only speak JSON
+    return "json"
@@ -0,0 +1,175 @@
+import zmq
+
+from common.binary_snapshot import MappedWishlist
+from common.columnar import ColumnarWishlist
+from common.wire import CODECS_REQUEST, choose_codec, decode, send_message
+from common.wishlist_store import (
+    DEFAULT_WISHLIST_ID,
+    STORE_ADDRESS,
+    STORE_UPDATES_ADDRESS,
+    WishlistStore,
+)
+
+
+class WishlistStoreUnavailable(Exception):
+    pass
+
+
+class WishlistReplica:
+    def __init__(
+        self,
+        context,
+        store=None,
+        store_address=STORE_ADDRESS,
+        updates_address=STORE_UPDATES_ADDRESS,
+        timeout_ms=3000,
+    ) -> None:
+        """
+        Local copy of the shared wishlist store, kept current from its deltas
+        """
+        self.context = context
+        self.store = store if store is not None else WishlistStore()
+        self.store_address = store_address
+        self.timeout_ms = timeout_ms
+        # Wire codec agreed with the store on first use
+        self.codec = None
+        # Instance ID of the store the held wishlists came from
+        self.epoch = None
+
+        self.updates_socket = context.socket(zmq.SUB)
+        self.updates_socket.setsockopt_string(zmq.SUBSCRIBE, "")
+        self.updates_socket.connect(updates_address)
+
+    def close(self):
+        self.updates_socket.close()
+
+    def drain_updates(self):
+        """
+        Apply every delta already waiting on the updates socket
+        """
+        while True:
+            try:
+                op = self.updates_socket.recv_json(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+
+            try:
+                self.apply_update(op)
+            except WishlistStoreUnavailable:
+                # Resync after a gap failed, the next request that needs a
+                # newer version retries it
+                return
+
+    def apply_update(self, op):
+        wishlist_id = op["wishlist_id"]
+        current_version = self.store.version(wishlist_id)
+
+        if op.get("epoch") != self.epoch:
+            # First delta seen, or the store restarted and counts from 1 again
+            self.resync(wishlist_id)
+            return
+        if op["version"] <= current_version:
+            return
+        if op["version"] == current_version + 1:
+            self.store.apply(op)
+        else:
+            # Missed a delta (joined late or dropped), fetch the full state
+            self.resync(wishlist_id)
+
+    def resync(self, wishlist_id):
+        # Same host as the store: map its snapshot file, no JSON decode
+        reply = self.request_store(
+            {"command": "snapshot", "wishlist_id": wishlist_id, "format": "mmap"}
+        )
+
+        try:
+            wishlist = MappedWishlist(reply["path"])
+        except (KeyError, OSError):
+            # Store on another host (or without a snapshot dir), fetch it inline
+            wishlist, reply = self.fetch_snapshot(wishlist_id)
+
+        self.store.load(wishlist_id, wishlist, reply["version"])
+        self.adopt_epoch(reply.get("epoch"), wishlist_id)
+
+    def adopt_epoch(self, epoch, current_id=None):
+        """
+        Track the store's epoch, resyncing every held wishlist when it changes
+
+        The store keeps wishlists in memory only, a restarted one numbers
+        versions from 1 again, so nothing from an older epoch can be trusted.
+        """
+        if epoch == self.epoch:
+            return
+
+        stale = [] if self.epoch is None else list(self.store.versions)
+        self.epoch = epoch
+        for wishlist_id in stale:
+            if wishlist_id != current_id:
+                self.resync(wishlist_id)
+
+    def fetch_snapshot(self, wishlist_id):
+        if self.codec is None:
+            self.negotiate_codec()
+
+        if self.codec == "frames":
+            # Raw column buffers, nothing parsed or rebuilt per set
+            reply = self.request_store(
+                {"command": "snapshot", "wishlist_id": wishlist_id, "format": "columns"}
+            )
+            return ColumnarWishlist.from_wire(reply["columns"]), reply
+
+        reply = self.request_store({"command": "snapshot", "wishlist_id": wishlist_id})
+        return reply["wishlist"], reply
+
+    def negotiate_codec(self):
+        try:
+            reply = self.request_store(CODECS_REQUEST, "json")
+        except WishlistStoreUnavailable as error:
+            # A store that predates codecs doesn't know the command
+            if str(error) != "Invalid command":
+                raise
+            reply = {}
+
+        self.codec = choose_codec(reply)
+
+    def request_store(self, message, codec=None):
+        # Fresh REQ socket per call so a lost reply never wedges the replica
+        socket = self.context.socket(zmq.REQ)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.store_address)
+
+        try:
+            send_message(socket, message, codec or self.codec or "json")
+            if not socket.poll(self.timeout_ms):
+                raise WishlistStoreUnavailable("Wishlist store did not respond")
+            reply, _ = decode(socket.recv_multipart(copy=False))
+        finally:
+            socket.close()
+
+        if reply["status"] != "success":
+            raise WishlistStoreUnavailable(reply["message"])
+        return reply
+
+    def wishlist_for(self, message):
+        """
+        Wishlist a request refers to, at least as new as the version it asks for
+        """
+        # Older clients still send the whole wishlist inline
+        if message.get("wishlist") is not None:
+            return ColumnarWishlist.from_dict(message["wishlist"])
+
+        wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+        version = message.get("version", 0)
+
+        self.drain_updates()
+        current_version = self.store.version(wishlist_id)
+        if current_version < version:
+            self.resync(wishlist_id)
+        elif version and current_version > version:
+            # Client behind us, or a restarted store behind us: ask which
+            reply = self.request_store(
+                {"command": "version", "wishlist_id": wishlist_id}
+            )
+            self.adopt_epoch(reply.get("epoch"))
+
+        return self.store.get(wishlist_id)
@@ -0,0 +1,143 @@
+from common.columnar import ColumnarWishlist
+
+DEFAULT_WISHLIST_ID = "default"
+
+# Wishlist store service: REP socket for ops/snapshots, PUB socket for deltas
+STORE_ADDRESS = "tcp://localhost:5559"
+STORE_UPDATES_ADDRESS = "tcp://localhost:5560"
+
+
+def add_op(wishlist_id, set_number, set_details):
+    return {
+        "op": "add",
+        "wishlist_id": wishlist_id,
+        "set_number": set_number,
+        "set_details": set_details,
+    }
+
+
+def edit_op(wishlist_id, set_number, changes):
+    return {
+        "op": "edit",
+        "wishlist_id": wishlist_id,
+        "set_number": set_number,
+        "changes": changes,
+    }
+
+
+def delete_op(wishlist_id, set_number):
+    return {"op": "delete", "wishlist_id": wishlist_id, "set_number": set_number}
+
+
+def replace_op(wishlist_id, wishlist):
+    return {"op": "replace", "wishlist_id": wishlist_id, "wishlist": wishlist}
+
+
+class WishlistStore:
+    def __init__(self) -> None:
+        """
+        Wishlists keyed by wishlist ID, each a ColumnarWishlist of typed columns
+        """
+        self.wishlists = {}
+        self.versions = {}
+        # Objects kept in step with every change (running totals, indexes...)
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """
+        Listener gets set_added / set_removed / wishlist_reset callbacks
+
+        Each gets the ColumnarWishlist, set_added after the set is in it and
+        set_removed while the set is still there, so parsed values can be read.
+        """
+        self.listeners.append(listener)
+
+        for wishlist_id, wishlist in self.wishlists.items():
+            listener.wishlist_reset(wishlist_id, wishlist)
+
+    def get(self, wishlist_id):
+        if wishlist_id not in self.wishlists:
+            return ColumnarWishlist()
+        return self.wishlists[wishlist_id]
+
+    def writable(self, wishlist_id):
+        """
+        Wishlist that can take changes, copying a mapped snapshot on first write
+        """
+        wishlist = self.wishlists.get(wishlist_id)
+
+        if wishlist is None:
+            wishlist = self.wishlists[wishlist_id] = ColumnarWishlist()
+        elif not isinstance(wishlist, ColumnarWishlist):
+            wishlist = self.wishlists[wishlist_id] = ColumnarWishlist.from_columns(
+                wishlist
+            )
+
+        return wishlist
+
+    def version(self, wishlist_id):
+        return self.versions.get(wishlist_id, 0)
+
+    def apply(self, op):
+        """
+        Apply one add/edit/delete/replace op, return the new wishlist version
+        """
+        wishlist_id = op["wishlist_id"]
+        kind = op["op"]
+
+        if kind == "add":
+            self._remove_set(wishlist_id, op["set_number"])
+            self._add_set(wishlist_id, op["set_number"], op["set_details"])
+        elif kind == "edit":
+            old_details = self._remove_set(wishlist_id, op["set_number"])
+            if old_details is None:
+                raise KeyError(op["set_number"])
+            self._add_set(
+                wishlist_id, op["set_number"], {**old_details, **op["changes"]}
+            )
+        elif kind == "delete":
+            if self._remove_set(wishlist_id, op["set_number"]) is None:
+                raise KeyError(op["set_number"])
+        elif kind == "replace":
+            self._reset(wishlist_id, op["wishlist"])
+        else:
+            raise ValueError(f"Unknown wishlist operation: {kind}")
+
+        self.versions[wishlist_id] = self.version(wishlist_id) + 1
+        return self.versions[wishlist_id]
+
+    def load(self, wishlist_id, wishlist, version):
+        """
+        Overwrite a wishlist with a full snapshot (replica resync)
+
+        A MappedWishlist is served as-is until the first change to it.
+        """
+        self._reset(wishlist_id, wishlist)
+        self.versions[wishlist_id] = version
+
+    def _add_set(self, wishlist_id, set_number, set_details):
+        wishlist = self.writable(wishlist_id)
+        wishlist.add(set_number, set_details)
+
+        for listener in self.listeners:
+            listener.set_added(wishlist_id, set_number, wishlist)
+
+    def _remove_set(self, wishlist_id, set_number):
+        if set_number not in self.wishlists.get(wishlist_id, {}):
+            return None
+
+        wishlist = self.writable(wishlist_id)
+        set_details = wishlist[set_number]
+        for listener in self.listeners:
+            listener.set_removed(wishlist_id, set_number, wishlist)
+        wishlist.remove(set_number)
+
+        return set_details
+
+    def _reset(self, wishlist_id, wishlist):
+        if isinstance(wishlist, dict):
+            wishlist = ColumnarWishlist.from_dict(wishlist)
+        self.wishlists[wishlist_id] = wishlist
+
+        for listener in self.listeners:
+            listener.wishlist_reset(wishlist_id, self.wishlists[wishlist_id])
@@ -0,0 +1,267 @@
+import contextlib
+import copy
+import itertools
+import multiprocessing
+import signal
+import threading
+
+import zmq
+
+from common.wire import CODECS, CODECS_REQUEST, decode, encode
+
+WORKER_MODES = ("process", "thread")
+
+# Worker processes start fresh rather than forked: the pool's ZeroMQ context
+# (and its I/O threads) must not be copied into them
+SPAWN = multiprocessing.get_context("spawn")
+
+
+def add_worker_arguments(parser):
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="requests served concurrently, each worker keeps its own replica",
+    )
+    parser.add_argument(
+        "--worker-mode",
+        choices=WORKER_MODES,
+        default="process",
+        help="processes use several cores, threads share one (the GIL)",
+    )
+
+
+def run_worker(serve, args, endpoint, bind=False, context=None):
+    """
+    Run serve(context, socket, args) on a REP socket bound/connected to endpoint
+    """
+    owns_context = context is None
+    if owns_context:
+        context = zmq.Context()
+
+    socket = context.socket(zmq.REP)
+    if bind:
+        socket.bind(endpoint)
+    else:
+        socket.connect(endpoint)
+
+    try:
+        serve(context, socket, args)
+    finally:
+        socket.close(linger=0)
+        if owns_context:
+            context.term()
+
+
+def thread_worker(serve, args, endpoint, context):
+    try:
+        run_worker(serve, args, endpoint, context=context)
+    except zmq.ContextTerminated:
+        # Pool shutting down
+        pass
+
+
+def process_worker(serve, args, endpoint):
+    try:
+        run_worker(serve, args, endpoint)
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the whole process group, the pool reports it
+        pass
+
+
+def run_workers(endpoint, serve, args, scatter=None, gather=None, announcer=None):
+    """
+    Serve endpoint with args.workers copies of serve(context, socket, args)
+
+    One worker binds endpoint itself, as a single REP service always did.
+    More sit behind a ROUTER frontend on endpoint that a DEALER backend fans
+    out to, so a slow request only holds up its own worker. Runs until
+    Ctrl+C (KeyboardInterrupt is re-raised for the service to report).
+
+    announcer (a registry Announcer) is entered once the workers are up,
+    so the instance is only announced once it can serve.
+
+    With args.shards > 1 the workers are shards instead, see run_shards.
+    """
+    announcer = announcer or contextlib.nullcontext()
+
+    if getattr(args, "shards", 1) > 1:
+        run_shards(endpoint, serve, args, scatter, gather, announcer)
+        return
+
+    if args.workers <= 1:
+        with announcer:
+            run_worker(serve, args, endpoint, bind=True)
+        return
+
+    # A plain kill shuts the pool down like Ctrl+C, workers included
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    context = zmq.Context()
+    frontend = context.socket(zmq.ROUTER)
+    frontend.bind(endpoint)
+    backend = context.socket(zmq.DEALER)
+
+    workers = []
+    if args.worker_mode == "thread":
+        backend.bind("inproc://workers")
+        for _ in range(args.workers):
+            workers.append(
+                threading.Thread(
+                    target=thread_worker,
+                    args=(serve, args, "inproc://workers", context),
+                    daemon=True,
+                )
+            )
+    else:
+        port = backend.bind_to_random_port("tcp://127.0.0.1")
+        for _ in range(args.workers):
+            workers.append(
+                SPAWN.Process(
+                    target=process_worker,
+                    args=(serve, args, f"tcp://127.0.0.1:{port}"),
+                    daemon=True,
+                )
+            )
+
+    for worker in workers:
+        worker.start()
+
+    try:
+        with announcer:
+            zmq.proxy(frontend, backend)
+    finally:
+        frontend.close(linger=0)
+        backend.close(linger=0)
+        # Thread workers' sockets raise ContextTerminated and close
+        context.term()
+        for worker in workers:
+            if args.worker_mode == "process":
+                # Already interrupted on Ctrl+C, not when only the pool was killed
+                worker.terminate()
+            worker.join(timeout=5)
+
+
+def split_envelope(frames):
+    """
+    ROUTER frames -> (envelope up to the empty delimiter, message frames)
+    """
+    for position, frame in enumerate(frames):
+        if not frame.bytes:
+            return frames[: position + 1], frames[position + 1 :]
+    return None, None
+
+
+def run_shards(endpoint, serve, args, scatter, gather, announcer):
+    """
+    Serve endpoint with args.shards worker processes, each holding one shard
+
+    Every worker is started with args.shard set, so its replica keeps only
+    that shard's sets (see common.sharding). A ROUTER frontend sends each
+    request to all shards at once through one DEALER per shard, rewritten
+    by scatter(message, shard_count) into one message per shard, and
+    replies with gather(message, replies). Several
+    requests can be in flight; each shard answers its own in order.
+    Requests carrying their wishlist inline go to the first shard alone.
+    """
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    context = zmq.Context()
+    frontend = context.socket(zmq.ROUTER)
+    frontend.bind(endpoint)
+
+    poller = zmq.Poller()
+    poller.register(frontend, zmq.POLLIN)
+
+    shard_sockets = []
+    workers = []
+    for shard in range(args.shards):
+        socket = context.socket(zmq.DEALER)
+        port = socket.bind_to_random_port("tcp://127.0.0.1")
+        poller.register(socket, zmq.POLLIN)
+        shard_sockets.append(socket)
+
+        shard_args = copy.copy(args)
+        shard_args.shard = shard
+        workers.append(
+            SPAWN.Process(
+                target=process_worker,
+                args=(serve, shard_args, f"tcp://127.0.0.1:{port}"),
+                daemon=True,
+            )
+        )
+
+    for worker in workers:
+        worker.start()
+
+    # request ID -> (client envelope, message, codec, {shard: reply})
+    pending = {}
+    request_ids = itertools.count()
+
+    try:
+        with announcer:
+            while True:
+                sockets = dict(poller.poll(1000))  # Poll every 1 second
+
+                if frontend in sockets:
+                    envelope, frames = split_envelope(
+                        frontend.recv_multipart(copy=False)
+                    )
+                    if envelope is None:
+                        continue
+                    message, codec = decode(frames)
+
+                    if message == CODECS_REQUEST:
+                        reply = {"status": "success", "codecs": list(CODECS)}
+                        frontend.send_multipart([*envelope, *encode(reply)])
+                        continue
+
+                    if message.get("wishlist") is not None:
+                        targets, shard_messages = shard_sockets[:1], [message]
+                    else:
+                        try:
+                            targets = shard_sockets
+                            shard_messages = scatter(message, len(shard_sockets))
+                        except ValueError as error:
+                            reply = {"status": "error", "message": str(error)}
+                            frontend.send_multipart([*envelope, *encode(reply, codec)])
+                            continue
+
+                    request_id = str(next(request_ids)).encode()
+                    pending[request_id] = (envelope, message, codec, {})
+                    for socket, shard_message in zip(targets, shard_messages):
+                        socket.send_multipart(
+                            [request_id, b"", *encode(shard_message, codec)],
+                            copy=False,
+                        )
+
+                for shard, socket in enumerate(shard_sockets):
+                    if socket not in sockets:
+                        continue
+
+                    frames = socket.recv_multipart(copy=False)
+                    request_id = frames[0].bytes
+                    envelope, message, codec, replies = pending[request_id]
+                    replies[shard] = decode(frames[2:])[0]
+
+                    if message.get("wishlist") is not None:
+                        response = replies[shard]
+                    elif len(replies) == len(shard_sockets):
+                        response = gather(
+                            message, [replies[i] for i in sorted(replies)]
+                        )
+                    else:
+                        continue
+
+                    del pending[request_id]
+                    frontend.send_multipart(
+                        [*envelope, *encode(response, codec)], copy=False
+                    )
+    finally:
+        frontend.close(linger=0)
+        for socket in shard_sockets:
+            socket.close(linger=0)
+        context.term()
+        for worker in workers:
+            worker.terminate()
+            worker.join(timeout=5)
@@ -0,0 +1,246 @@
+import argparse
+import importlib.util
+import os
+import sys
+
+import zmq
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from common.registry import Announcer, add_registry_arguments
+from common.result_cache import add_cache_arguments
+from common.search_jobs import (
+    DEFAULT_LOOKUP_THREADS,
+    DEFAULT_LOOKUP_TTL,
+    LOOKUP_BACKENDS,
+)
+from common.vectorized import BACKENDS, check_backend
+from common.wire import CODECS, CODECS_REQUEST, decode, encode
+from common.wishlist_replica import WishlistReplica
+from common.worker_pool import split_envelope
+
+GATEWAY_PORT = 5562
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_service(directory, filename):
+    # Service directories (service-A, ...) aren't packages, load by path
+    path = os.path.join(SERVER_DIR, directory, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+totals_service = load_service("service-A", "lego_total_count_service.py")
+sort_service = load_service("service-B", "lego_sort_service.py")
+filter_service = load_service("service-C", "lego_filter_service.py")
+search_service = load_service("service-D", "lego_web_search_service.py")
+
+
+def recv_request(socket):
+    """
+    Next request on the ROUTER -> (envelope to reply with, message, codec)
+
+    The envelope is every frame up to and including the empty delimiter:
+    the peer's identity plus whatever a DEALER client put before it.
+    """
+    envelope, frames = split_envelope(socket.recv_multipart(copy=False))
+
+    # No delimiter, not a REQ / DEALER request
+    if envelope is None:
+        return None, None, None
+    return (envelope, *decode(frames))
+
+
+def send_reply(socket, envelope, response, codec="json"):
+    socket.send_multipart([*envelope, *encode(response, codec)], copy=False)
+
+
+class Gateway:
+    def __init__(self, handlers) -> None:
+        """
+        Requests dispatched on their command to {service name: handler}
+
+        A command several services answer (cache_stats) needs the request's
+        "service" field to say which.
+        """
+        self.handlers = handlers
+        # command -> name of the one service answering it
+        self.services = {}
+        self.ambiguous = set()
+
+        for service, handler in handlers.items():
+            for command in handler.COMMANDS:
+                if command in self.services:
+                    self.ambiguous.add(command)
+                self.services[command] = service
+
+    def __call__(self, message):
+        """
+        (service that answered or None, response)
+        """
+        command = message.get("command")
+        service = message.get("service")
+
+        if service is None:
+            if command in self.ambiguous:
+                return None, {
+                    "status": "error",
+                    "message": f"Which service? '{command}' needs a service field",
+                }
+            service = self.services.get(command)
+
+        if service not in self.handlers:
+            return None, {"status": "error", "message": "Invalid command"}
+        return service, self.handlers[service](message)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="LEGO Gateway: total count, sort, filter and search in one process"
+    )
+    parser.add_argument(
+        "--totals-backend",
+        choices=BACKENDS,
+        default="python",
+        help="how full totals recomputes (resync, inline wishlists) are evaluated",
+    )
+    parser.add_argument(
+        "--filter-backend",
+        choices=BACKENDS,
+        default="python",
+        help="python: per-field sorted indexes, numpy: vectorized column masks",
+    )
+    parser.add_argument(
+        "--search-backend",
+        choices=BACKENDS,
+        default="python",
+        help="python: plain loops over postings, numpy: postings scored as arrays",
+    )
+    parser.add_argument(
+        "--catalogue",
+        help="CSV / JSONL file of LEGO sets searchable with source=catalogue",
+    )
+    parser.add_argument(
+        "--lookup-backend",
+        choices=LOOKUP_BACKENDS,
+        default="catalogue",
+        help="what 'lookup' requests run on, catalogue is a local stand-in",
+    )
+    parser.add_argument(
+        "--lookup-threads",
+        type=int,
+        default=DEFAULT_LOOKUP_THREADS,
+        help="lookups run at once",
+    )
+    parser.add_argument(
+        "--lookup-ttl",
+        type=float,
+        default=DEFAULT_LOOKUP_TTL,
+        help="seconds a lookup's results are reused for",
+    )
+    add_cache_arguments(parser)
+    add_registry_arguments(parser, GATEWAY_PORT)
+    args = parser.parse_args()
+
+    try:
+        for backend in (args.totals_backend, args.filter_backend, args.search_backend):
+            check_backend(backend)
+    except RuntimeError as error:
+        parser.error(str(error))
+
+    return args
+
+
+def serve(context, socket, args):
+    """
+    Request loop: every service's handler on one replica of the store
+    """
+    # Register socket with poller, use for 'Ctrl+C' stops
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    # One copy of each wishlist, decoded once, that all the handlers index
+    replica = WishlistReplica(context)
+    catalogue = (
+        search_service.load_catalogue(args.catalogue) if args.catalogue else None
+    )
+    gateway = Gateway(
+        {
+            "totals": totals_service.TotalsHandler(replica, args.totals_backend),
+            "sort": sort_service.SortHandler(replica, args.cache_size),
+            "filter": filter_service.FilterHandler(
+                replica, args.filter_backend, args.cache_size
+            ),
+            "search": search_service.SearchHandler(
+                replica,
+                args.search_backend,
+                catalogue,
+                args.lookup_backend,
+                args.lookup_threads,
+                args.lookup_ttl,
+            ),
+        }
+    )
+    poller.register(replica.updates_socket, zmq.POLLIN)
+
+    try:
+        while True:
+            sockets = dict(poller.poll(1000))  # Poll every 1 second
+
+            if replica.updates_socket in sockets:
+                replica.drain_updates()
+
+            if socket in sockets:
+                envelope, message, codec = recv_request(socket)
+                if envelope is None:
+                    continue
+                if message == CODECS_REQUEST:
+                    send_reply(
+                        socket, envelope, {"status": "success", "codecs": list(CODECS)}
+                    )
+                    continue
+
+                print(f"\n🡺  Received '{message.get('command')}' request...")
+                service, response = gateway(message)
+                send_reply(socket, envelope, response, codec)
+                if response["status"] == "success":
+                    print(f"🡸  Sent response from the {service} handler!")
+
+    finally:
+        gateway.close()
+        replica.close()
+
+
+def main():
+    args = parse_args()
+
+    context = zmq.Context()
+    socket = context.socket(zmq.ROUTER)
+    socket.bind(f"tcp://*:{args.port}")
+
+    try:
+        print("\nLEGO Gateway running & listening for requests...")
+        # Clients find it in the registry as an instance of every service
+        with Announcer(["totals", "sort", "filter", "search"], args):
+            serve(context, socket, args)
+
+    except KeyboardInterrupt:
+        print("\nLEGO Gateway shutting down...")
+
+    finally:
+        socket.close(linger=0)
+        context.term()
+
+
+if __name__ == "__main__":
+    main()
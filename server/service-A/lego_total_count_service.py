@@ -1,78 +1,414 @@
+import argparse
+import heapq
+import os
+import sys
+from collections import Counter
+
 import zmq
 
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
 
-def total_number_of_sets(wishlist):
-    return len(wishlist)
+from common.registry import SERVICE_PORTS, Announcer, add_registry_arguments
+from common.sharding import add_shard_arguments, failed_reply, shard_store
+from common.vectorized import (
+    BACKENDS,
+    check_backend,
+    paired_sums,
+    price_counts,
+    vector_totals,
+)
+from common.wishlist_replica import WishlistReplica, WishlistStoreUnavailable
+from common.wishlist_store import DEFAULT_WISHLIST_ID
+from common.wire import recv_message, send_message
+from common.worker_pool import add_worker_arguments, run_workers
 
 
-def total_cost_of_sets(wishlist):
-    total_cost = 0.0
+class RunningTotals:
+    def __init__(self) -> None:
+        """
+        Totals of one wishlist, updated per added/removed set instead of rescanned
+        """
+        self.total_sets = 0
+        self.total_cost = 0.0
+        self.total_pieces = 0
+        self.priced_sets = 0
+        # Cost and pieces of the sets that have both (pieces > 0, as the
+        # numpy backend counts them), for price per piece
+        self.paired_cost = 0.0
+        self.paired_pieces = 0
+
+        # Multiset of prices plus lazily-cleaned heaps for min/max after deletes
+        self.price_counts = Counter()
+        self.min_heap = []
+        self.max_heap = []
+
+    @classmethod
+    def from_wishlist(cls, wishlist, backend="python"):
+        totals = cls()
+
+        if backend == "numpy":
+            summary = vector_totals(wishlist)
+            totals.total_sets = summary["total_sets"]
+            totals.total_cost = summary["total_cost"]
+            totals.total_pieces = summary["total_pieces"]
+            totals.price_counts = Counter(price_counts(wishlist))
+            totals.priced_sets = sum(totals.price_counts.values())
+            totals.paired_cost, totals.paired_pieces = paired_sums(wishlist)
+            totals.min_heap = list(totals.price_counts)
+            heapq.heapify(totals.min_heap)
+            totals.max_heap = [-price for price in totals.price_counts]
+            heapq.heapify(totals.max_heap)
+            return totals
+
+        for set_number in wishlist:
+            totals.add(wishlist.price_of(set_number), wishlist.pieces_of(set_number))
+
+        return totals
+
+    def add(self, price, pieces):
+        """
+        Count one set, price/pieces already parsed (None when not a number)
+        """
+        self.total_sets += 1
+
+        if price is not None:
+            self.priced_sets += 1
+            self.total_cost += price
+            if self.price_counts[price] == 0:
+                heapq.heappush(self.min_heap, price)
+                heapq.heappush(self.max_heap, -price)
+            self.price_counts[price] += 1
+
+        if pieces is not None:
+            self.total_pieces += pieces
+
+        if price is not None and pieces is not None and pieces > 0:
+            self.paired_cost += price
+            self.paired_pieces += pieces
+
+    def remove(self, price, pieces):
+        self.total_sets -= 1
+
+        if price is not None:
+            self.priced_sets -= 1
+            # Avoid float drift leaving e.g. 1e-13 behind once all prices are gone
+            self.total_cost = self.total_cost - price if self.priced_sets else 0.0
+            self.price_counts[price] -= 1
+            if self.price_counts[price] == 0:
+                del self.price_counts[price]
+
+        if pieces is not None:
+            self.total_pieces -= pieces
+
+        if price is not None and pieces is not None and pieces > 0:
+            self.paired_pieces -= pieces
+            self.paired_cost = self.paired_cost - price if self.paired_pieces else 0.0
+
+        # Drop stale heap entries in bulk when deletes outnumber live prices
+        if len(self.min_heap) > 2 * len(self.price_counts) + 16:
+            self.min_heap = list(self.price_counts)
+            heapq.heapify(self.min_heap)
+            self.max_heap = [-price for price in self.price_counts]
+            heapq.heapify(self.max_heap)
+
+    def min_price(self):
+        while self.min_heap and self.min_heap[0] not in self.price_counts:
+            heapq.heappop(self.min_heap)
+
+        return self.min_heap[0] if self.min_heap else None
+
+    def max_price(self):
+        while self.max_heap and -self.max_heap[0] not in self.price_counts:
+            heapq.heappop(self.max_heap)
+
+        return -self.max_heap[0] if self.max_heap else None
+
+    def mean_price(self):
+        return self.total_cost / self.priced_sets if self.priced_sets else None
+
+    def price_per_piece(self):
+        return self.paired_cost / self.paired_pieces if self.paired_pieces else None
+
+    def partials(self):
+        """
+        Sums that add up across shards, every metric is worked out from them
+        """
+        return {
+            "total_sets": self.total_sets,
+            "total_cost": self.total_cost,
+            "total_pieces": self.total_pieces,
+            "priced_sets": self.priced_sets,
+            "paired_cost": self.paired_cost,
+            "paired_pieces": self.paired_pieces,
+            "min_price": self.min_price(),
+            "max_price": self.max_price(),
+        }
+
+    def summary(self):
+        return {
+            "total_sets": self.total_sets,
+            "total_cost": self.total_cost,
+            "total_pieces": self.total_pieces,
+            "min_price": self.min_price(),
+            "max_price": self.max_price(),
+            "mean_price": self.mean_price(),
+        }
+
+
+# Metric name -> its value, any mix of them is answered by one "totals" request
+METRICS = {
+    "count": lambda totals: totals.total_sets,
+    "cost": lambda totals: totals.total_cost,
+    "pieces": lambda totals: totals.total_pieces,
+    "min_price": lambda totals: totals.min_price(),
+    "max_price": lambda totals: totals.max_price(),
+    "average_price": lambda totals: totals.mean_price(),
+    "price_per_piece": lambda totals: totals.price_per_piece(),
+}
+
+
+class MergedTotals(RunningTotals):
+    def __init__(self, shard_partials) -> None:
+        """
+        Totals of a sharded wishlist, added up from each shard's partials()
+        """
+        super().__init__()
+
+        for partials in shard_partials:
+            self.total_sets += partials["total_sets"]
+            self.total_cost += partials["total_cost"]
+            self.total_pieces += partials["total_pieces"]
+            self.priced_sets += partials["priced_sets"]
+            self.paired_cost += partials["paired_cost"]
+            self.paired_pieces += partials["paired_pieces"]
+
+        self.prices = [
+            partials[bound]
+            for partials in shard_partials
+            for bound in ("min_price", "max_price")
+            if partials[bound] is not None
+        ]
+
+    def min_price(self):
+        return min(self.prices, default=None)
+
+    def max_price(self):
+        return max(self.prices, default=None)
+
+
+class WishlistTotals:
+    def __init__(self, backend="python") -> None:
+        """
+        Wishlist store listener keeping RunningTotals per wishlist ID
+        """
+        self.backend = backend
+        self.totals = {}
+
+    def get(self, wishlist_id):
+        return self.totals.setdefault(wishlist_id, RunningTotals())
+
+    def set_added(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).add(
+            wishlist.price_of(set_number), wishlist.pieces_of(set_number)
+        )
+
+    def set_removed(self, wishlist_id, set_number, wishlist):
+        self.get(wishlist_id).remove(
+            wishlist.price_of(set_number), wishlist.pieces_of(set_number)
+        )
+
+    def wishlist_reset(self, wishlist_id, wishlist):
+        # Only full recompute: replica resync or a wholesale replace
+        self.totals[wishlist_id] = RunningTotals.from_wishlist(wishlist, self.backend)
 
-    for set_details in wishlist.values():
-        try:
-            total_cost += float(set_details["set_price"])
-        except ValueError:
-            continue
 
-    return total_cost
+def totals_for(message, replica, wishlist_totals):
+    wishlist = replica.wishlist_for(message)
 
+    # Older clients send the wishlist inline, there is nothing to keep running
+    if message.get("wishlist") is not None:
+        return RunningTotals.from_wishlist(wishlist, wishlist_totals.backend)
 
-def total_pieces_of_sets(wishlist):
-    total_pieces = 0
+    return wishlist_totals.get(message.get("wishlist_id", DEFAULT_WISHLIST_ID))
+
+
+def metrics_response(message, totals):
+    metrics = message.get("metrics", list(METRICS))
+    if not isinstance(metrics, list) or not all(
+        isinstance(metric, str) for metric in metrics
+    ):
+        return {"status": "error", "message": "Metrics must be a list of names"}
+
+    unknown = [metric for metric in metrics if metric not in METRICS]
+    if unknown:
+        return {"status": "error", "message": f"Unknown metrics: {', '.join(unknown)}"}
+
+    return {
+        "status": "success",
+        "metrics": {metric: METRICS[metric](totals) for metric in metrics},
+    }
+
+
+# Command -> what its reply is logged as
+TOTALS_REPLIES = {
+    "total_number_of_sets": "total number of sets",
+    "total_cost_of_sets": "total cost of sets",
+    "total_pieces_of_sets": "total pieces of sets",
+    "totals": "requested totals",
+    "totals_summary": "totals summary",
+    "resync": "totals summary",
+    "partial_totals": "partial totals",
+}
+
+
+def totals_response(message, totals):
+    command = message.get("command")
+
+    if command == "total_number_of_sets":
+        return {"status": "success", "total_sets": totals.total_sets}
+    if command == "total_cost_of_sets":
+        return {"status": "success", "total_cost": totals.total_cost}
+    if command == "total_pieces_of_sets":
+        return {"status": "success", "total_pieces": totals.total_pieces}
+    if command == "totals":
+        return metrics_response(message, totals)
+    if command in ("totals_summary", "resync"):
+        return {"status": "success", **totals.summary()}
+
+    return {"status": "error", "message": "Invalid command"}
+
+
+def shard_request(message, shard_count):
+    # Every command is answered from the same sums, each shard sends its own
+    shard_message = {
+        **message,
+        "command": "partial_totals",
+        "resync": message.get("command") == "resync",
+    }
+    return [shard_message] * shard_count
+
+
+def merge_replies(message, replies):
+    """
+    One reply out of every shard's partial sums
+    """
+    failed = failed_reply(replies)
+    if failed is not None:
+        return failed
+
+    return totals_response(
+        message, MergedTotals([reply["partials"] for reply in replies])
+    )
+
+
+class TotalsHandler:
+    # Commands answered, what the gateway dispatches on
+    COMMANDS = tuple(TOTALS_REPLIES)
+
+    def __init__(self, replica, backend) -> None:
+        """
+        Totals requests against replica's wishlists, kept running per change
+        """
+        self.replica = replica
+        self.wishlist_totals = WishlistTotals(backend)
+        replica.store.add_listener(self.wishlist_totals)
+
+    def __call__(self, message):
+        command = message.get("command")
 
-    for set_details in wishlist.values():
         try:
-            total_pieces += int(set_details["set_pieces"])
-        except ValueError:
-            continue
+            if command == "resync" or message.get("resync"):
+                self.replica.resync(message.get("wishlist_id", DEFAULT_WISHLIST_ID))
+            totals = totals_for(message, self.replica, self.wishlist_totals)
+        except WishlistStoreUnavailable as error:
+            return {"status": "error", "message": str(error)}
 
-    return total_pieces
+        if command == "partial_totals":
+            # One shard's share, see merge_replies
+            return {"status": "success", "partials": totals.partials()}
+        return totals_response(message, totals)
 
+    def close(self):
+        pass
 
-def main():
-    context = zmq.Context()
 
-    socket = context.socket(zmq.REP)
-    socket.bind("tcp://*:5558")
+def parse_args():
+    parser = argparse.ArgumentParser(description="LEGO Total Count Service")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="python",
+        help="how full recomputes (resync, inline wishlists) are evaluated",
+    )
+    add_worker_arguments(parser)
+    add_shard_arguments(parser)
+    add_registry_arguments(parser, SERVICE_PORTS["totals"])
+    args = parser.parse_args()
+
+    try:
+        check_backend(args.backend)
+    except RuntimeError as error:
+        parser.error(str(error))
+
+    return args
+
 
+def serve(context, socket, args):
+    """
+    Request loop of one worker, each keeps its own replica and indexes
+    """
     # Register socket with poller, use for 'Ctrl+C' stops
     poller = zmq.Poller()
     poller.register(socket, zmq.POLLIN)
 
+    # Sets are read from the shared wishlist store by wishlist ID
+    replica = WishlistReplica(context, store=shard_store(args))
+    handle = TotalsHandler(replica, args.backend)
+    poller.register(replica.updates_socket, zmq.POLLIN)
+
     try:
-        print("\nLEGO Total Count Service running & listening for requests...")
         while True:
             sockets = dict(poller.poll(1000))  # Poll every 1 second
 
+            if replica.updates_socket in sockets:
+                replica.drain_updates()
+
             if socket in sockets:
-                message = socket.recv_json()
+                message, codec = recv_message(socket)
+                if message is None:
+                    continue
                 print("\n🡺  Received request to count LEGO sets...")
-                command = message.get("command")
-                wishlist = message.get("wishlist")
-
-                if command == "total_number_of_sets":
-                    total_sets = total_number_of_sets(wishlist)
-                    socket.send_json({"status": "success", "total_sets": total_sets})
-                    print("🡸  Sent response of total number of sets!")
-                elif command == "total_cost_of_sets":
-                    total_cost = total_cost_of_sets(wishlist)
-                    socket.send_json({"status": "success", "total_cost": total_cost})
-                    print("🡸  Sent response of total cost of sets!")
-                elif command == "total_pieces_of_sets":
-                    total_pieces = total_pieces_of_sets(wishlist)
-                    socket.send_json(
-                        {"status": "success", "total_pieces": total_pieces}
-                    )
-                    print("🡸  Sent response of total pieces of sets!")
-                else:
-                    socket.send_json({"status": "error", "message": "Invalid command"})
 
-    except KeyboardInterrupt:
-        print("\nLEGO Total Count Service shutting down...")
+                response = handle(message)
+                send_message(socket, response, codec)
+                if response["status"] == "success":
+                    reply = TOTALS_REPLIES[message["command"]]
+                    print(f"🡸  Sent response of {reply}!")
 
     finally:
-        socket.close()
-        context.term()
+        replica.close()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        print("\nLEGO Total Count Service running & listening for requests...")
+        # Announced to the registry so clients spread requests over instances
+        run_workers(
+            f"tcp://*:{args.port}",
+            serve,
+            args,
+            shard_request,
+            merge_replies,
+            announcer=Announcer(["totals"], args),
+        )
+
+    except KeyboardInterrupt:
+        print("\nLEGO Total Count Service shutting down...")
 
 
 if __name__ == "__main__":
@@ -1,74 +1,268 @@
+import argparse
+import functools
+import itertools
+import os
+import sys
+
 import zmq
 
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
 
-def sort_wishlist(wishlist, order):
-    # Convert wishlist dict to a list of dicts with prices (floats)
-    wishlist_list = []
+from common.columnar import ColumnarWishlist
+from common.pagination import (
+    check_cursor_version,
+    page_response,
+    page_window,
+    paginate,
+    top_k,
+)
+from common.parallel_sort import ParallelSorter, add_parallel_sort_arguments
+from common.registry import SERVICE_PORTS, Announcer, add_registry_arguments
+from common.result_cache import ResultCache, add_cache_arguments, merge_stats
+from common.sharding import (
+    add_shard_arguments,
+    failed_reply,
+    first_pages_request,
+    merge_page,
+    merge_sorted,
+    shard_store,
+)
+from common.sorted_index import SORT_KEYS, SortedIndex, WishlistIndexes, build_index
+from common.wishlist_replica import WishlistReplica, WishlistStoreUnavailable
+from common.wishlist_store import DEFAULT_WISHLIST_ID
+from common.wire import recv_message, send_message
+from common.worker_pool import add_worker_arguments, run_workers
 
-    for set_number, set_details in wishlist.items():
-        set_price = float(set_details["set_price"])
+# Legacy commands only ever sorted by price
+SORT_COMMANDS = {
+    "sort_low_to_high": ("price", "asc"),
+    "sort_high_to_low": ("price", "desc"),
+}
 
-        set_details_copy = set_details.copy()
-        set_details_copy["set_price"] = set_price
-        set_details_copy["set_number"] = set_number
 
-        wishlist_list.append(set_details_copy)
+def sort_wishlist(wishlist, order, key="price", offset=0, limit=None, sorter=None):
+    # One-off sort for a wishlist sent inline, no index to keep around
+    wishlist = ColumnarWishlist.from_dict(wishlist)
 
-    # Sort list based on set_price
-    is_reverse = True if order == "desc" else False
-    sorted_list = sorted(
-        wishlist_list, key=lambda lego_set: lego_set["set_price"], reverse=is_reverse
-    )
+    if limit is not None:
+        # Only the first offset + limit sets are needed, partial heap sort
+        first_sets = top_k(
+            wishlist,
+            offset + limit,
+            lambda set_number: SORT_KEYS[key](set_number, wishlist),
+            descending=order == "desc",
+        )
+        return {
+            set_number: wishlist[set_number]
+            for set_number in paginate(first_sets, offset, limit)
+        }
 
-    # Convert back to dict
-    sorted_wishlist = {}
+    index = SortedIndex(SORT_KEYS[key])
+    # Big wishlists are sorted over a process pool, when one is set up
+    build_index(index, key, wishlist, sorter)
 
-    for set_details in sorted_list:
-        set_details["set_price"] = str(set_details["set_price"])
-        set_number = set_details.pop("set_number")
-        sorted_wishlist[set_number] = set_details
+    return indexed_sort(wishlist, index, order, offset)
 
-    return sorted_wishlist
 
+def indexed_sort(wishlist, index, order, offset=0, limit=None):
+    return {
+        set_number: wishlist[set_number]
+        for set_number in index.set_numbers(order == "desc", offset, limit)
+    }
 
-def main():
-    context = zmq.Context()
 
-    socket = context.socket(zmq.REP)
-    socket.bind("tcp://*:5555")
+def sort_order(message):
+    command = message.get("command")
+
+    if command in SORT_COMMANDS:
+        return SORT_COMMANDS[command]
+    return message.get("key", "price"), message.get("order", "asc")
+
+
+def sort_request(message, replica, wishlist_indexes):
+    if message.get("command") not in (*SORT_COMMANDS, "sort"):
+        return {"status": "error", "message": "Invalid command"}
+
+    key, order = sort_order(message)
+
+    if key not in SORT_KEYS or order not in ("asc", "desc"):
+        return {"status": "error", "message": f"Invalid sort: {key} {order}"}
+
+    wishlist = replica.wishlist_for(message)
+    wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+    inline = message.get("wishlist") is not None
+    version = None if inline else replica.store.version(wishlist_id)
+
+    try:
+        check_cursor_version(message, version)
+        offset, limit, total = page_window(message, len(wishlist))
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+
+    if inline:
+        sorted_wishlist = sort_wishlist(
+            wishlist, order, key, offset, limit, wishlist_indexes.sorter
+        )
+    else:
+        index = wishlist_indexes.get(wishlist_id, key)
+        sorted_wishlist = indexed_sort(wishlist, index, order, offset, limit)
+
+    return page_response(sorted_wishlist, offset, limit, total, version)
+
+
+def shard_request(message, shard_count):
+    if message.get("command") in (*SORT_COMMANDS, "sort"):
+        return first_pages_request(message, shard_count)
+    return [message] * shard_count
+
+
+def merge_replies(message, replies):
+    """
+    One reply out of every shard's: sorted pages k-way merged, stats summed
+    """
+    failed = failed_reply(replies)
+    if failed is not None:
+        return failed
+    if message.get("command") == "cache_stats":
+        return {
+            "status": "success",
+            "cache": merge_stats([reply["cache"] for reply in replies]),
+        }
+
+    key, order = sort_order(message)
+
+    def merge(sets, streams, count):
+        wishlist = ColumnarWishlist.from_dict(sets)
+
+        def sort_key(set_number):
+            return SORT_KEYS[key](set_number, wishlist)
+
+        # Shards list sets by (key, set number), then unsortable ones by number
+        return itertools.chain(
+            merge_sorted(
+                [
+                    [number for number in stream if sort_key(number) is not None]
+                    for stream in streams
+                ],
+                key=lambda set_number: (sort_key(set_number), set_number),
+                descending=order == "desc",
+            ),
+            merge_sorted(
+                [
+                    [number for number in stream if sort_key(number) is None]
+                    for stream in streams
+                ],
+                key=None,
+            ),
+        )
+
+    return merge_page(message, replies, merge)
 
+
+class SortHandler:
+    # Commands answered, what the gateway dispatches on
+    COMMANDS = (*SORT_COMMANDS, "sort", "cache_stats")
+
+    def __init__(self, replica, cache_size, sorter=None) -> None:
+        """
+        Sort requests against replica's wishlists, indexed and cached
+        """
+        self.replica = replica
+        self.wishlist_indexes = WishlistIndexes(sorter=sorter)
+        replica.store.add_listener(self.wishlist_indexes)
+        # Repeated queries are answered from cache until the wishlist changes
+        self.cache = ResultCache(cache_size)
+        replica.store.add_listener(self.cache)
+
+    def __call__(self, message):
+        try:
+            if message.get("command") == "cache_stats":
+                return {"status": "success", "cache": self.cache.stats()}
+            return self.cache.reply(
+                message,
+                self.replica,
+                lambda: sort_request(message, self.replica, self.wishlist_indexes),
+            )
+        except WishlistStoreUnavailable as error:
+            return {"status": "error", "message": str(error)}
+
+    def close(self):
+        pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LEGO Sort Service")
+    add_cache_arguments(parser)
+    add_parallel_sort_arguments(parser)
+    add_worker_arguments(parser)
+    add_shard_arguments(parser)
+    add_registry_arguments(parser, SERVICE_PORTS["sort"])
+    return parser.parse_args()
+
+
+def serve(context, socket, args, sorter=None):
+    """
+    Request loop of one worker, each keeps its own replica and indexes
+
+    sorter, when given, is shared with the other workers (threads).
+    """
     # Register socket with poller, use for 'Ctrl+C' stops
     poller = zmq.Poller()
     poller.register(socket, zmq.POLLIN)
 
+    # Sets are read from the shared wishlist store by wishlist ID
+    replica = WishlistReplica(context, store=shard_store(args))
+    handle = SortHandler(replica, args.cache_size, sorter)
+    poller.register(replica.updates_socket, zmq.POLLIN)
+
     try:
-        print("\nLEGO Sort Service running & listening for requests...")
         while True:
             sockets = dict(poller.poll(1000))  # Poll every 1 second
 
+            if replica.updates_socket in sockets:
+                replica.drain_updates()
+
             if socket in sockets:
-                message = socket.recv_json()
+                message, codec = recv_message(socket)
+                if message is None:
+                    continue
                 print("\n🡺  Received request to sort LEGO sets...")
-                command = message.get("command")
-                wishlist = message.get("wishlist")
 
-                if command == "sort_low_to_high":
-                    sorted_wishlist = sort_wishlist(wishlist, "asc")
-                    socket.send_json({"status": "success", "wishlist": sorted_wishlist})
-                    print("🡸  Sent response of sorted wishlist!")
-                elif command == "sort_high_to_low":
-                    sorted_wishlist = sort_wishlist(wishlist, "desc")
-                    socket.send_json({"status": "success", "wishlist": sorted_wishlist})
+                response = handle(message)
+                send_message(socket, response, codec)
+                if response["status"] == "success":
                     print("🡸  Sent response of sorted wishlist!")
-                else:
-                    socket.send_json({"status": "error", "message": "Invalid command"})
+
+    finally:
+        handle.close()
+        replica.close()
+
+
+def main():
+    args = parse_args()
+    # One pool for the whole service, however many worker threads share it
+    sorter = ParallelSorter(args.sort_processes, args.parallel_sort_threshold)
+
+    try:
+        print("\nLEGO Sort Service running & listening for requests...")
+        # Announced to the registry so clients spread requests over instances
+        run_workers(
+            f"tcp://*:{args.port}",
+            functools.partial(serve, sorter=sorter),
+            args,
+            shard_request,
+            merge_replies,
+            announcer=Announcer(["sort"], args),
+        )
 
     except KeyboardInterrupt:
         print("\nLEGO Sort Service shutting down...")
 
     finally:
-        socket.close()
-        context.term()
+        sorter.close()
 
 
 if __name__ == "__main__":
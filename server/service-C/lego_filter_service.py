@@ -1,80 +1,275 @@
+import argparse
+import os
+import sys
+
 import zmq
 
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
 
-def filter_by_age(wishlist, min_age):
-    filtered_wishlist = {}
+from common.pagination import (
+    PAGE_FIELDS,
+    check_cursor_version,
+    page_response,
+    page_window,
+    paginate,
+    top_k,
+)
+from common.columnar import ColumnarWishlist
+from common.query import FILTER_INDEX_KEYS, query_indexed, query_scan
+from common.registry import SERVICE_PORTS, Announcer, add_registry_arguments
+from common.result_cache import ResultCache, add_cache_arguments, merge_stats
+from common.sharding import (
+    add_shard_arguments,
+    failed_reply,
+    first_pages_request,
+    merge_page,
+    merge_sorted,
+    shard_store,
+)
+from common.sorted_index import SORT_KEYS, WishlistIndexes, set_number_key
+from common.vectorized import BACKENDS, check_backend, vector_query
+from common.wishlist_replica import WishlistReplica, WishlistStoreUnavailable
+from common.wishlist_store import DEFAULT_WISHLIST_ID
+from common.wire import recv_message, send_message
+from common.worker_pool import add_worker_arguments, run_workers
 
-    for set_number, set_details in wishlist.items():
-        try:
-            set_age = int(set_details["set_age_group"].rstrip("+"))
 
-            if set_age >= min_age:
-                filtered_wishlist[set_number] = set_details
-        except ValueError:
-            continue
+# Legacy single-threshold commands -> (indexed field, request parameter)
+LEGACY_FILTERS = {
+    "filter_by_age": ("age", "min_age"),
+    "filter_by_pieces": ("pieces", "min_pieces"),
+}
+
+
+def match_request(message, wishlist, wishlist_indexes, backend="python"):
+    """
+    Every set number a filter request matches, in reply order
+
+    Pages of the result are slices of this, so it's worked out (and cached)
+    once per query rather than once per page.
+    """
+    command = message.get("command")
+
+    if command in LEGACY_FILTERS:
+        field, parameter = LEGACY_FILTERS[command]
+        where = {field: {"min": message.get(parameter)}}
+    elif command == "query":
+        where = message.get("where") or {}
+    else:
+        return {"status": "error", "message": "Invalid command"}
+
+    try:
+        if backend == "numpy":
+            set_numbers = vector_query(where, wishlist)
+        elif message.get("wishlist") is not None:
+            set_numbers = query_scan(where, wishlist)
+        else:
+            wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+            indexes = wishlist_indexes.for_wishlist(wishlist_id)
+            set_numbers = query_indexed(where, wishlist, indexes)
+
+        _, _, total = page_window(message, len(set_numbers))
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+
+    if message.get("top_k") is not None:
+        # Best k matches by a sort key, e.g. the 20 cheapest sets for ages 18+
+        key = message.get("key", "price")
+        if key not in SORT_KEYS:
+            return {"status": "error", "message": f"Invalid sort key: {key}"}
+        set_numbers = top_k(
+            set_numbers,
+            total,
+            lambda set_number: SORT_KEYS[key](set_number, wishlist),
+            descending=message.get("order") == "desc",
+        )
+
+    return {"status": "success", "set_numbers": set_numbers}
+
+
+def filter_page(message, wishlist, set_numbers, version=None):
+    try:
+        check_cursor_version(message, version)
+        offset, limit, total = page_window(message, len(set_numbers))
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+
+    page = {
+        set_number: wishlist[set_number]
+        for set_number in paginate(set_numbers, offset, limit)
+    }
+    return page_response(page, offset, limit, total, version)
+
+
+def shard_request(message, shard_count):
+    if message.get("command") in (*LEGACY_FILTERS, "query"):
+        return first_pages_request(message, shard_count)
+    return [message] * shard_count
+
+
+def merge_replies(message, replies):
+    """
+    One reply out of every shard's: matches unioned in order, stats summed
+    """
+    failed = failed_reply(replies)
+    if failed is not None:
+        return failed
+    if message.get("command") == "cache_stats":
+        return {
+            "status": "success",
+            "cache": merge_stats([reply["cache"] for reply in replies]),
+        }
+
+    def merge(sets, streams, count):
+        if message.get("top_k") is None:
+            # Matches come in set number order from every shard
+            return merge_sorted(streams, key=set_number_key)
+
+        # Each shard sent its best ones, pick the best of those
+        wishlist = ColumnarWishlist.from_dict(sets)
+        key = message.get("key", "price")
+        return top_k(
+            sets,
+            count,
+            lambda set_number: SORT_KEYS[key](set_number, wishlist),
+            descending=message.get("order") == "desc",
+        )
 
-    return filtered_wishlist
+    return merge_page(message, replies, merge)
 
 
-def filter_by_pieces(wishlist, min_pieces):
-    filtered_wishlist = {}
+class FilterHandler:
+    # Commands answered, what the gateway dispatches on
+    COMMANDS = (*LEGACY_FILTERS, "query", "cache_stats")
 
-    for set_number, set_details in wishlist.items():
+    def __init__(self, replica, backend, cache_size) -> None:
+        """
+        Filter requests against replica's wishlists, indexed and cached
+        """
+        self.replica = replica
+        self.backend = backend
+        self.wishlist_indexes = WishlistIndexes(FILTER_INDEX_KEYS)
+        # Column masks need no indexes, skip maintaining them
+        if backend == "python":
+            replica.store.add_listener(self.wishlist_indexes)
+        # Repeated queries are answered from cache until the wishlist changes
+        self.cache = ResultCache(cache_size)
+        replica.store.add_listener(self.cache)
+        # ...and so are the match lists their pages are cut from
+        self.matches = ResultCache(cache_size)
+        replica.store.add_listener(self.matches)
+
+    def __call__(self, message):
         try:
-            pieces = int(set_details["set_pieces"])
+            if message.get("command") == "cache_stats":
+                return {"status": "success", "cache": self.cache.stats()}
+            return self.cache.reply(message, self.replica, lambda: self.filter(message))
+        except WishlistStoreUnavailable as error:
+            return {"status": "error", "message": str(error)}
 
-            if pieces >= min_pieces:
-                filtered_wishlist[set_number] = set_details
-        except ValueError:
-            continue
+    def filter(self, message):
+        # Fetched once: fetching again would apply deltas arriving since,
+        # which can remove sets the matches still list
+        wishlist = self.replica.wishlist_for(message)
+        query = {
+            field: value for field, value in message.items() if field not in PAGE_FIELDS
+        }
+        matches = self.matches.reply(
+            query,
+            self.replica,
+            lambda: match_request(query, wishlist, self.wishlist_indexes, self.backend),
+        )
+        if matches["status"] != "success":
+            return matches
 
-    return filtered_wishlist
+        if message.get("wishlist") is not None:
+            version = None
+        else:
+            wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+            version = self.replica.store.version(wishlist_id)
+        return filter_page(message, wishlist, matches["set_numbers"], version)
 
+    def close(self):
+        pass
 
-def main():
-    context = zmq.Context()
 
-    socket = context.socket(zmq.REP)
-    socket.bind("tcp://*:5556")
+def parse_args():
+    parser = argparse.ArgumentParser(description="LEGO Filter Service")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="python",
+        help="python: per-field sorted indexes, numpy: vectorized column masks",
+    )
+    add_cache_arguments(parser)
+    add_worker_arguments(parser)
+    add_shard_arguments(parser)
+    add_registry_arguments(parser, SERVICE_PORTS["filter"])
+    args = parser.parse_args()
+
+    try:
+        check_backend(args.backend)
+    except RuntimeError as error:
+        parser.error(str(error))
+
+    return args
 
+
+def serve(context, socket, args):
+    """
+    Request loop of one worker, each keeps its own replica and indexes
+    """
     # Register socket with poller, use for 'Ctrl+C' stops
     poller = zmq.Poller()
     poller.register(socket, zmq.POLLIN)
 
+    # Sets are read from the shared wishlist store by wishlist ID
+    replica = WishlistReplica(context, store=shard_store(args))
+    handle = FilterHandler(replica, args.backend, args.cache_size)
+    poller.register(replica.updates_socket, zmq.POLLIN)
+
     try:
-        print("\nLEGO Filter Service running & listening for requests...")
         while True:
             sockets = dict(poller.poll(1000))  # Poll every 1 second
 
+            if replica.updates_socket in sockets:
+                replica.drain_updates()
+
             if socket in sockets:
-                message = socket.recv_json()
+                message, codec = recv_message(socket)
+                if message is None:
+                    continue
                 print("\n🡺  Received request to filter LEGO sets...")
-                command = message.get("command")
-                wishlist = message.get("wishlist")
-
-                if command == "filter_by_age":
-                    min_age = message.get("min_age")
-                    filtered_wishlist = filter_by_age(wishlist, min_age)
-                    socket.send_json(
-                        {"status": "success", "wishlist": filtered_wishlist}
-                    )
-                    print("🡸  Sent response of filtered wishlist by age!")
-                elif command == "filter_by_pieces":
-                    min_pieces = message.get("min_pieces")
-                    filtered_wishlist = filter_by_pieces(wishlist, min_pieces)
-                    socket.send_json(
-                        {"status": "success", "wishlist": filtered_wishlist}
-                    )
-                    print("🡸  Sent response of filtered wishlist by pieces!")
-                else:
-                    socket.send_json({"status": "error", "message": "Invalid command"})
 
-    except KeyboardInterrupt:
-        print("\nLEGO Filter Service shutting down...")
+                response = handle(message)
+                send_message(socket, response, codec)
+                if response["status"] == "success":
+                    print("🡸  Sent response of filtered wishlist!")
 
     finally:
-        socket.close()
-        context.term()
+        replica.close()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        print("\nLEGO Filter Service running & listening for requests...")
+        # Announced to the registry so clients spread requests over instances
+        run_workers(
+            f"tcp://*:{args.port}",
+            serve,
+            args,
+            shard_request,
+            merge_replies,
+            announcer=Announcer(["filter"], args),
+        )
+
+    except KeyboardInterrupt:
+        print("\nLEGO Filter Service shutting down...")
 
 
 if __name__ == "__main__":
@@ -1,70 +1,295 @@
+import argparse
+import os
+import sys
+
 import zmq
-import webbrowser
 
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
 
-def search_lego_on_google(lego_set_spec):
-    query = f"LEGO {lego_set_spec}"
-    url = f"https://www.google.com/search?q={query}"
-    webbrowser.open_new_tab(url)
+from common.bulk_import import import_sets
+from common.columnar import ColumnarWishlist
+from common.pagination import page_response, page_window, paginate
+from common.registry import SERVICE_PORTS, Announcer, add_registry_arguments
+from common.search_jobs import (
+    DEFAULT_LOOKUP_THREADS,
+    DEFAULT_LOOKUP_TTL,
+    LOOKUP_BACKENDS,
+    LookupJobs,
+)
+from common.search_index import SearchIndex, WishlistSearchIndexes
+from common.suggest import DEFAULT_SUGGESTIONS, SuggestionIndex, WishlistSuggestions
+from common.vectorized import BACKENDS, check_backend
+from common.wishlist_replica import WishlistReplica, WishlistStoreUnavailable
+from common.wishlist_store import DEFAULT_WISHLIST_ID
+from common.wire import recv_message, send_message
+from common.worker_pool import add_worker_arguments, run_workers
 
+# Legacy commands -> request field holding the search text
+SEARCH_COMMANDS = {
+    "search": "query",
+    "search_by_number": "set_number",
+    "search_by_name": "set_name",
+}
 
-def search_by_number(set_number):
-    search_lego_on_google(set_number)
 
+def load_catalogue(path):
+    """
+    Catalogue of LEGO sets to search besides the wishlist, CSV or JSONL
+    """
+    catalogue = {}
+    report = import_sets(path, catalogue, "catalogue", save_ops=lambda ops: None)
+    print(f"Indexed {report['imported']} catalogue sets ({report['rejected']} bad)")
 
-def search_by_name(set_name):
-    search_lego_on_google(set_name)
+    catalogue = ColumnarWishlist.from_dict(catalogue)
+    return (
+        catalogue,
+        SearchIndex.from_wishlist(catalogue),
+        SuggestionIndex.from_wishlist(catalogue),
+    )
 
 
-def main():
-    context = zmq.Context()
+def indexes_for(message, replica, search_indexes, suggestions, catalogue):
+    """
+    (wishlist, SearchIndex, SuggestionIndex) a request is about
+    """
+    if message.get("source") == "catalogue":
+        if catalogue is None:
+            raise ValueError("No catalogue loaded")
+        return catalogue
+
+    wishlist = replica.wishlist_for(message)
+
+    if message.get("wishlist") is not None:
+        return (
+            wishlist,
+            SearchIndex.from_wishlist(wishlist),
+            SuggestionIndex.from_wishlist(wishlist),
+        )
+
+    wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+    return wishlist, search_indexes.get(wishlist_id), suggestions.get(wishlist_id)
+
+
+def named_sets(set_numbers, wishlist):
+    return [
+        {"set_number": set_number, "set_name": wishlist.text_of(set_number, "set_name")}
+        for set_number in set_numbers
+    ]
+
+
+def search_request(message, indexes, backend="python"):
+    wishlist, search_index, suggestion_index = indexes
+    query = str(message.get(SEARCH_COMMANDS[message["command"]]) or "")
+
+    # Every set matching is an upper bound, enough to know how many to rank
+    offset, limit, _ = page_window(message, len(search_index))
+    count = None if limit is None else offset + limit
+    matches, set_numbers = search_index.search(query, count, backend)
+    # ...the page itself is cut to the matches' top_k
+    offset, limit, total = page_window(message, matches)
+
+    page = {
+        set_number: wishlist[set_number]
+        for set_number in paginate(set_numbers, offset, limit)
+    }
+    response = page_response(page, offset, limit, total)
+    # What older clients print
+    response["result"] = f"Found {matches} LEGO sets matching '{query}'"
+
+    if not matches:
+        response["suggestions"] = named_sets(suggestion_index.suggest(query), wishlist)
+    return response
+
+
+def suggest_request(message, indexes):
+    wishlist, _, suggestion_index = indexes
+    count = message.get("count", DEFAULT_SUGGESTIONS)
+    if not isinstance(count, int) or count < 0:
+        raise ValueError(f"Invalid suggestion count: {count}")
+
+    set_numbers = suggestion_index.suggest(str(message.get("text") or ""), count)
+    return {"status": "success", "suggestions": named_sets(set_numbers, wishlist)}
+
+
+def lookup_request(message, lookups):
+    """
+    Start (or check on) a web lookup, answered without waiting for it
+    """
+    query = str(message.get("query") or "").strip()
+    if not query:
+        return {"status": "error", "message": "Nothing to look up"}
+
+    return {"status": "success", **lookups.submit(query)}
+
+
+def text_request(message, replica, search_indexes, suggestions, catalogue, backend):
+    command = message.get("command")
+    if command not in SEARCH_COMMANDS and command != "suggest":
+        return {"status": "error", "message": "Invalid command"}
+
+    try:
+        indexes = indexes_for(message, replica, search_indexes, suggestions, catalogue)
+        if command == "suggest":
+            return suggest_request(message, indexes)
+        return search_request(message, indexes, backend)
+    except ValueError as error:
+        return {"status": "error", "message": str(error)}
+
+
+class SearchHandler:
+    # Commands answered, what the gateway dispatches on
+    COMMANDS = (*SEARCH_COMMANDS, "suggest", "lookup", "lookup_stats")
 
-    socket = context.socket(zmq.REP)
-    socket.bind("tcp://*:5557")
+    def __init__(
+        self,
+        replica,
+        backend,
+        catalogue=None,
+        lookup_backend="catalogue",
+        lookup_threads=DEFAULT_LOOKUP_THREADS,
+        lookup_ttl=DEFAULT_LOOKUP_TTL,
+    ) -> None:
+        """
+        Search requests against replica's wishlists and a loaded catalogue
+        """
+        self.replica = replica
+        self.backend = backend
+        self.catalogue = catalogue
+        self.search_indexes = WishlistSearchIndexes()
+        replica.store.add_listener(self.search_indexes)
+        self.suggestions = WishlistSuggestions()
+        replica.store.add_listener(self.suggestions)
 
+        # Slow lookups run in the background, requests for them answer at once
+        self.lookups = LookupJobs(
+            LOOKUP_BACKENDS[lookup_backend](catalogue),
+            lookup_backend,
+            lookup_threads,
+            lookup_ttl,
+        )
+
+    def __call__(self, message):
+        try:
+            if message.get("command") == "lookup":
+                return lookup_request(message, self.lookups)
+            if message.get("command") == "lookup_stats":
+                return {"status": "success", "lookups": self.lookups.stats()}
+            return text_request(
+                message,
+                self.replica,
+                self.search_indexes,
+                self.suggestions,
+                self.catalogue,
+                self.backend,
+            )
+        except WishlistStoreUnavailable as error:
+            return {"status": "error", "message": str(error)}
+
+    def close(self):
+        self.lookups.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LEGO Web Search Service")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="python",
+        help="python: plain loops over postings, numpy: postings scored as arrays",
+    )
+    parser.add_argument(
+        "--catalogue",
+        help="CSV / JSONL file of LEGO sets searchable with source=catalogue",
+    )
+    parser.add_argument(
+        "--lookup-backend",
+        choices=LOOKUP_BACKENDS,
+        default="catalogue",
+        help="what 'lookup' requests run on, catalogue is a local stand-in",
+    )
+    parser.add_argument(
+        "--lookup-threads",
+        type=int,
+        default=DEFAULT_LOOKUP_THREADS,
+        help="lookups run at once per worker",
+    )
+    parser.add_argument(
+        "--lookup-ttl",
+        type=float,
+        default=DEFAULT_LOOKUP_TTL,
+        help="seconds a lookup's results are reused for",
+    )
+    add_worker_arguments(parser)
+    add_registry_arguments(parser, SERVICE_PORTS["search"])
+    args = parser.parse_args()
+
+    try:
+        check_backend(args.backend)
+    except RuntimeError as error:
+        parser.error(str(error))
+
+    return args
+
+
+def serve(context, socket, args):
+    """
+    Request loop of one worker, each keeps its own replica and indexes
+    """
     # Register socket with poller, use for 'Ctrl+C' stops
     poller = zmq.Poller()
     poller.register(socket, zmq.POLLIN)
 
+    # Sets are read from the shared wishlist store by wishlist ID
+    replica = WishlistReplica(context)
+    catalogue = load_catalogue(args.catalogue) if args.catalogue else None
+    handle = SearchHandler(
+        replica,
+        args.backend,
+        catalogue,
+        args.lookup_backend,
+        args.lookup_threads,
+        args.lookup_ttl,
+    )
+    poller.register(replica.updates_socket, zmq.POLLIN)
+
     try:
-        print("\nLEGO Web Search Service running & listening for requests...")
         while True:
             sockets = dict(poller.poll(1000))  # Poll every 1 second
 
+            if replica.updates_socket in sockets:
+                replica.drain_updates()
+
             if socket in sockets:
-                message = socket.recv_json()
+                message, codec = recv_message(socket)
+                if message is None:
+                    continue
                 print("\n🡺  Received request to search LEGO sets...")
-                command = message.get("command")
-
-                if command == "search_by_number":
-                    set_number = message.get("set_number")
-                    search_by_number(set_number)
-                    socket.send_json(
-                        {
-                            "status": "success",
-                            "result": "Browser opened with search results by LEGO set number",
-                        }
-                    )
-                    print("🡸  Sent response of search by number!")
-                elif command == "search_by_name":
-                    set_name = message.get("set_name")
-                    search_by_name(set_name)
-                    socket.send_json(
-                        {
-                            "status": "success",
-                            "result": "Browser opened with search results by LEGO set name",
-                        }
-                    )
-                    print("🡸  Sent response of search by name!")
-                else:
-                    socket.send_json({"status": "error", "message": "Invalid command"})
 
-    except KeyboardInterrupt:
-        print("\nLEGO Web Search Service shutting down...")
+                response = handle(message)
+                send_message(socket, response, codec)
+                if response["status"] == "success":
+                    print("🡸  Sent response of search results!")
 
     finally:
-        socket.close()
-        context.term()
+        handle.close()
+        replica.close()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        print("\nLEGO Web Search Service running & listening for requests...")
+        # Announced to the registry so clients spread requests over instances
+        run_workers(
+            f"tcp://*:{args.port}", serve, args, announcer=Announcer(["search"], args)
+        )
+
+    except KeyboardInterrupt:
+        print("\nLEGO Web Search Service shutting down...")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import uuid
+from urllib.parse import quote
+
+import zmq
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from common.binary_snapshot import write_snapshot
+from common.content_hash import BUCKET_COUNT, WishlistHashes
+from common.wire import recv_message, send_message
+from common.wishlist_store import DEFAULT_WISHLIST_ID, WishlistStore
+
+
+def check_details(details, what):
+    # Text fields only: numbers are parsed from text, hashed and tokenized as
+    # text, a stray int would fail half way through applying the batch
+    if not isinstance(details, dict) or not all(
+        isinstance(field, str) and isinstance(value, str)
+        for field, value in details.items()
+    ):
+        raise ValueError(f"{what} must be an object of text fields")
+
+
+def check_ops(store, ops):
+    """
+    Raise on the first op the store would reject, before any is applied
+
+    Sets added, deleted or replaced by earlier ops of the batch count, so
+    editing a set added in the same batch is fine.
+    """
+    # wishlist ID -> {set number: whether the batch leaves it there}
+    changed = {}
+    replaced = {}
+
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError(f"Not an operation: {op!r}")
+        wishlist_id = op["wishlist_id"]
+        kind = op["op"]
+        if not isinstance(wishlist_id, str):
+            raise ValueError(f"Wishlist ID must be a string: {wishlist_id!r}")
+        sets = changed.setdefault(wishlist_id, {})
+
+        if kind == "replace":
+            if not isinstance(op["wishlist"], dict):
+                raise ValueError("Replacement wishlist must be an object")
+            for set_number, set_details in op["wishlist"].items():
+                if not isinstance(set_number, str):
+                    raise ValueError(f"Set number must be a string: {set_number!r}")
+                check_details(set_details, f"Set {set_number}")
+            replaced[wishlist_id] = op["wishlist"]
+            sets.clear()
+            continue
+        if kind not in ("add", "edit", "delete"):
+            raise ValueError(f"Unknown wishlist operation: {kind}")
+
+        set_number = op["set_number"]
+        if not isinstance(set_number, str):
+            raise ValueError(f"Set number must be a string: {set_number!r}")
+        if set_number in sets:
+            present = sets[set_number]
+        elif wishlist_id in replaced:
+            present = set_number in replaced[wishlist_id]
+        else:
+            present = set_number in store.get(wishlist_id)
+
+        if kind != "add" and not present:
+            raise KeyError(set_number)
+        if kind == "add":
+            check_details(op["set_details"], "set_details")
+        elif kind == "edit":
+            check_details(op["changes"], "changes")
+        sets[set_number] = kind != "delete"
+
+
+def apply_ops(store, publisher, ops, epoch):
+    """
+    Apply a batch of ops all or nothing, publishing each as a delta
+    """
+    check_ops(store, ops)
+    version = None
+
+    for op in ops:
+        version = store.apply(op)
+        # Replicas in the sort/filter/total services apply the same delta
+        publisher.send_json({**op, "version": version, "epoch": epoch})
+
+    return version
+
+
+def remove_snapshot(path):
+    try:
+        os.remove(path)
+    except PermissionError:
+        # Still mapped by a replica (Windows): left for the next snapshot's
+        # cleanup to try again
+        pass
+
+
+def mapped_snapshot(store, snapshot_dir, wishlist_id, epoch):
+    """
+    Path of a binary snapshot of the wishlist's current version
+
+    Written once per version, replicas on this host map the same file.
+    Named by epoch too: a restarted store numbers versions from 1 again.
+    """
+    version = store.version(wishlist_id)
+    # No dots in the ID part, so one wishlist's glob can't match another's
+    name = quote(wishlist_id, safe="").replace(".", "%2E")
+    prefix = os.path.join(snapshot_dir, name)
+    path = f"{prefix}.{epoch}.v{version}.wuab"
+
+    if not os.path.exists(path):
+        write_snapshot(path, store.get(wishlist_id), version)
+        # Replicas still mapping an older version keep their copy until unmapped
+        for old_path in glob.glob(glob.escape(prefix) + ".*.wuab"):
+            if old_path != path:
+                remove_snapshot(old_path)
+
+    return path, version
+
+
+def sync_hashes(message, tree, version):
+    """
+    Hashes a client reconciles its copy against, coarsest first
+
+    The root, plus every bucket hash when the client's root differs; or the
+    set hashes of just the buckets it asks for.
+    """
+    reply = {
+        "status": "success",
+        "version": version,
+        "root": tree.root(),
+        "size": tree.size,
+    }
+    buckets = message.get("buckets")
+
+    if buckets is not None:
+        if not all(
+            isinstance(bucket, int) and 0 <= bucket < BUCKET_COUNT for bucket in buckets
+        ):
+            return {"status": "error", "message": f"Invalid buckets: {buckets}"}
+        reply["sets"] = tree.hashes_in(buckets)
+    elif message.get("root") != reply["root"]:
+        reply["buckets"] = tree.bucket_hashes
+
+    return reply
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LEGO Wishlist Store Service")
+    parser.add_argument(
+        "--snapshot-dir",
+        default=os.path.join(tempfile.gettempdir(), "wish_upon_a_brick_snapshots"),
+        help="where binary snapshots are written for replicas to memory-map",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.snapshot_dir, exist_ok=True)
+
+    context = zmq.Context()
+
+    socket = context.socket(zmq.REP)
+    socket.bind("tcp://*:5559")
+
+    publisher = context.socket(zmq.PUB)
+    publisher.bind("tcp://*:5560")
+
+    # Bound, so no other store uses them: left by an earlier run, whose
+    # versions say nothing about this one's
+    for old_path in glob.glob(os.path.join(glob.escape(args.snapshot_dir), "*.wuab")):
+        remove_snapshot(old_path)
+
+    store = WishlistStore()
+    # Versions restart from 1 with the store, replicas tell runs apart by this
+    epoch = uuid.uuid4().hex
+    # Content hashes kept per set so clients can send only what differs
+    hashes = WishlistHashes()
+    store.add_listener(hashes)
+
+    # Register socket with poller, use for 'Ctrl+C' stops
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    try:
+        print("\nLEGO Wishlist Store Service running & listening for requests...")
+        while True:
+            sockets = dict(poller.poll(1000))  # Poll every 1 second
+
+            if socket in sockets:
+                message, codec = recv_message(socket)
+                if message is None:
+                    continue
+                print("\n🡺  Received request to access the wishlist store...")
+                command = message.get("command")
+                wishlist_id = message.get("wishlist_id", DEFAULT_WISHLIST_ID)
+
+                if command == "apply_ops":
+                    try:
+                        version = apply_ops(
+                            store, publisher, message.get("ops", []), epoch
+                        )
+                    except (KeyError, TypeError, ValueError) as error:
+                        send_message(
+                            socket,
+                            {
+                                "status": "error",
+                                "message": f"Invalid operation: {error}",
+                            },
+                            codec,
+                        )
+                        continue
+                    send_message(
+                        socket, {"status": "success", "version": version}, codec
+                    )
+                    print("🡸  Sent response of applied wishlist operations!")
+                elif command == "snapshot" and message.get("format") == "mmap":
+                    path, version = mapped_snapshot(
+                        store, args.snapshot_dir, wishlist_id, epoch
+                    )
+                    send_message(
+                        socket,
+                        {
+                            "status": "success",
+                            "path": path,
+                            "version": version,
+                            "epoch": epoch,
+                        },
+                        codec,
+                    )
+                    print("🡸  Sent response of mapped wishlist snapshot!")
+                elif command == "snapshot" and message.get("format") == "columns":
+                    if codec != "frames":
+                        send_message(
+                            socket,
+                            {"status": "error", "message": "Columns need frames codec"},
+                            codec,
+                        )
+                        continue
+                    # Arrays go out as raw buffers, no per-set encoding
+                    send_message(
+                        socket,
+                        {
+                            "status": "success",
+                            "columns": store.get(wishlist_id).to_wire(),
+                            "version": store.version(wishlist_id),
+                            "epoch": epoch,
+                        },
+                        codec,
+                    )
+                    print("🡸  Sent response of columnar wishlist snapshot!")
+                elif command == "snapshot":
+                    send_message(
+                        socket,
+                        {
+                            "status": "success",
+                            "wishlist": store.get(wishlist_id).to_dict(),
+                            "version": store.version(wishlist_id),
+                            "epoch": epoch,
+                        },
+                        codec,
+                    )
+                    print("🡸  Sent response of wishlist snapshot!")
+                elif command == "sync_hashes":
+                    send_message(
+                        socket,
+                        sync_hashes(
+                            message, hashes.get(wishlist_id), store.version(wishlist_id)
+                        ),
+                        codec,
+                    )
+                    print("🡸  Sent response of wishlist hashes!")
+                elif command == "version":
+                    send_message(
+                        socket,
+                        {
+                            "status": "success",
+                            "version": store.version(wishlist_id),
+                            "epoch": epoch,
+                        },
+                        codec,
+                    )
+                    print("🡸  Sent response of wishlist version!")
+                else:
+                    send_message(
+                        socket, {"status": "error", "message": "Invalid command"}, codec
+                    )
+
+    except KeyboardInterrupt:
+        print("\nLEGO Wishlist Store Service shutting down...")
+
+    finally:
+        socket.close()
+        publisher.close()
+        context.term()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+
+import zmq
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from common.registry import HEARTBEAT_TIMEOUT, ServiceRegistry
+from common.wire import recv_message, send_message
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LEGO Service Registry")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=HEARTBEAT_TIMEOUT,
+        help="seconds without a heartbeat before an instance is dropped",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    context = zmq.Context()
+
+    socket = context.socket(zmq.REP)
+    socket.bind("tcp://*:5561")
+
+    registry = ServiceRegistry(args.timeout)
+
+    # Register socket with poller, use for 'Ctrl+C' stops
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    try:
+        print("\nLEGO Service Registry running & listening for requests...")
+        while True:
+            sockets = dict(poller.poll(1000))  # Poll every 1 second
+
+            if socket in sockets:
+                message, codec = recv_message(socket)
+                if message is None:
+                    continue
+                command = message.get("command")
+                # An instance can serve several services (the gateway)
+                services = message.get("services") or []
+                address = message.get("address")
+
+                if command == "heartbeat" and services and address:
+                    for service in services:
+                        # Heartbeats come every second, only new instances are logged
+                        if address not in registry.addresses(service):
+                            print(f"\n🡺  {service} instance up at {address}")
+                        registry.heartbeat(service, address)
+                    send_message(socket, {"status": "success"}, codec)
+                elif command == "unregister" and services and address:
+                    for service in services:
+                        registry.remove(service, address)
+                        print(f"\n🡺  {service} instance at {address} shut down")
+                    send_message(socket, {"status": "success"}, codec)
+                elif command == "lookup" and message.get("service"):
+                    send_message(
+                        socket,
+                        {
+                            "status": "success",
+                            "addresses": registry.addresses(message["service"]),
+                        },
+                        codec,
+                    )
+                else:
+                    send_message(
+                        socket, {"status": "error", "message": "Invalid command"}, codec
+                    )
+
+    except KeyboardInterrupt:
+        print("\nLEGO Service Registry shutting down...")
+
+    finally:
+        socket.close()
+        context.term()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from common.bulk_import import MAX_REPORTED_ERRORS, import_sets
+from common.wishlist_store import DEFAULT_WISHLIST_ID, WishlistStore, replace_op
+
+
+def load_service(directory, filename):
+    # Service directories (service-A, ...) aren't packages, load by path
+    path = os.path.join(REPO_DIR, "server", directory, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+store_service = load_service("service-E", "lego_wishlist_store_service.py")
+
+# Saved by a spreadsheet: byte order mark, header row, a blank line
+CSV = """\ufeffName, Price, Age, Pieces, Set Number, Description
+Millennium Falcon, 849.99, 16+, 7541, 75192, The ultimate collector's starship, with crew
+
+Galaxy Explorer, 99.99, 18+, 1254, 10497, Classic space
+"""
+
+
+class BulkImportTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.chunks = []
+
+    def write(self, filename, text):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w", encoding="utf-8") as import_file:
+            import_file.write(text)
+        return path
+
+    def import_file(self, path, wishlist=None, **options):
+        wishlist = {} if wishlist is None else wishlist
+
+        def save_ops(ops):
+            # Ops come already applied to the wishlist
+            for op in ops:
+                self.assertIn(op["set_number"], wishlist)
+            self.chunks.append(list(ops))
+
+        report = import_sets(path, wishlist, DEFAULT_WISHLIST_ID, save_ops, **options)
+        return wishlist, report
+
+    def test_csv_with_header_and_commas_in_descriptions(self):
+        wishlist, report = self.import_file(self.write("sets.csv", CSV))
+
+        self.assertEqual(report, {"imported": 2, "rejected": 0, "errors": []})
+        self.assertEqual(list(wishlist), ["75192", "10497"])
+        self.assertEqual(
+            wishlist["75192"],
+            {
+                "set_name": "Millennium Falcon",
+                "set_price": "849.99",
+                "set_age_group": "16+",
+                "set_pieces": "7541",
+                "set_description": "The ultimate collector's starship, with crew",
+            },
+        )
+
+    def test_jsonl_records(self):
+        lines = [
+            {
+                "set_number": 75192,
+                "set_name": "Millennium Falcon",
+                "set_price": 849.99,
+                "set_age_group": "16+",
+                "set_pieces": 7541,
+            },
+            ["not", "an", "object"],
+            {
+                "set_number": "10497",
+                "set_name": "Galaxy Explorer",
+                "set_price": "99.99",
+                "set_age_group": "18+",
+                "set_pieces": "1254",
+                "set_description": "Space",
+            },
+        ]
+        text = "\n".join(json.dumps(line) for line in lines) + "\n{broken\n"
+        wishlist, report = self.import_file(self.write("sets.jsonl", text))
+
+        self.assertEqual(report["imported"], 2)
+        self.assertEqual([line for line, _ in report["errors"]], [2, 4])
+        # Numbers become the text fields every set has
+        self.assertEqual(wishlist["75192"]["set_price"], "849.99")
+        self.assertEqual(wishlist["75192"]["set_description"], "")
+        self.assertEqual(wishlist["10497"]["set_description"], "Space")
+
+    def test_bad_rows_are_rejected_and_reported(self):
+        rows = [
+            "Falcon, 849.99, 16+, 7541, 75192, ok",
+            "Falcon, free, 16+, 7541, 75193, bad price",
+            "Falcon, 849.99, 16+, lots, 75194, bad pieces",
+            "Falcon, 849.99, teens, 7541, 75195, bad age",
+            "Falcon, 849.99, 16+, 7541, , no set number",
+            "Falcon, 849.99, 16+",
+        ]
+        rows += ["Falcon, ?, 16+, 7541, 1, bad"] * MAX_REPORTED_ERRORS
+        wishlist, report = self.import_file(self.write("sets.csv", "\n".join(rows)))
+
+        self.assertEqual(list(wishlist), ["75192"])
+        self.assertEqual(report["imported"], 1)
+        self.assertEqual(report["rejected"], 5 + MAX_REPORTED_ERRORS)
+        # Only the first few are kept, with their line numbers
+        self.assertEqual(len(report["errors"]), MAX_REPORTED_ERRORS)
+        self.assertEqual([line for line, _ in report["errors"][:5]], [2, 3, 4, 5, 6])
+        self.assertIn("price", report["errors"][0][1])
+
+    def test_sets_are_saved_in_chunks_with_progress(self):
+        rows = [f"Castle {number}, 9.99, 9+, 100, {number}, " for number in range(25)]
+        path = self.write("sets.csv", "\n".join(rows))
+        progress = []
+
+        wishlist, report = self.import_file(
+            path,
+            chunk_size=10,
+            progress=lambda done, total, report: progress.append((done, total)),
+        )
+
+        self.assertEqual(report["imported"], 25)
+        self.assertEqual([len(chunk) for chunk in self.chunks], [10, 10, 5])
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1], (os.path.getsize(path), os.path.getsize(path)))
+        self.assertLess(progress[0][0], progress[1][0])
+
+    def test_imported_ops_are_accepted_by_the_store(self):
+        store = WishlistStore()
+        store.apply(replace_op(DEFAULT_WISHLIST_ID, {}))
+        wishlist, _ = self.import_file(self.write("sets.csv", CSV))
+
+        for ops in self.chunks:
+            store_service.check_ops(store, ops)
+            for op in ops:
+                store.apply(op)
+
+        self.assertEqual(store.get(DEFAULT_WISHLIST_ID).to_dict(), wishlist)
+
+
+if __name__ == "__main__":
+    unittest.main()
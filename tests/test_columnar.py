@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.columnar import ColumnarWishlist
+from common.vectorized import columns, np
+from common.wire import decode, encode, msgpack
+
+
+def lego_set(name, price="9.99"):
+    return {
+        "set_name": name,
+        "set_price": price,
+        "set_age_group": "9+",
+        "set_pieces": "100",
+        "set_description": "",
+    }
+
+
+class ColumnarWishlistTest(unittest.TestCase):
+    def setUp(self):
+        self.expected = {str(number): lego_set(f"Set {number}") for number in range(10)}
+        self.wishlist = ColumnarWishlist.from_dict(self.expected)
+
+    def change(self, removed=(), added=()):
+        for set_number in removed:
+            self.wishlist.remove(set_number)
+            del self.expected[set_number]
+        for set_number, set_details in added:
+            self.wishlist.add(set_number, set_details)
+            self.expected[set_number] = set_details
+
+    def test_removes_and_overwrites_keep_insertion_order(self):
+        self.change(
+            removed=["2", "5"],
+            added=[("3", lego_set("Castle", "n/a")), ("75192", lego_set("Falcon"))],
+        )
+
+        # Same order a dict gives: overwritten sets stay put, new ones go last
+        self.assertEqual(list(self.wishlist), list(self.expected))
+        self.assertEqual(self.wishlist.to_dict(), self.expected)
+        self.assertEqual(len(self.wishlist), len(self.expected))
+        self.assertIsNone(self.wishlist.price_of("3"))
+        self.assertNotIn("5", self.wishlist)
+
+    @unittest.skipIf(msgpack is None, "msgpack not installed")
+    def test_wire_copy_has_no_dead_rows(self):
+        self.change(removed=["0", "9", "4"])
+
+        wire, _ = decode(encode(self.wishlist.to_wire(), "frames"))
+        copy = ColumnarWishlist.from_wire(wire)
+        self.assertEqual(copy.to_dict(), self.expected)
+        self.assertEqual(list(copy), list(self.expected))
+        self.assertEqual(len(copy.price), len(self.expected))
+
+    def test_removed_strings_are_released(self):
+        self.change(removed=list(self.expected))
+
+        self.assertEqual(len(self.wishlist), 0)
+        # Only the strings every set shared are gone too
+        self.assertEqual(len(self.wishlist.strings), 0)
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_column_views_skip_removed_rows(self):
+        self.change(removed=["1"], added=[("2", lego_set("Droid", "24.99"))])
+
+        prices = columns(self.wishlist)["price"]
+        self.assertEqual(
+            prices.tolist(),
+            [self.wishlist.price_of(number) for number in self.expected],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import importlib.util
+import os
+import random
+import sys
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from common.content_hash import (
+    BUCKET_COUNT,
+    HashTree,
+    WishlistHashes,
+    bucket_of,
+    set_hash,
+    sync_ops,
+)
+from common.wishlist_store import (
+    DEFAULT_WISHLIST_ID,
+    WishlistStore,
+    delete_op,
+    edit_op,
+    replace_op,
+)
+
+
+def load_service(directory, filename):
+    # Service directories (service-A, ...) aren't packages, load by path
+    path = os.path.join(REPO_DIR, "server", directory, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+store_service = load_service("service-E", "lego_wishlist_store_service.py")
+
+
+def example_wishlist(size=500, seed=5):
+    rng = random.Random(seed)
+    return {
+        str(10000 + number): {
+            "set_name": rng.choice(["Falcon", "Castle", "Droid"]) + f" {number}",
+            "set_price": f"{rng.randint(5, 500)}.99",
+            "set_age_group": rng.choice(["9+", "18+"]),
+            "set_pieces": str(rng.randint(10, 5000)),
+            "set_description": "",
+        }
+        for number in range(size)
+    }
+
+
+class HashTreeTest(unittest.TestCase):
+    def test_same_sets_same_root_in_any_order(self):
+        wishlist = example_wishlist()
+        reordered = dict(reversed(list(wishlist.items())))
+
+        self.assertEqual(
+            HashTree.from_wishlist(wishlist).root(),
+            HashTree.from_wishlist(reordered).root(),
+        )
+
+    def test_any_field_change_changes_the_hash(self):
+        set_details = {"set_name": "Falcon", "set_price": "849.99"}
+        base = set_hash("75192", set_details)
+
+        self.assertNotEqual(set_hash("75193", set_details), base)
+        self.assertNotEqual(set_hash("75192", {**set_details, "set_price": "9"}), base)
+        # Text moved from one field into the next still hashes differently
+        self.assertNotEqual(
+            set_hash("75192", {"set_name": "Falcon8", "set_price": "49.99"}),
+            set_hash("75192", {"set_name": "Falcon", "set_price": "849.99"}),
+        )
+
+    def test_incremental_updates_match_a_fresh_tree(self):
+        wishlist = example_wishlist()
+        tree = HashTree.from_wishlist(wishlist)
+        set_numbers = sorted(wishlist)
+
+        for set_number in set_numbers[::4]:
+            del wishlist[set_number]
+            tree.refresh(set_number, wishlist)
+        for set_number in set_numbers[1::4]:
+            wishlist[set_number] = {**wishlist[set_number], "set_price": "1.99"}
+            tree.refresh(set_number, wishlist)
+
+        fresh = HashTree.from_wishlist(wishlist)
+        self.assertEqual(tree.root(), fresh.root())
+        self.assertEqual(tree.bucket_hashes, fresh.bucket_hashes)
+        self.assertEqual(tree.size, len(wishlist))
+
+    def test_differing_buckets_are_those_of_changed_sets(self):
+        wishlist = example_wishlist()
+        tree = HashTree.from_wishlist(wishlist)
+        changed = {**wishlist, "10003": {**wishlist["10003"], "set_name": "X"}}
+        del changed["10007"]
+
+        self.assertEqual(
+            tree.differing_buckets(HashTree.from_wishlist(changed).bucket_hashes),
+            sorted({bucket_of("10003"), bucket_of("10007")}),
+        )
+
+
+class HashSyncTest(unittest.TestCase):
+    def reconcile(self, local, remote):
+        """
+        The client side of a sync: roots, then buckets, then only the sets
+        of differing buckets. Returns the ops sent to remote.
+        """
+        local_tree = HashTree.from_wishlist(local)
+        remote_tree = HashTree.from_wishlist(remote)
+        reply = store_service.sync_hashes({"root": local_tree.root()}, remote_tree, 1)
+        if "buckets" not in reply:
+            return []
+
+        buckets = local_tree.differing_buckets(reply["buckets"])
+        reply = store_service.sync_hashes({"buckets": buckets}, remote_tree, 1)
+        return sync_ops(local_tree, local, DEFAULT_WISHLIST_ID, buckets, reply["sets"])
+
+    def test_stale_copy_is_brought_in_line(self):
+        local = example_wishlist()
+        store = WishlistStore()
+        store.apply(replace_op(DEFAULT_WISHLIST_ID, example_wishlist()))
+        set_numbers = sorted(local)
+
+        # Client changed some sets the store never heard of...
+        for set_number in set_numbers[::50]:
+            local[set_number] = {**local[set_number], "set_price": "0.99"}
+        del local[set_numbers[7]]
+        local["75192"] = {"set_name": "Millennium Falcon", "set_price": "849.99"}
+        # ...and the store a change the client overrides
+        store.apply(edit_op(DEFAULT_WISHLIST_ID, set_numbers[9], {"set_name": "Y"}))
+
+        ops = self.reconcile(local, store.get(DEFAULT_WISHLIST_ID).to_dict())
+        # Only what differs is sent, not the whole wishlist
+        self.assertEqual(len(ops), len(set_numbers[::50]) + 3)
+        for op in ops:
+            store.apply(op)
+
+        remote = store.get(DEFAULT_WISHLIST_ID).to_dict()
+        self.assertEqual(
+            HashTree.from_wishlist(remote).root(), HashTree.from_wishlist(local).root()
+        )
+        self.assertEqual(self.reconcile(local, remote), [])
+
+    def test_sync_hashes_replies_coarsest_first(self):
+        tree = HashTree.from_wishlist(example_wishlist(size=20))
+
+        same = store_service.sync_hashes({"root": tree.root()}, tree, 3)
+        self.assertEqual(same["version"], 3)
+        self.assertNotIn("buckets", same)
+
+        differ = store_service.sync_hashes({"root": 0}, tree, 3)
+        self.assertEqual(len(differ["buckets"]), BUCKET_COUNT)
+
+        bucket = bucket_of("10001")
+        sets = store_service.sync_hashes({"buckets": [bucket]}, tree, 3)["sets"]
+        self.assertIn("10001", sets)
+
+        for buckets in ([BUCKET_COUNT], [-1], ["0"]):
+            with self.subTest(buckets=buckets):
+                reply = store_service.sync_hashes({"buckets": buckets}, tree, 3)
+                self.assertEqual(reply["status"], "error")
+
+    def test_listener_follows_store_ops(self):
+        store = WishlistStore()
+        hashes = WishlistHashes()
+        store.add_listener(hashes)
+        store.apply(replace_op(DEFAULT_WISHLIST_ID, example_wishlist()))
+        store.apply(delete_op(DEFAULT_WISHLIST_ID, "10001"))
+        store.apply(edit_op(DEFAULT_WISHLIST_ID, "10002", {"set_price": "1.99"}))
+
+        expected = HashTree.from_wishlist(store.get(DEFAULT_WISHLIST_ID).to_dict())
+        self.assertEqual(hashes.get(DEFAULT_WISHLIST_ID).root(), expected.root())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.journal import WishlistJournal
+from common.wishlist_store import DEFAULT_WISHLIST_ID, add_op, delete_op, edit_op
+
+FALCON = {"set_name": "Millennium Falcon", "set_price": "849.99"}
+R2_D2 = {"set_name": "R2-D2", "set_price": "99.99"}
+
+
+class JournalReplayTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.data_dir = directory.name
+        self.journals = []
+
+    def tearDown(self):
+        for journal in self.journals:
+            journal.close()
+
+    def open_journal(self):
+        journal = WishlistJournal(self.data_dir, fsync=False)
+        self.journals.append(journal)
+        return journal, journal.load()
+
+    def save(self, journal, wishlist, ops, sets):
+        # Ops are applied by the caller first, as the client does
+        wishlist.update(sets)
+        journal.append(ops, wishlist)
+
+    def write_log(self):
+        journal, wishlist = self.open_journal()
+        self.save(
+            journal,
+            wishlist,
+            [add_op(DEFAULT_WISHLIST_ID, "75192", FALCON)],
+            {"75192": FALCON},
+        )
+        self.save(
+            journal,
+            wishlist,
+            [add_op(DEFAULT_WISHLIST_ID, "75379", R2_D2)],
+            {"75379": R2_D2},
+        )
+        journal.close()
+        return os.path.join(self.data_dir, "wishlist.log")
+
+    def test_replays_every_complete_line(self):
+        self.write_log()
+        journal, wishlist = self.open_journal()
+
+        self.assertEqual(sorted(wishlist), ["75192", "75379"])
+        self.assertEqual(journal.seq, 2)
+
+    def test_torn_last_line_is_dropped_and_truncated(self):
+        log_path = self.write_log()
+        with open(log_path, "rb") as log_file:
+            lines = log_file.readlines()
+        # A crash part way through writing the second op
+        with open(log_path, "wb") as log_file:
+            log_file.write(lines[0] + lines[1][: len(lines[1]) // 2])
+
+        journal, wishlist = self.open_journal()
+        self.assertEqual(list(wishlist), ["75192"])
+        self.assertEqual(journal.seq, 1)
+        self.assertEqual(os.path.getsize(log_path), len(lines[0]))
+
+        # Ops after the torn one land on a clean line and replay again
+        self.save(
+            journal,
+            wishlist,
+            [edit_op(DEFAULT_WISHLIST_ID, "75192", {"set_price": "799.99"})],
+            {"75192": {**FALCON, "set_price": "799.99"}},
+        )
+        journal.close()
+
+        journal, wishlist = self.open_journal()
+        self.assertEqual(list(wishlist), ["75192"])
+        self.assertEqual(wishlist["75192"]["set_price"], "799.99")
+        self.assertEqual(journal.seq, 2)
+
+    def test_garbage_line_stops_replay(self):
+        log_path = self.write_log()
+        with open(log_path, "rb") as log_file:
+            lines = log_file.readlines()
+        with open(log_path, "wb") as log_file:
+            log_file.write(lines[0] + b'{"seq": 2, "op": \n' + lines[1])
+
+        journal, wishlist = self.open_journal()
+        self.assertEqual(list(wishlist), ["75192"])
+        self.assertEqual(journal.seq, 1)
+
+    def test_snapshot_then_log_tail(self):
+        journal, wishlist = self.open_journal()
+        self.save(
+            journal,
+            wishlist,
+            [add_op(DEFAULT_WISHLIST_ID, "75192", FALCON)],
+            {"75192": FALCON},
+        )
+        journal.snapshot(wishlist)
+        del wishlist["75192"]
+        journal.append([delete_op(DEFAULT_WISHLIST_ID, "75192")], wishlist)
+        self.save(
+            journal,
+            wishlist,
+            [add_op(DEFAULT_WISHLIST_ID, "75379", R2_D2)],
+            {"75379": R2_D2},
+        )
+        journal.close()
+
+        journal, wishlist = self.open_journal()
+        self.assertEqual(list(wishlist), ["75379"])
+        self.assertEqual(journal.seq, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
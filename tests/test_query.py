@@ -0,0 +1,200 @@
+import os
+import random
+import sys
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.query import FILTER_INDEX_KEYS, query_indexed, query_scan
+from common.sorted_index import WishlistIndexes
+from common.vectorized import np, vector_query
+from common.wishlist_store import (
+    DEFAULT_WISHLIST_ID,
+    WishlistStore,
+    add_op,
+    delete_op,
+    edit_op,
+    replace_op,
+)
+
+WISHLIST = {
+    "75192": {
+        "set_name": "Millennium Falcon",
+        "set_price": "849.99",
+        "set_pieces": "7541",
+        "set_age_group": "16+",
+    },
+    "75375": {
+        "set_name": "Millennium Falcon",
+        "set_price": "84.99",
+        "set_pieces": "921",
+        "set_age_group": "9+",
+    },
+    "10497": {
+        "set_name": "Galaxy Explorer",
+        "set_price": "99.99",
+        "set_pieces": "1254",
+        "set_age_group": "18+",
+    },
+    "7140": {
+        "set_name": "X-wing Fighter",
+        "set_price": "n/a",
+        "set_pieces": "263",
+        "set_age_group": "9+",
+    },
+    "X1": {
+        "set_name": "Mystery falcon",
+        "set_price": "10",
+        "set_pieces": "?",
+        "set_age_group": "",
+    },
+}
+
+
+def example_wishlist(size=300, seed=11):
+    """
+    Sets with plenty of tied, unparseable and non-numeric values
+    """
+    rng = random.Random(seed)
+    wishlist = {}
+
+    while len(wishlist) < size:
+        set_number = rng.choice(
+            [
+                str(rng.randint(1, 99999)),
+                f"{rng.randint(1, 999)}-1",
+                f"X{rng.randint(1, 99)}",
+            ]
+        )
+        wishlist[set_number] = {
+            "set_name": rng.choice(["Falcon", "castle", "Castle", "Droid", ""]),
+            "set_price": rng.choice(["9.99", "24.99", "n/a", str(rng.randint(1, 500))]),
+            "set_pieces": rng.choice(["100", "?", "-3", str(rng.randint(1, 5000))]),
+            "set_age_group": rng.choice(["9+", "18+", "4-7", "", "12"]),
+            "set_description": "",
+        }
+
+    return wishlist
+
+
+WHERES = [
+    {},
+    {"price": {"min": 20}},
+    {"price": {"max": 24.99}},
+    {"price": {"min": 9.99, "max": 24.99}},
+    {"pieces": {"min": 1000}, "age": {"max": 12}},
+    {"age": {"min": 9}, "pieces": {"max": 1000}, "price": {"min": 5}},
+    {"name_contains": "CASTLE"},
+    {"name_contains": "falcon", "price": {"max": 100}},
+    {"set_number_prefix": "1"},
+    {"set_number_prefix": "X", "age": {"min": 18}},
+]
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.store = WishlistStore()
+        self.indexes = WishlistIndexes(FILTER_INDEX_KEYS)
+        self.store.add_listener(self.indexes)
+
+    def load(self, wishlist):
+        self.store.apply(replace_op(DEFAULT_WISHLIST_ID, wishlist))
+
+    def query(self, where):
+        wishlist = self.store.get(DEFAULT_WISHLIST_ID)
+        indexes = self.indexes.for_wishlist(DEFAULT_WISHLIST_ID)
+        return query_indexed(where, wishlist, indexes)
+
+    def assert_backends_agree(self, where):
+        wishlist = self.store.get(DEFAULT_WISHLIST_ID)
+        expected = query_scan(where, wishlist)
+        self.assertEqual(self.query(where), expected)
+        if np is not None:
+            self.assertEqual(list(vector_query(where, wishlist)), expected)
+
+    def test_ranges_are_inclusive_and_skip_unparseable_values(self):
+        self.load(WISHLIST)
+
+        self.assertEqual(
+            self.query({"price": {"min": 84.99, "max": 99.99}}), ["10497", "75375"]
+        )
+        # "n/a" has no price, "?" no pieces, "" no age: never in a range
+        self.assertEqual(
+            self.query({"price": {"max": 1000}}), ["10497", "75192", "75375", "X1"]
+        )
+        self.assertEqual(
+            self.query({"pieces": {"min": 0}}), ["7140", "10497", "75192", "75375"]
+        )
+        self.assertEqual(self.query({"age": {"min": 16}}), ["10497", "75192"])
+
+    def test_predicates_combine_and_results_come_in_set_number_order(self):
+        self.load(WISHLIST)
+
+        self.assertEqual(self.query({}), ["7140", "10497", "75192", "75375", "X1"])
+        self.assertEqual(
+            self.query({"age": {"max": 9}, "pieces": {"min": 500}}), ["75375"]
+        )
+        self.assertEqual(
+            self.query({"name_contains": "FALCON"}), ["75192", "75375", "X1"]
+        )
+        self.assertEqual(
+            self.query({"name_contains": "falcon", "price": {"min": 100}}), ["75192"]
+        )
+        self.assertEqual(self.query({"set_number_prefix": "75"}), ["75192", "75375"])
+        self.assertEqual(
+            self.query({"set_number_prefix": "75", "pieces": {"max": 1000}}), ["75375"]
+        )
+
+    def test_indexes_follow_incremental_changes(self):
+        wishlist = example_wishlist()
+        self.load(wishlist)
+        set_numbers = sorted(wishlist)
+
+        for where in WHERES:
+            with self.subTest(where=where):
+                self.assert_backends_agree(where)
+
+        for set_number in set_numbers[::5]:
+            self.store.apply(delete_op(DEFAULT_WISHLIST_ID, set_number))
+        for set_number in set_numbers[2::5]:
+            self.store.apply(
+                edit_op(
+                    DEFAULT_WISHLIST_ID,
+                    set_number,
+                    {"set_price": "24.99", "set_age_group": "18+"},
+                )
+            )
+        self.store.apply(
+            add_op(
+                DEFAULT_WISHLIST_ID,
+                "75192",
+                {"set_name": "Falcon", "set_price": "849.99"},
+            )
+        )
+
+        for where in WHERES:
+            with self.subTest(where=where, changed=True):
+                self.assert_backends_agree(where)
+
+    def test_invalid_filters_are_refused(self):
+        self.load(WISHLIST)
+        invalid = [
+            ["price"],
+            {"colour": "red"},
+            {"price": 20},
+            {"price": {"min": "20"}},
+            {"name_contains": 5},
+            {"set_number_prefix": ["75"]},
+        ]
+
+        for where in invalid:
+            with self.subTest(where=where):
+                with self.assertRaises(ValueError):
+                    self.query(where)
+                with self.assertRaises(ValueError):
+                    query_scan(where, self.store.get(DEFAULT_WISHLIST_ID))
+
+
+if __name__ == "__main__":
+    unittest.main()
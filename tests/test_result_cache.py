@@ -0,0 +1,155 @@
+import os
+import sys
+import unittest
+
+import zmq
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.result_cache import ResultCache, merge_stats
+from common.wishlist_replica import WishlistReplica
+from common.wishlist_store import (
+    DEFAULT_WISHLIST_ID,
+    WishlistStore,
+    add_op,
+    delete_op,
+    replace_op,
+)
+
+# Nothing publishes here: ops are applied straight to the replica's store
+UPDATES_ADDRESS = "inproc://no-wishlist-store"
+
+OTHER_WISHLIST_ID = "birthday"
+
+FALCON = {"set_name": "Millennium Falcon", "set_price": "849.99"}
+R2_D2 = {"set_name": "R2-D2", "set_price": "99.99"}
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.context = zmq.Context()
+        self.replica = WishlistReplica(
+            self.context, store=WishlistStore(), updates_address=UPDATES_ADDRESS
+        )
+        self.replica.store.apply(replace_op(DEFAULT_WISHLIST_ID, {"75192": FALCON}))
+        self.replica.store.apply(replace_op(OTHER_WISHLIST_ID, {"75379": R2_D2}))
+        self.calls = 0
+
+    def tearDown(self):
+        self.replica.close()
+        self.context.term()
+
+    def cache(self, max_entries=8):
+        cache = ResultCache(max_entries)
+        self.replica.store.add_listener(cache)
+        return cache
+
+    def reply(self, cache, message, status="success"):
+        def handle():
+            # What the wishlist held when the reply was worked out
+            self.calls += 1
+            wishlist = self.replica.wishlist_for(message)
+            return {"status": status, "sets": sorted(wishlist)}
+
+        return cache.reply(message, self.replica, handle)
+
+    def test_repeated_request_is_answered_from_cache(self):
+        cache = self.cache()
+        message = {"command": "sort", "key": "price", "limit": 10}
+
+        first = self.reply(cache, message)
+        # Same parameters in another order
+        again = self.reply(cache, {"limit": 10, "key": "price", "command": "sort"})
+
+        self.assertEqual(again, first)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_other_parameters_miss(self):
+        cache = self.cache()
+        self.reply(cache, {"command": "sort", "limit": 10})
+        self.reply(cache, {"command": "sort", "limit": 20})
+        self.reply(
+            cache, {"command": "sort", "limit": 10, "wishlist_id": OTHER_WISHLIST_ID}
+        )
+
+        self.assertEqual(self.calls, 3)
+
+    def test_change_to_the_wishlist_invalidates_its_replies(self):
+        cache = self.cache()
+        message = {"command": "sort"}
+        other = {"command": "sort", "wishlist_id": OTHER_WISHLIST_ID}
+        self.assertEqual(self.reply(cache, message)["sets"], ["75192"])
+        self.reply(cache, other)
+
+        self.replica.store.apply(add_op(DEFAULT_WISHLIST_ID, "75379", R2_D2))
+        # Dropped right away, not left to age out
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertEqual(self.reply(cache, message)["sets"], ["75192", "75379"])
+
+        self.replica.store.apply(delete_op(DEFAULT_WISHLIST_ID, "75192"))
+        self.assertEqual(self.reply(cache, message)["sets"], ["75379"])
+        # The other wishlist's reply survived every change
+        self.reply(cache, other)
+        self.assertEqual(self.calls, 4)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = self.cache(max_entries=2)
+        self.reply(cache, {"limit": 1})
+        self.reply(cache, {"limit": 2})
+        self.reply(cache, {"limit": 1})
+        self.reply(cache, {"limit": 3})
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.reply(cache, {"limit": 1})
+        self.assertEqual(self.calls, 3)
+        self.reply(cache, {"limit": 2})
+        self.assertEqual(self.calls, 4)
+
+    def test_errors_and_inline_wishlists_are_not_cached(self):
+        cache = self.cache()
+        for _ in range(2):
+            self.reply(cache, {"command": "sort", "key": "colour"}, status="error")
+            self.reply(cache, {"command": "sort", "wishlist": {"75192": FALCON}})
+
+        self.assertEqual(self.calls, 4)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_size_zero_turns_caching_off(self):
+        cache = self.cache(max_entries=0)
+        for _ in range(2):
+            self.reply(cache, {"command": "sort"})
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(cache.stats()["hit_rate"], None)
+
+    def test_sharded_stats_are_summed(self):
+        stats = merge_stats(
+            [
+                {
+                    "entries": 1,
+                    "max_entries": 8,
+                    "hits": 3,
+                    "misses": 1,
+                    "evictions": 0,
+                },
+                {
+                    "entries": 2,
+                    "max_entries": 8,
+                    "hits": 0,
+                    "misses": 4,
+                    "evictions": 1,
+                },
+            ]
+        )
+
+        self.assertEqual(stats["entries"], 3)
+        self.assertEqual(stats["max_entries"], 16)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 3 / 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
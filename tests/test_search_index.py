@@ -0,0 +1,152 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from common.columnar import ColumnarWishlist
+from common.search_index import SearchIndex, np
+from common.suggest import SuggestionIndex
+
+
+def load_service(directory, filename):
+    # Service directories (service-A, ...) aren't packages, load by path
+    path = os.path.join(REPO_DIR, "server", directory, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+search_service = load_service("service-D", "lego_web_search_service.py")
+
+
+def lego_set(name, description=""):
+    return {
+        "set_name": name,
+        "set_price": "",
+        "set_age_group": "",
+        "set_pieces": "",
+        "set_description": description,
+    }
+
+
+WISHLIST = {
+    "75192": lego_set("Millennium Falcon", "The ultimate collector starship"),
+    "75375": lego_set("Millennium Falcon", "A smaller starship to play with"),
+    "10497": lego_set("Galaxy Explorer", "Classic space starship"),
+    "21318": lego_set("Tree House", "Build a tree house with falcon nest"),
+    "10305": lego_set("Lion Knights' Castle", "A castle for the knights"),
+}
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.wishlist = ColumnarWishlist.from_dict(WISHLIST)
+        self.index = SearchIndex.from_wishlist(self.wishlist)
+
+    def search(self, query, count=None):
+        return self.index.search(query, count)
+
+    def test_name_matches_rank_above_description_matches(self):
+        total, set_numbers = self.search("falcon")
+
+        self.assertEqual(total, 3)
+        self.assertEqual(set(set_numbers[:2]), {"75192", "75375"})
+        self.assertEqual(set_numbers[2], "21318")
+
+    def test_set_numbers_prefixes_and_typos_are_found(self):
+        self.assertEqual(self.search("10305"), (1, ["10305"]))
+        # Prefix of a word, and a word one typo off
+        self.assertEqual(self.search("galax")[1], ["10497"])
+        self.assertEqual(self.search("castlr")[1], ["10305"])
+
+    def test_stop_words_and_unknown_words_match_nothing(self):
+        self.assertEqual(self.search("the with"), (0, []))
+        self.assertEqual(self.search("submarine"), (0, []))
+        self.assertEqual(self.search(""), (0, []))
+
+    def test_count_limits_sets_not_total(self):
+        total, set_numbers = self.search("starship", count=2)
+
+        self.assertEqual(total, 3)
+        self.assertEqual(set_numbers, self.search("starship")[1][:2])
+
+    def test_removed_sets_are_never_found(self):
+        self.index.remove("75192", self.wishlist)
+        self.assertEqual(self.search("falcon")[1], ["75375", "21318"])
+
+        # Enough removals to compact the postings, then added back
+        wishlist = ColumnarWishlist.from_dict(
+            {str(number): lego_set(f"Droid {number}") for number in range(3000)}
+        )
+        index = SearchIndex.from_wishlist(wishlist)
+        for number in range(100, 3000):
+            index.remove(str(number), wishlist)
+        index.add("2999", wishlist)
+
+        total, set_numbers = index.search("droid")
+        self.assertEqual(total, 101)
+        self.assertEqual(
+            set(set_numbers), {str(number) for number in range(100)} | {"2999"}
+        )
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_numpy_backend_ranks_the_same(self):
+        for query in ("falcon", "starship", "castlr", "tree knights", "1"):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.index.search(query, backend="numpy"),
+                    self.index.search(query),
+                )
+
+
+class SearchRequestTest(unittest.TestCase):
+    def setUp(self):
+        wishlist = ColumnarWishlist.from_dict(WISHLIST)
+        self.indexes = (
+            wishlist,
+            SearchIndex.from_wishlist(wishlist),
+            SuggestionIndex.from_wishlist(wishlist),
+        )
+
+    def search(self, query, **page):
+        command = next(iter(search_service.SEARCH_COMMANDS))
+        field = search_service.SEARCH_COMMANDS[command]
+        return search_service.search_request(
+            {"command": command, field: query, **page}, self.indexes
+        )
+
+    def test_pages_follow_ranking(self):
+        whole = self.search("starship")
+        first = self.search("starship", limit=2)
+        rest = self.search("starship", cursor=first["next_cursor"], limit=2)
+
+        self.assertEqual(first["total"], 3)
+        self.assertEqual(
+            list(first["wishlist"]) + list(rest["wishlist"]), list(whole["wishlist"])
+        )
+        self.assertIsNone(rest["next_cursor"])
+
+    def test_top_k_caps_total_and_pages(self):
+        first = self.search("starship", top_k=2, limit=1)
+        self.assertEqual(first["total"], 2)
+
+        last = self.search("starship", top_k=2, cursor=first["next_cursor"], limit=5)
+        self.assertEqual(len(last["wishlist"]), 1)
+        self.assertIsNone(last["next_cursor"])
+        # Older clients' text still counts every match
+        self.assertIn("Found 3", last["result"])
+
+    def test_no_match_comes_with_suggestions(self):
+        reply = self.search("galacsy")
+
+        self.assertEqual(reply["total"], 0)
+        self.assertIn("10497", [found["set_number"] for found in reply["suggestions"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.search_jobs import LookupJobs
+
+
+class LookupJobsTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def backend(self, query):
+        self.calls.append(query)
+        self.release.wait(5)
+        if query == "broken":
+            raise ValueError("Lookup failed")
+        return [{"set_number": "75192", "set_name": query, "url": ""}]
+
+    def jobs(self, threads=1):
+        jobs = LookupJobs(self.backend, "test", threads=threads)
+        self.addCleanup(self.release.set)
+        return jobs
+
+    def wait(self, jobs):
+        jobs.executor.shutdown(wait=True)
+
+    def test_identical_queries_share_a_job_and_its_results(self):
+        jobs = self.jobs()
+        first = jobs.submit("Millennium  Falcon")
+        second = jobs.submit("millennium falcon")
+
+        self.assertEqual(first["state"], "pending")
+        self.assertEqual(second["job_id"], first["job_id"])
+        self.release.set()
+        self.wait(jobs)
+
+        done = jobs.submit("Millennium Falcon")
+        self.assertEqual(done["state"], "done")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(jobs.stats()["hits"], 1)
+
+    def test_failures_are_reported_once_then_retried(self):
+        jobs = self.jobs()
+        job_id = jobs.submit("broken")["job_id"]
+        self.release.set()
+        self.wait(jobs)
+
+        failed = jobs.status(job_id)
+        self.assertEqual(failed["state"], "failed")
+        self.assertIn("Lookup failed", failed["message"])
+        self.assertEqual(jobs.status(job_id)["state"], "pending")
+
+    def test_jobs_cancelled_by_close_are_recorded(self):
+        jobs = self.jobs()
+        jobs.submit("falcon")
+        queued = jobs.submit("castle")["job_id"]
+
+        # The queued lookup never ran: failed, not left running
+        jobs.close()
+        self.assertEqual(jobs.stats()["running"], 1)
+        cancelled = jobs.status(queued)
+        self.assertEqual(cancelled["state"], "failed")
+        self.assertIn("cancelled", cancelled["message"])
+
+
+if __name__ == "__main__":
+    unittest.main()
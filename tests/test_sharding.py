@@ -0,0 +1,296 @@
+import importlib.util
+import os
+import random
+import sys
+import unittest
+
+import zmq
+
+# Make the repo-level `common` package importable when run as a script
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from common.sharding import ShardedStore
+from common.wishlist_replica import WishlistReplica
+from common.wishlist_store import (
+    DEFAULT_WISHLIST_ID,
+    WishlistStore,
+    add_op,
+    delete_op,
+    edit_op,
+    replace_op,
+)
+
+SHARDS = 3
+
+# Nothing publishes here: ops are applied straight to each replica's store,
+# never picked up from a wishlist store service that may be running
+UPDATES_ADDRESS = "inproc://no-wishlist-store"
+
+
+def load_service(directory, filename):
+    # Service directories (service-A, ...) aren't packages, load by path
+    path = os.path.join(REPO_DIR, "server", directory, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+totals_service = load_service("service-A", "lego_total_count_service.py")
+sort_service = load_service("service-B", "lego_sort_service.py")
+filter_service = load_service("service-C", "lego_filter_service.py")
+
+
+def example_wishlist(size=240, seed=7):
+    """
+    Sets with plenty of tied, unparseable and non-numeric values
+    """
+    rng = random.Random(seed)
+    wishlist = {}
+
+    while len(wishlist) < size:
+        set_number = rng.choice(
+            [
+                str(rng.randint(1, 99999)),
+                f"{rng.randint(1, 999)}-1",
+                f"X{rng.randint(1, 99)}",
+            ]
+        )
+        wishlist[set_number] = {
+            "set_name": rng.choice(["Falcon", "castle", "Castle", "Droid", ""]),
+            "set_price": rng.choice(
+                ["9.99", "24.99", "24.99", "n/a", str(rng.randint(1, 500))]
+            ),
+            "set_pieces": rng.choice(
+                ["100", "100", "?", "-3", str(rng.randint(1, 5000))]
+            ),
+            "set_age_group": rng.choice(["9+", "18+", "4-7", "", "adults"]),
+            "set_description": "",
+        }
+
+    return wishlist
+
+
+class ShardedService:
+    def __init__(self, context, service, make_handler) -> None:
+        """
+        One handler over the whole wishlist next to one per shard, fed the
+        same ops, answering the same requests
+        """
+        self.service = service
+        stores = [WishlistStore()]
+        stores += [ShardedStore(shard, SHARDS) for shard in range(SHARDS)]
+        self.replicas = [
+            WishlistReplica(context, store=store, updates_address=UPDATES_ADDRESS)
+            for store in stores
+        ]
+        self.handlers = [make_handler(replica) for replica in self.replicas]
+
+    def close(self):
+        for replica in self.replicas:
+            replica.close()
+
+    def apply(self, op):
+        for replica in self.replicas:
+            replica.store.apply(op)
+
+    def whole(self, message):
+        return self.handlers[0](message)
+
+    def sharded(self, message):
+        # What run_shards does with a request, minus the sockets
+        shard_messages = self.service.shard_request(message, SHARDS)
+        replies = [
+            handle(shard_message)
+            for handle, shard_message in zip(self.handlers[1:], shard_messages)
+        ]
+        return self.service.merge_replies(message, replies)
+
+
+class ShardMergeTest(unittest.TestCase):
+    def setUp(self):
+        self.context = zmq.Context()
+        self.services = []
+
+    def tearDown(self):
+        for service in self.services:
+            service.close()
+        self.context.term()
+
+    def sharded_service(self, service, make_handler):
+        service = ShardedService(self.context, service, make_handler)
+        self.services.append(service)
+        service.apply(replace_op(DEFAULT_WISHLIST_ID, example_wishlist()))
+        return service
+
+    def change_sets(self, service):
+        # Incremental changes, not just the initial replace
+        set_numbers = sorted(service.replicas[0].store.get(DEFAULT_WISHLIST_ID))
+        for set_number in set_numbers[::7]:
+            service.apply(delete_op(DEFAULT_WISHLIST_ID, set_number))
+        for set_number in set_numbers[3::7]:
+            service.apply(
+                edit_op(DEFAULT_WISHLIST_ID, set_number, {"set_price": "24.99"})
+            )
+        service.apply(
+            add_op(
+                DEFAULT_WISHLIST_ID,
+                "75192",
+                {"set_name": "Millennium Falcon", "set_price": "849.99"},
+            )
+        )
+
+    def assert_same_page(self, sharded, whole):
+        self.assertEqual(whole["status"], "success")
+        # Sharded cursors also carry how far each shard got
+        self.assertEqual(
+            {**sharded, "next_cursor": None}, {**whole, "next_cursor": None}
+        )
+        self.assertEqual(bool(sharded["next_cursor"]), bool(whole["next_cursor"]))
+        # Dicts compare equal in any order, the order is the point
+        self.assertEqual(list(sharded["wishlist"]), list(whole["wishlist"]))
+
+    def assert_same_pages(self, service, messages):
+        for message in messages:
+            with self.subTest(message=message):
+                self.assert_same_page(service.sharded(message), service.whole(message))
+
+    def assert_same_pages_through(self, service, messages):
+        # Each side follows its own cursors, pages must still line up
+        for message in messages:
+            with self.subTest(message=message):
+                sharded = service.sharded(message)
+                whole = service.whole(message)
+                self.assert_same_page(sharded, whole)
+
+                while whole["next_cursor"]:
+                    sharded = service.sharded(
+                        {**message, "cursor": sharded["next_cursor"]}
+                    )
+                    whole = service.whole({**message, "cursor": whole["next_cursor"]})
+                    self.assert_same_page(sharded, whole)
+
+    def test_sort_merges_in_whole_wishlist_order(self):
+        service = self.sharded_service(
+            sort_service,
+            lambda replica: sort_service.SortHandler(replica, cache_size=0),
+        )
+        pages = [{}, {"limit": 10}, {"offset": 25, "limit": 40}, {"offset": 230}]
+
+        for _ in range(2):
+            self.assert_same_pages(
+                service,
+                [
+                    {"command": "sort", "key": key, "order": order, **page}
+                    for key in ("price", "pieces", "age", "name", "set_number")
+                    for order in ("asc", "desc")
+                    for page in pages
+                ]
+                + [{"command": "sort_high_to_low", "limit": 15}],
+            )
+            self.assert_same_pages_through(
+                service,
+                [
+                    {"command": "sort", "key": key, "order": order, "limit": 17}
+                    for key in ("price", "age", "set_number")
+                    for order in ("asc", "desc")
+                ],
+            )
+            self.change_sets(service)
+
+    def test_filter_merges_matches_and_top_k(self):
+        service = self.sharded_service(
+            filter_service,
+            lambda replica: filter_service.FilterHandler(
+                replica, "python", cache_size=0
+            ),
+        )
+        wheres = [
+            {},
+            {"price": {"min": 20}},
+            {"age": {"min": 9}, "pieces": {"max": 1000}},
+        ]
+        top_k = [
+            {"top_k": 12},
+            {"top_k": 30, "key": "pieces", "order": "desc", "limit": 7},
+            {"top_k": 50, "key": "name", "offset": 20, "limit": 20},
+        ]
+
+        for _ in range(2):
+            self.assert_same_pages(
+                service,
+                [
+                    {"command": "query", "where": where, **extra}
+                    for where in wheres
+                    for extra in [{}, {"offset": 5, "limit": 10}, *top_k]
+                ]
+                + [{"command": "filter_by_age", "min_age": 9, "limit": 5}],
+            )
+            self.assert_same_pages_through(
+                service,
+                [
+                    {"command": "query", "where": wheres[1], "limit": 11},
+                    {"command": "query", "where": {}, "top_k": 70, "limit": 9},
+                    {
+                        "command": "query",
+                        "where": wheres[2],
+                        "top_k": 40,
+                        "key": "pieces",
+                        "order": "desc",
+                        "limit": 6,
+                    },
+                ],
+            )
+            self.change_sets(service)
+
+    def test_cursor_refused_once_wishlist_changed(self):
+        service = self.sharded_service(
+            sort_service,
+            lambda replica: sort_service.SortHandler(replica, cache_size=0),
+        )
+        message = {"command": "sort", "key": "price", "limit": 10}
+        cursors = [
+            service.whole(message)["next_cursor"],
+            service.sharded(message)["next_cursor"],
+        ]
+        self.change_sets(service)
+
+        for handle, cursor in zip((service.whole, service.sharded), cursors):
+            reply = handle({**message, "cursor": cursor})
+            self.assertEqual(reply["status"], "error")
+            self.assertIn("changed", reply["message"])
+
+    def test_totals_recompose_from_partials(self):
+        service = self.sharded_service(
+            totals_service,
+            lambda replica: totals_service.TotalsHandler(replica, "python"),
+        )
+        messages = [
+            {"command": "totals_summary"},
+            {"command": "totals"},
+            {"command": "total_number_of_sets"},
+            {"command": "total_pieces_of_sets"},
+        ]
+
+        for _ in range(2):
+            for message in messages:
+                with self.subTest(message=message):
+                    whole = service.whole(message)
+                    sharded = service.sharded(message)
+                    self.assertEqual(whole["status"], "success")
+                    self.assertEqual(sharded.keys(), whole.keys())
+                    # Sums are added in a different order, floats may differ
+                    for field, value in whole.items():
+                        if isinstance(value, dict):
+                            for metric, number in value.items():
+                                self.assertAlmostEqual(sharded[field][metric], number)
+                        elif isinstance(value, float):
+                            self.assertAlmostEqual(sharded[field], value)
+                        else:
+                            self.assertEqual(sharded[field], value)
+            self.change_sets(service)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.columnar import ColumnarWishlist
+from common.suggest import SuggestionIndex, edit_distance
+
+NAMES = {
+    "75192": "Millennium Falcon",
+    "75375": "Millennium Falcon",
+    "10497": "Galaxy Explorer",
+    "10305": "Lion Knights' Castle",
+    "21318": "Tree House",
+    "42115": "Lamborghini Sián FKP 37",
+}
+
+
+def wishlist_of(names):
+    return ColumnarWishlist.from_dict(
+        {
+            set_number: {"set_name": name, "set_description": ""}
+            for set_number, name in names.items()
+        }
+    )
+
+
+class EditDistanceTest(unittest.TestCase):
+    def test_distance_and_bound(self):
+        self.assertEqual(edit_distance("falcon", "falcon", 2), 0)
+        self.assertEqual(edit_distance("falcn", "falcon", 2), 1)
+        self.assertEqual(edit_distance("flacon", "falcon", 2), 2)
+        # Past the bound it stops at bound + 1
+        self.assertEqual(edit_distance("castle", "explorer", 2), 3)
+
+    def test_prefix_distance_compares_with_the_closest_start(self):
+        self.assertEqual(edit_distance("galaxy", "galaxy explorer", 1, prefix=True), 0)
+        self.assertEqual(edit_distance("galxy", "galaxy explorer", 1, prefix=True), 1)
+
+
+class SuggestionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.wishlist = wishlist_of(NAMES)
+        self.index = SuggestionIndex.from_wishlist(self.wishlist)
+
+    def test_completions_of_names_and_set_numbers(self):
+        self.assertEqual(self.index.suggest("Mill"), ["75192", "75375"])
+        self.assertEqual(self.index.suggest("  galaxy ex"), ["10497"])
+        self.assertEqual(self.index.suggest("1049"), ["10497"])
+        self.assertEqual(self.index.suggest("lamborghini sián"), ["42115"])
+
+    def test_typos_are_suggested_after_completions(self):
+        self.assertEqual(self.index.suggest("milenium"), ["75192", "75375"])
+        self.assertEqual(self.index.suggest("galacsy"), ["10497"])
+        self.assertEqual(self.index.suggest("lion knigths"), ["10305"])
+        # Completions first, then what's a typo or two off
+        suggestions = self.index.suggest("tree", count=5)
+        self.assertEqual(suggestions[0], "21318")
+
+    def test_count_and_empty_text(self):
+        self.assertEqual(self.index.suggest("m", count=1), ["75192"])
+        self.assertEqual(self.index.suggest("mill", count=0), [])
+        self.assertEqual(self.index.suggest("   "), [])
+        self.assertEqual(self.index.suggest("qqqq"), [])
+
+    def test_added_and_removed_sets(self):
+        names = {**NAMES, "75355": "X-wing Starfighter"}
+        wishlist = wishlist_of(names)
+        self.index.add("75355", wishlist)
+        self.assertEqual(self.index.suggest("x-wing"), ["75355"])
+
+        self.index.remove("75192")
+        self.assertEqual(self.index.suggest("millennium"), ["75375"])
+        self.assertEqual(self.index.suggest("milenium"), ["75375"])
+        self.assertEqual(self.index.suggest("7519"), [])
+
+    def test_incremental_index_matches_a_fresh_one(self):
+        names = {str(10000 + number): f"Castle {number}" for number in range(200)}
+        wishlist = wishlist_of(names)
+        index = SuggestionIndex()
+        for set_number in names:
+            index.add(set_number, wishlist)
+        for set_number in list(names)[::3]:
+            index.remove(set_number)
+
+        kept = {
+            set_number: name
+            for position, (set_number, name) in enumerate(names.items())
+            if position % 3
+        }
+        fresh = SuggestionIndex.from_wishlist(wishlist_of(kept))
+        for text in ("castle 1", "10", "castel 12", "cstle 4"):
+            with self.subTest(text=text):
+                self.assertEqual(index.suggest(text), fresh.suggest(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import importlib.util
+import os
+import random
+import sys
+import unittest
+
+# Make the repo-level `common` package importable when run as a script
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from common.columnar import ColumnarWishlist
+from common.vectorized import np, vector_totals
+
+
+def load_service(directory, filename):
+    # Service directories (service-A, ...) aren't packages, load by path
+    path = os.path.join(REPO_DIR, "server", directory, filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+total_service = load_service("service-A", "lego_total_count_service.py")
+
+
+def example_wishlist(size=2000, seed=7):
+    rng = random.Random(seed)
+    return ColumnarWishlist.from_dict(
+        {
+            str(10000 + number): {
+                "set_price": rng.choice(["n/a", f"{rng.uniform(0, 1000):.2f}"]),
+                "set_pieces": rng.choice(["?", "-3", str(rng.randint(1, 5000))]),
+            }
+            for number in range(size)
+        }
+    )
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class VectorTotalsTest(unittest.TestCase):
+    def summaries(self, wishlist):
+        return [
+            total_service.RunningTotals.from_wishlist(wishlist, backend).summary()
+            for backend in ("python", "numpy")
+        ]
+
+    def test_backends_agree_to_the_last_digit(self):
+        wishlist = example_wishlist()
+        for set_number in list(wishlist)[::7]:
+            wishlist.remove(set_number)
+
+        python, numpy = self.summaries(wishlist)
+        self.assertEqual(numpy, python)
+
+    def test_pieces_past_int64_are_summed_exactly(self):
+        huge = str(2**62)
+        wishlist = ColumnarWishlist.from_dict(
+            {
+                str(number): {"set_price": "1.5", "set_pieces": huge}
+                for number in range(4)
+            }
+        )
+
+        self.assertEqual(vector_totals(wishlist)["total_pieces"], 2**64)
+        python, numpy = self.summaries(wishlist)
+        self.assertEqual(numpy, python)
+
+
+if __name__ == "__main__":
+    unittest.main()
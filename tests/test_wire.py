@@ -0,0 +1,153 @@
+import os
+import sys
+import unittest
+from array import array
+
+# Make the repo-level `common` package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.wire import (
+    BASE_CODECS,
+    CODECS,
+    COMPRESS_THRESHOLD,
+    choose_codec,
+    decode,
+    encode,
+    msgpack,
+)
+
+MESSAGE = {
+    "status": "success",
+    "wishlist": {
+        "75192": {"set_name": "Millennium Falcon™", "set_price": "849.99"},
+        "10497": {"set_name": "Galaxy Explorer", "set_price": "99.99"},
+    },
+    "offset": 0,
+    "total": 2,
+    "next_cursor": None,
+    "ratio": 0.5,
+}
+
+
+class CodecRoundTripTest(unittest.TestCase):
+    def test_every_codec_round_trips(self):
+        for codec in BASE_CODECS:
+            with self.subTest(codec=codec):
+                self.assertEqual(decode(encode(MESSAGE, codec)), (MESSAGE, codec))
+
+    def test_json_is_one_frame_without_a_name(self):
+        # What every peer, old ones included, understands
+        frames = encode(MESSAGE)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(decode(frames), (MESSAGE, "json"))
+
+    def test_columns_go_as_lists_without_frames(self):
+        message = {"price": array("d", [9.99, 24.5]), "pieces": array("q", [7, 9])}
+        codecs = [codec for codec in BASE_CODECS if codec != "frames"]
+
+        for codec in codecs:
+            with self.subTest(codec=codec):
+                decoded, _ = decode(encode(message, codec))
+                self.assertEqual(decoded, {"price": [9.99, 24.5], "pieces": [7, 9]})
+
+    @unittest.skipIf(msgpack is None, "msgpack not installed")
+    def test_frames_codec_moves_columns_into_their_own_frames(self):
+        price = array("d", [9.99, 24.5, 849.99])
+        pieces = array("q", [7, -1, 7541])
+        frames = encode({"price": price, "pieces": pieces, "id": "x"}, "frames")
+
+        self.assertEqual(len(frames), 4)
+        decoded, codec = decode(frames)
+        self.assertEqual(codec, "frames")
+        self.assertEqual(decoded["id"], "x")
+        # Memoryviews over the received frames, cast back to their type
+        self.assertIsInstance(decoded["price"], memoryview)
+        self.assertEqual(decoded["price"].tolist(), price.tolist())
+        self.assertEqual(decoded["pieces"].tolist(), pieces.tolist())
+
+    def test_unknown_codec_is_refused(self):
+        with self.assertRaises(ValueError):
+            decode([b"pickle", b"..."])
+
+    def test_unserializable_values_are_refused(self):
+        for codec in BASE_CODECS:
+            with self.subTest(codec=codec):
+                with self.assertRaises(TypeError):
+                    encode({"when": object()}, codec)
+
+
+def large_wishlist(size=200):
+    return {
+        "status": "success",
+        "wishlist": {
+            str(10000 + number): {
+                "set_name": f"Castle {number}",
+                "set_price": f"{number % 300}.99",
+                "set_age_group": "9+",
+                "set_pieces": str(number * 7),
+                "set_description": "Build and display the famous LEGO castle",
+            }
+            for number in range(size)
+        },
+    }
+
+
+class CompressionTest(unittest.TestCase):
+    def compressed_codecs(self):
+        return [codec for codec in CODECS if "+" in codec]
+
+    def test_compressed_codecs_round_trip(self):
+        for message in (MESSAGE, large_wishlist()):
+            for codec in self.compressed_codecs():
+                with self.subTest(codec=codec, size=len(message)):
+                    self.assertEqual(decode(encode(message, codec)), (message, codec))
+
+    def test_large_payloads_shrink_small_ones_are_left_alone(self):
+        message = large_wishlist()
+        for codec in self.compressed_codecs():
+            with self.subTest(codec=codec):
+                base_codec = codec.partition("+")[0]
+                plain = encode(message, base_codec)[-1]
+                frames = encode(message, codec)
+
+                self.assertGreater(len(plain), COMPRESS_THRESHOLD)
+                self.assertEqual(frames[1][:1], b"\1")
+                self.assertLess(len(frames[1]), len(plain) // 3)
+                # Below the threshold: just the flag byte in front
+                self.assertEqual(encode(MESSAGE, codec)[1][:1], b"\0")
+
+    def test_shared_dictionary_helps_small_messages(self):
+        message = large_wishlist(size=30)
+        self.assertLess(
+            len(encode(message, "json+zdict1")[1]), len(encode(message, "json+zlib")[1])
+        )
+
+    def test_unknown_compression_is_refused(self):
+        with self.assertRaises(ValueError):
+            decode([b"json+lz4", b"\0{}"])
+
+    def test_compression_only_when_asked_for(self):
+        reply = {"status": "success", "codecs": list(CODECS)}
+        self.assertNotIn("+", choose_codec(reply))
+        self.assertEqual(choose_codec(reply, compress=True), CODECS[0])
+
+
+class ChooseCodecTest(unittest.TestCase):
+    def test_best_codec_both_ends_speak(self):
+        reply = {"status": "success", "codecs": list(CODECS)}
+        self.assertEqual(choose_codec(reply), BASE_CODECS[0])
+
+        reply = {"status": "success", "codecs": ["json", "msgpack"]}
+        expected = "msgpack" if "msgpack" in BASE_CODECS else "json"
+        self.assertEqual(choose_codec(reply), expected)
+
+    def test_peers_without_codecs_get_json(self):
+        # Services that predate codecs answer the request with an error
+        self.assertEqual(
+            choose_codec({"status": "error", "message": "Invalid command"}), "json"
+        )
+        self.assertEqual(choose_codec({"status": "success"}), "json")
+
+
+if __name__ == "__main__":
+    unittest.main()